@@ -1,10 +1,20 @@
-from nltk.corpus import stopwords
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import pandas as pd
+from dataclasses import replace
 from utils.preference import get_preference, update_preferences
 from utils import constants
-from nltk.tokenize import word_tokenize
+from utils.warmup import wait_until_ready
+from utils.session import SessionState, Stage, new_session_state, print_messages, read_input, run_dialog
+from utils.game_catalog import get_game_catalog
+from utils.lexicon import get_stopwords
+from utils.fuzzy import get_title_resolver
+from utils.matcher import get_multi_head_matcher
+from utils.metrics import Stages, stage
+from utils.tokenizer import word_tokenize
+
+# Constant messages used while resolving the game
+GAME_NAME_MESSAGE = "Could you please tell me the name of the game you are looking for?"
+GAME_NAME_REPROMPT = "Ok, could you please tell me the name of the game again?"
+CONFIRMATION_MESSAGE = "Thanks for the confirmation. Here are the details you requested for."
+CONFIRMATION_REPROMPT = "I'm sorry, I didn't understand that."
 
 def get_game_data(game_name: str, column_name: str) -> str:
     """
@@ -22,17 +32,18 @@ def get_game_data(game_name: str, column_name: str) -> str:
         str
             Actual value from the column
     """ 
-    # Read the csv into the data frame
-    df = pd.read_csv("data/games.csv")
-
-    # Get the row which contains the game name
-    matched_row = df.loc[df["name"].str.contains(game_name, case=False, na=False)]
-    try:
-        # Try to get the column data corresponding to the matched row
-        data_to_return = matched_row[column_name].values[0]
-    except Exception:
-        # If the above fails, return a default message
-        data_to_return = "Sorry, I Couldn't find the data which you were looking for"
+    with stage(Stages.CATALOG_SEARCH):
+        # Get the shared games catalog
+        catalog = get_game_catalog()
+
+        # Get the row of the game by its title, alias or title prefix
+        matched_row = catalog.find(game_name)
+        try:
+            # Try to get the column data corresponding to the matched row
+            data_to_return = catalog.get(matched_row, column_name)
+        except Exception:
+            # If the above fails, return a default message
+            data_to_return = "Sorry, I Couldn't find the data which you were looking for"
     
     # Return the data extracted from cell
     return data_to_return
@@ -94,55 +105,134 @@ def is_game_in_input(tokens: list[str]) -> bool:
         "?", ".", "!"
     ]
 
+    stopwords = get_stopwords()
+
     # Remove stop words and custom stop words
-    tokens = [word.lower() for word in tokens if word.lower() not in stopwords.words("english") and word.lower() not in CUSTOM_SW]
+    tokens = [word.lower() for word in tokens if word.lower() not in stopwords and word.lower() not in CUSTOM_SW]
 
     # Return true if list is not empty else False
     return True if tokens else False
 
 
-def extract_game(tokens: list[str]) -> tuple[float | str]:
+def extract_game_candidates(tokens: list[str], k: int) -> list[tuple[float, str]]:
     """
-    Helper function to extract game from user input tokens
+    Helper function to extract the k most likely games from user input tokens
     
     Parameters
     ----------
         tokens: list[str]
             user input in the form of tokens
+        k: int
+            number of games to return
 
     Returns
     -------
-        tuple(float | str)
-            a tuple having the similarity score and the matched result
+        list[tuple[float, str]]
+            similarity score and name of the games, most similar first
     """ 
+    stopwords = get_stopwords()
+
     # Remove stop words
-    tokens = [word.lower() for word in tokens if word not in stopwords.words("english")]
+    tokens = [word.lower() for word in tokens if word not in stopwords]
 
     # Join tokens into a single string
     user_input_str = ' '.join(tokens)
 
-    # Create TF-IDF vectorizer
-    vectorizer = TfidfVectorizer()
+    # Vectorize the input and score it against the game names
+    with stage(Stages.ENTITY_EXTRACTION):
+        query = get_multi_head_matcher().query(user_input_str)
+        candidates = query.top_k(constants.GAMES_PATH, "name", k)
 
-    # Load the file 
-    df = pd.read_csv("data/games.csv")
+    # Get the matched results
+    index = query.matcher.heads[(constants.GAMES_PATH, "name")][0]
+    return [(similarity_score, index.get_value(row, "name")) for similarity_score, row in candidates]
 
-    # Perform fit and transform on the column name which needs to be queried
-    values_tfidf = vectorizer.fit_transform(df["name"])
+def extract_game(tokens: list[str]) -> tuple[float | str]:
+    """
+    Helper function to extract game from user input tokens
+    
+    Parameters
+    ----------
+        tokens: list[str]
+            user input in the form of tokens
 
-    # Transform user input
-    user_input_tfidf = vectorizer.transform([user_input_str])
+    Returns
+    -------
+        tuple(float | str)
+            a tuple having the similarity score and the matched result
+    """ 
+    return extract_game_candidates(tokens, 1)[0]
 
-    # Calculate cosine similarity between user input and values
-    similarities = cosine_similarity(user_input_tfidf, values_tfidf)
+def resolve_game(tokens: list[str]) -> str | None:
+    """
+    Helper function to find a game title mentioned in the user input, tolerating typos like "grnad theft auto"
+    
+    Parameters
+    ----------
+        tokens: list[str]
+            user input in the form of tokens
 
-    # Find the index of the most similar result
-    most_similar_index = similarities.argmax()
+    Returns
+    -------
+        str | None
+            name of the game if a title, an alias or the start of a title is found in the input
+    """
+    with stage(Stages.ENTITY_EXTRACTION):
+        resolved_game = get_title_resolver().resolve(tokens)
+    return resolved_game[0] if resolved_game is not None else None
 
-    # Get the matched result
-    matched_result = df.loc[most_similar_index, "name"]
+def get_alternative_games(candidates: list[tuple[float, str]]) -> tuple[str, ...]:
+    """
+    Helper function to get the runner-up games which are likely enough to be offered if the best guess is rejected
+    
+    Parameters
+    ----------
+        candidates: list[tuple[float, str]]
+            similarity score and name of the games, most similar first
 
-    return (similarities[0, most_similar_index], matched_result)
+    Returns
+    -------
+        tuple[str, ...]
+            names of the alternative games
+    """
+    return tuple(game for similarity_score, game in candidates[1:] if similarity_score >= 0.45)
+
+def parse_confirmation(confirmation_input: str) -> bool | None:
+    """
+    Helper function to parse the answer of a yes/no question
+    
+    Parameters
+    ----------
+        confirmation_input: str
+            The answer from the user
+
+    Returns
+    -------
+        bool | None
+            True for yes, False for no and None if the answer is neither
+    """
+    answer = confirmation_input.strip().lower()
+    if answer == "yes":
+        return True
+    elif answer == "no":
+        return False
+    return None
+
+def get_confirmation_message(result: str) -> str:
+    """
+    Helper function to get the message asking the user to confirm the guessed result
+    
+    Parameters
+    ----------
+        result: str
+            The result which we want to verify
+
+    Returns
+    -------
+        str
+            message that needs to be displayed
+    """
+    return f"Did you mean '{result}'? (yes/no)"
 
 def handle_intermediate_confidence(result: str) -> bool:
     """
@@ -158,108 +248,263 @@ def handle_intermediate_confidence(result: str) -> bool:
         bool
             if the result is a correct guess or not
     """
-    # Initialize the variable to break the outer loop
-    correct_guess = False
-
     # Initiate an infinite loop
     while True:
         # Ask the user if it is the correct guess
-        print(f"{constants.CHATBOT_NAME}: Did you mean '{result}'? (yes/no)")
+        print_messages([get_confirmation_message(result)])
 
         # Get the confirmation
-        confirmation_input = input(f"{constants.USER}: ")
+        correct_guess = parse_confirmation(read_input())
+
+        # If the user says yes or no
+        if correct_guess is not None:
+            return correct_guess
 
-        # If the user says 'yes'
-        if confirmation_input.strip().lower() == "yes":
+        # If the user types anything other than yes/no
+        # Print the message and continue the loop
+        print_messages([CONFIRMATION_REPROMPT])
+
+def show_game_data(state: SessionState, game_name: str, confirmed: bool = False) -> tuple[SessionState, list[str]]:
+    """
+    Helper function to store the game in context and display the requested details
+    
+    Parameters
+    ----------
+        state: SessionState
+            Current state of the conversation
+        game_name: str
+            Name of the game
+        confirmed: bool
+            If the game was confirmed by the user
 
-            # Set the correct guess to True
-            correct_guess = True
+    Returns
+    -------
+        tuple[SessionState, list[str]]
+            New state of the conversation and the messages to display
+    """
+    # Update the preference to reflect the new game in context
+    update_preferences("game_in_context", game_name)
 
-            # Break the loop
-            break
+    # Implicitly confirm and show the results
+    messages = [CONFIRMATION_MESSAGE] if confirmed else []
 
-        # If the user says "no"
-        elif confirmation_input.strip().lower() == "no":
+    # Print the details as requested
+    messages.append(get_intent_based_game_data(game_name, state.intent))
 
-            # Break the loop
-            break
+    # The request is complete, go back to idle
+    return (replace(state, stage=Stage.IDLE, intent=None, candidate_game=None, rejection_stage=None, alternative_games=()), messages)
 
-        # If the user types anything other than yes/no
+def ask_confirmation(state: SessionState, game_name: str, rejection_stage: str, alternative_games: tuple[str, ...] = ()) -> tuple[SessionState, list[str]]:
+    """
+    Helper function to ask the user to confirm the guessed game
+    
+    Parameters
+    ----------
+        state: SessionState
+            Current state of the conversation
+        game_name: str
+            Name of the guessed game
+        rejection_stage: str
+            Stage to go to if the user says no
+        alternative_games: tuple[str, ...]
+            Games to offer next if the user says no
+
+    Returns
+    -------
+        tuple[SessionState, list[str]]
+            New state of the conversation and the messages to display
+    """
+    # Remember where to go if the user says no
+    return (
+        replace(state, stage=Stage.AWAITING_CONFIRMATION, candidate_game=game_name, rejection_stage=rejection_stage, alternative_games=alternative_games),
+        [get_confirmation_message(game_name)]
+    )
+
+def resolve_game_fact(state: SessionState, tokens: list[str]) -> tuple[SessionState, list[str]]:
+    """
+    Helper function to resolve the game of a game fact request and display the requested details
+    
+    Parameters
+    ----------
+        state: SessionState
+            Current state of the conversation
+        tokens: list[str]
+            user input in the form of tokens
+
+    Returns
+    -------
+        tuple[SessionState, list[str]]
+            New state of the conversation and the messages to display
+    """
+    idle_state = replace(state, stage=Stage.IDLE, intent=None, candidate_game=None, rejection_stage=None, alternative_games=())
+
+    # If the title is found in the input, even with typos, there is no need to guess
+    resolved_game = resolve_game(tokens)
+    if resolved_game is not None:
+        return show_game_data(state, resolved_game)
+
+    # Get the similarity score and matched game along with the runner-ups by calling the helper function
+    candidates = extract_game_candidates(tokens=tokens, k=constants.GAME_CANDIDATES)
+    similarity_score, matched_game = candidates[0]
+
+    # If the similarity score is less than 45%
+    if similarity_score < 0.45:
+        # Get the game in context
+        game_in_context = get_preference("game_in_context")
+
+        # If the game in context is empty
+        if game_in_context == "":
+            # Ask for the game which needs to be stored in context
+            return (replace(state, stage=Stage.AWAITING_GAME_NAME), [GAME_NAME_MESSAGE])
+        
+        # If the game in context is not empty
+        # This can either mean that the user is asking something about the game in context or he might be asking about the game which is not present in the games.csv
+
+        # Check if there is a game name mentioned in the input
+        elif is_game_in_input(tokens):
+            return (idle_state, ["I am sorry! We currently don't have the game you're looking for. Could you please specify another game?"])
+
+        # If the game in context is not empty, the user is asking about the game in context
+        elif game_in_context != "":
+            # Show the requested details
+            return (idle_state, [get_intent_based_game_data(game_in_context, state.intent)])
+        
+        # If it's neither of the case, handle the error
+        else:
+            # Show a default message and move on
+            return (idle_state, ["Ugghh! Looks like I am having difficulty processing your request. Could you please rephrase your request again?"])
+                
+    # if the similarity score falls between 45% to 79%          
+    elif similarity_score >= 0.45 and similarity_score < 0.80:
+        # Ask the user to confirm the guess, if the guess is not right the user will be reprompted
+        return ask_confirmation(state, matched_game, Stage.AWAITING_GAME_REPROMPT, get_alternative_games(candidates))
+
+    # If the similarity is more than 80%
+    else:
+        return show_game_data(state, matched_game)
+
+def resolve_game_in_context(state: SessionState, tokens: list[str]) -> tuple[SessionState, list[str]]:
+    """
+    Helper function to resolve the game which needs to be stored in context (preference)
+    
+    Parameters
+    ----------
+        state: SessionState
+            Current state of the conversation
+        tokens: list[str]
+            user input in the form of tokens
+
+    Returns
+    -------
+        tuple[SessionState, list[str]]
+            New state of the conversation and the messages to display
+    """
+    # If the title is found in the input, even with typos, there is no need to guess
+    resolved_game = resolve_game(tokens)
+    if resolved_game is not None:
+        return show_game_data(state, resolved_game)
+
+    # Check if the game matches any games by using the extract_game_candidates helper function
+    candidates = extract_game_candidates(tokens=tokens, k=constants.GAME_CANDIDATES)
+    similarity_score, matched_game = candidates[0]
+
+    # If the similarity score is less than 45%
+    if similarity_score < 0.45:
+        # If the game is present in the input
+        if is_game_in_input(tokens=tokens):
+            return (state, ["I'm sorry, we don't have the game which you are looking for? Can you please provide a different game name?"])
+        # Reprompt
         else:
-            # Print the message and continue the loop
-            print(f"{constants.CHATBOT_NAME}: I'm sorry, I didn't understand that.") 
+            return (state, ["I'm sorry, I didn't get that. Could you please provide me the name of the game again?"])
+    
+    # If the similarity score is between 45% to 79%
+    elif similarity_score >= 0.45 and similarity_score < 0.80:
+        # Ask the user to confirm the guess, if the guess is not right the user will be asked for the game again
+        return ask_confirmation(state, matched_game, Stage.AWAITING_GAME_NAME, get_alternative_games(candidates))
 
-    return correct_guess 
+    # If the similarity score is more than 80%        
+    else:
+        return show_game_data(state, matched_game)
 
-def handle_game_in_context(intent: str) -> None:
+def begin_game_fact(state: SessionState, tokens: list[str], intent: str) -> tuple[SessionState, list[str]]:
     """
-    Helper function to store the game in context (preference)
+    Helper function to start handling a game fact request
     
     Parameters
     ----------
+        state: SessionState
+            Current state of the conversation
+        tokens: list[str]
+            user input in the form of tokens
         intent: str
-            The recognized intent of the input
+            The intent recognized
 
     Returns
     -------
-        None
-    """ 
-    print(f"{constants.CHATBOT_NAME}: Could you please tell me the name of the game you are looking for?")
+        tuple[SessionState, list[str]]
+            New state of the conversation and the messages to display
+    """
+    return resolve_game_fact(replace(state, stage=Stage.IDLE, intent=intent), tokens)
 
-    # Initiate an infinite loop
-    while True:
-        # Get the user input
-        user_input = input(f"{constants.USER}: ")
-
-        # Tokenize the input
-        tokens = word_tokenize(user_input)
-
-        # Check if the game matches any games by using the extract_game helper function
-        similarity_score, matched_game = extract_game(tokens=tokens)
-
-        # If the similarity score is less than 45%
-        if similarity_score < 0.45:
-            # If the game is present in the input
-            if is_game_in_input(tokens=tokens):
-                print(f"{constants.CHATBOT_NAME}: I'm sorry, we don't have the game which you are looking for? Can you please provide a different game name?")
-            # Reprompt
-            else:
-                print(f"{constants.CHATBOT_NAME}: I'm sorry, I didn't get that. Could you please provide me the name of the game again?")
-        
-        # If the similarity score is between 45% to 79%
-        elif similarity_score >= 0.45 and similarity_score < 0.80:
-            # Invoke the helper function to handle this logic
-            correct_guess = handle_intermediate_confidence(matched_game)
+def game_fact_step(state: SessionState, user_input: str) -> tuple[SessionState, list[str]]:
+    """
+    Function to handle one user message while a game fact request is waiting for the game or a confirmation
+    
+    Parameters
+    ----------
+        state: SessionState
+            Current state of the conversation
+        user_input: str
+            The actual input in str format from the user
 
-            # Check if it was the right guess
-            if correct_guess:
+    Returns
+    -------
+        tuple[SessionState, list[str]]
+            New state of the conversation and the messages to display
+    """
+    # Wait for the tokenizer which is being loaded in the background
+    wait_until_ready("punkt")
 
-                # Update the preference to reflect the new game in context
-                update_preferences("game_in_context", matched_game)
+    match state.stage:
+        case Stage.AWAITING_CONFIRMATION:
+            correct_guess = parse_confirmation(user_input)
 
-                # Implicitly confirm and show the results
-                print(f"{constants.CHATBOT_NAME}: Thanks for the confirmation. Here are the details you requested for.")
+            # If the user types anything other than yes/no, ask again
+            if correct_guess is None:
+                return (state, [CONFIRMATION_REPROMPT, get_confirmation_message(state.candidate_game)])
 
-                # Print the details as requested
-                print(f"{constants.CHATBOT_NAME}: {get_intent_based_game_data(matched_game, intent)}")
+            # If the guess is right
+            if correct_guess:
+                return show_game_data(state, state.candidate_game, confirmed=True)
 
-                # Break the loop
-                break
+            # If the guess is not right, offer the next most likely game
+            if state.alternative_games:
+                return ask_confirmation(state, state.alternative_games[0], state.rejection_stage, state.alternative_games[1:])
 
-            else:
-                # Ask the user to provide the name of the game again
-                print(f"{constants.CHATBOT_NAME}: Ok, could you please tell me the name of the game again?") 
+            # If there are no more games to offer, ask the user to provide the name of the game again
+            return (replace(state, stage=state.rejection_stage, candidate_game=None, rejection_stage=None), [GAME_NAME_REPROMPT])
 
-        # If the similarity score is more than 80%        
-        else:
-            # Update the preference to reflect the new game in context
-            update_preferences("game_in_context", matched_game)
+        case Stage.AWAITING_GAME_NAME:
+            return resolve_game_in_context(state, word_tokenize(user_input))
 
-            # Print the details as requested
-            print(f"{constants.CHATBOT_NAME}: {get_intent_based_game_data(matched_game, intent)}")
+        case _:
+            # Preprocess the user input and resolve the game again
+            return resolve_game_fact(state, word_tokenize(user_input))
+
+def handle_game_in_context(intent: str) -> None:
+    """
+    Helper function to store the game in context (preference)
+    
+    Parameters
+    ----------
+        intent: str
+            The recognized intent of the input
 
-            # Break the loop
-            break
+    Returns
+    -------
+        None
+    """ 
+    run_dialog(new_session_state(Stage.AWAITING_GAME_NAME, intent=intent), [GAME_NAME_MESSAGE], game_fact_step)
 
 def handle_game_fact(tokens: list[str], intent: str) -> None:
     """
@@ -276,75 +521,5 @@ def handle_game_fact(tokens: list[str], intent: str) -> None:
     -------
         None
     """
-    # Assume the repromt to be true to enter the loop
-    reprompt = True
-
-    # Initiate a loop if reprompt is true
-    while reprompt:
-
-        # Immediately set the reprompt to false so that it can be set true only if we want to repromt the user
-        reprompt = False
-
-        # Get the similarity score and matched game by calling the helper function
-        similarity_score, matched_game = extract_game(tokens=tokens)
-
-        # If the similarity score is less than 45%
-        if similarity_score < 0.45:
-            # Get the game in context
-            game_in_context = get_preference("game_in_context")
-
-            # If the game in context is empty
-            if game_in_context == "":
-                # Handle the logic to store the game in context and display the results accordingly
-                handle_game_in_context(intent=intent)
-            
-            # If the game in context is not empty
-            # This can either mean that the user is asking something about the game in context or he might be asking about the game which is not present in the games.csv
-
-            # Check if there is a game name mentioned in the input
-            elif is_game_in_input(tokens):
-                print(f"{constants.CHATBOT_NAME}: I am sorry! We currently don't have the game you're looking for. Could you please specify another game?")
-
-            # If the game in context is not empty, the user is asking about the game in context
-            elif game_in_context != "":
-                # Print the requested details
-                print(f"{constants.CHATBOT_NAME}: {get_intent_based_game_data(game_in_context, intent)}")
-            
-            # If it's neither of the case, handle the error
-            else:
-                # Print a default message and move on
-                print(f"{constants.CHATBOT_NAME}: Ugghh! Looks like I am having difficulty processing your request. Could you please rephrase your request again?")
-                    
-        # if the similarity score falls between 45% to 79%          
-        elif similarity_score >= 0.45 and similarity_score < 0.80:
-            # Execute the helper function to handle the logic
-            correct_guess = handle_intermediate_confidence(matched_game)
-
-            # If the guess is not right
-            if not correct_guess:
-                # Set the reprompt to true to continue the loop
-                reprompt = True
-                # Reprompt the user
-                print(f"{constants.CHATBOT_NAME}: Ok, could you please tell me the name of the game again?")
-                # Get the user input
-                reprompt_input = input(f"{constants.USER}: ")
-                # Preprocess the userinput
-                tokens = word_tokenize(reprompt_input)
-                # Continue to execute the loop without moving to the next step
-                continue
-
-            # If the guess is right
-            # Update the prefererence
-            update_preferences("game_in_context", matched_game)
-            # Implicitly confirm 
-            print(f"{constants.CHATBOT_NAME}: Thanks for the confirmation. Here are the details you requested for.")
-            # Print the requested details
-            print(f"{constants.CHATBOT_NAME}: {get_intent_based_game_data(matched_game, intent)}")
-
-        # If the similarity is more than 80%
-        else:
-            # Update the preference to store the game in context
-            update_preferences("game_in_context", matched_game)
-
-            # print the requested response
-            print(f"{constants.CHATBOT_NAME}: {get_intent_based_game_data(matched_game, intent)}")
+    state, messages = begin_game_fact(new_session_state(Stage.IDLE), tokens, intent)
+    run_dialog(state, messages, game_fact_step)
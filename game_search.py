@@ -1,8 +1,13 @@
-from nltk.tokenize import word_tokenize
+from dataclasses import replace
 from utils import constants
+from utils.warmup import wait_until_ready
+from utils.session import SessionState, Stage, new_session_state, print_messages, run_dialog
 from utils.helpers import get_similar_result
-import pandas as pd
-from nltk.corpus import stopwords
+from utils.game_catalog import get_game_catalog
+from utils.lexicon import GENRE, PLATFORM, get_entity_lexicon
+from utils.metrics import Stages, stage
+from utils.tokenizer import word_tokenize
+import random
 
 # Constant messages for different types
 GENRE_MESSAGE = "Certainly! Could you please tell me what genre are you looking for? Currently, we only have Action, Adventure, Puzzle games."
@@ -52,30 +57,20 @@ def extract_genre_platform(tokens: list[str]) -> tuple[str | None]:
         tuple[str | None]
             tuple having genre and platform if present
     """
-    # Remove stopwords from the token to reduce the list
-    tokens = [word.lower() for word in tokens if word.lower() not in stopwords.words("english")]
-
-    # Initialize empty lists
-    captured_platforms = []
-    captured_genres = []
-
-    # Loop through tokens and check if any of the tokens are present in available platforms or available genres
-    for token in tokens:
-        if token in constants.AVAILABLE_PLATFORMS:
-            captured_platforms.append(token)
-        if token in constants.AVAILABLE_GENRES:
-            captured_genres.append(token)
+    # Find the canonical genres and platforms in a single pass over the tokens
+    with stage(Stages.ENTITY_EXTRACTION):
+        entities = get_entity_lexicon().extract(tokens)
 
     # Concatenate the list to form a comma seperated string
-    captured_platform_string = ",".join(captured_platforms) if captured_platforms else None
-    captured_genre_string = ",".join(captured_genres) if captured_genres else None
+    captured_platform_string = ",".join(entities[PLATFORM]) if entities[PLATFORM] else None
+    captured_genre_string = ",".join(entities[GENRE]) if entities[GENRE] else None
     
     # Return the captured genre or captured platform from the user input tokens
     return (captured_genre_string, captured_platform_string)
 
 
 
-def search_game(genre: str, platform: str) -> list[str]:
+def search_game(genre: str, platform: str) -> tuple[list[str], int]:
     """
     Helper function to search games in games.csv by using their genre and platform
     
@@ -88,41 +83,68 @@ def search_game(genre: str, platform: str) -> list[str]:
 
     Returns
     -------
-        list[str]
-            List of games in random order
+        tuple[list[str], int]
+            List of at most 5 games in random order and the total number of games matching the criteria
     """
 
-    # Read the csv file to dataframe
-    df = pd.read_csv("data/games.csv")
+    with stage(Stages.CATALOG_SEARCH):
+        return _search_game(genre, platform)
+
+def _search_game(genre: str, platform: str) -> tuple[list[str], int]:
+    # Get the shared games catalog
+    catalog = get_game_catalog()
+
+    # Collect the keywords which need to be present in each column
+    criteria = {}
 
     # Check if the genre is available
     if genre != "na":
         # Split the string into list of keywords
-        genre_list = genre.split(",")
-
-        # Filter the games belonging to the given genre
-        df = df[df["genre"].apply(lambda x: all(keyword in x.lower() for keyword in genre_list))]
+        criteria["genre"] = genre.split(",")
 
     # Check if the platform is available
     if platform != "na":
         # Split the string into list of keywords
-        platform_list = platform.split(",")
-
-        # Filter the games belonging to the given platform
-        df = df[df["platform"].apply(lambda x: all(keyword in x.lower() for keyword in platform_list))]
+        criteria["platform"] = platform.split(",")
 
-    # Pick only the name and short_description column from the data frame
-    result_df = df[["name", "short_description"]]
+    # Get the games matching all the keywords from the inverted index
+    rows = catalog.filter(criteria)
+    match_count = len(rows)
 
     # If the results are greater than 5, pick only 5 in random order
-    if len(result_df) > 5:
-        selected_records = result_df.sample(n=5)
-        return [f"({row['name']}) {row['short_description']}" for index, row in selected_records.iterrows()]
+    selected_rows = random.sample(range(match_count), 5) if match_count > 5 else range(match_count)
+
+    # Pick only the name and short_description of the selected games
+    return (
+        [f"({catalog.get(rows[index], 'name')}) {catalog.get(rows[index], 'short_description')}" for index in selected_rows],
+        match_count
+    )
     
-    # Else, display the results as it is
-    else:
-        return [f"({row['name']}) {row['short_description']}" for index, row in result_df.iterrows()]
+def get_game_list_message(game_list: list[str], platform_result_response: str) -> str:
+    """
+    Helper function to get the message displaying the list of games from the game_list or an alternate message
     
+    Parameters
+    ----------
+        game_list: list[str]
+            list containing games along with their short description
+        platform_result_response: str
+            Response from the game_search.csv which needs to be displayed
+
+    Returns
+    -------
+        str
+            message that needs to be displayed
+    """ 
+    # Check if game list is empty or not
+    if game_list:
+        return f"Alright! Here is a list of games {platform_result_response}:" + "".join(
+            f"\n\n{index+1}. {game}\n" for index, game in enumerate(game_list)
+        )
+    else:
+        # Default message
+        return "Hmmm, looks like we don't have any games matching your criteria."
+
 def list_games(game_list: list[str], platform_result_response: str) -> None:
     """
     Helper function to display list of games from the game_list or display an alternate message
@@ -138,21 +160,42 @@ def list_games(game_list: list[str], platform_result_response: str) -> None:
     -------
         None
     """ 
-    # Check if game list is empty or not
-    if game_list:
-        print(f"{constants.CHATBOT_NAME}: Alright! Here is a list of games {platform_result_response}:")
-        for index, game in enumerate(game_list):
-            print(f"\n{index+1}. {game}\n")
-    else:
-        # Print default message
-        print(f"{constants.CHATBOT_NAME}: Hmmm, looks like we don't have any games matching your criteria.")  
+    print_messages([get_game_list_message(game_list, platform_result_response)])
 
-def handle_game_search(captured_genre: str | None, captured_platform: str | None) -> None:
+def finish_game_search(state: SessionState) -> tuple[SessionState, list[str]]:
     """
-    Helper function to handle logic when intent is game_search
+    Helper function to search the games once the genre and platform are known
+    
+    Parameters
+    ----------
+        state: SessionState
+            Current state of the conversation
+
+    Returns
+    -------
+        tuple[SessionState, list[str]]
+            New state of the conversation and the messages to display
+    """
+    # Execute search game function to get the game list
+    game_list, _ = search_game(state.genre_result if state.genre_result else state.genre, state.platform_result if state.platform_result else state.platform)
+
+    # Display the game list if available
+    message = get_game_list_message(game_list, state.platform_result_response if state.platform_result and state.platform_result != 'na' else '')
+
+    # The search is complete, go back to idle
+    return (
+        replace(state, stage=Stage.IDLE, intent=None, genre=None, platform=None, genre_result=None, platform_result=None, platform_result_response=None),
+        [message]
+    )
+
+def begin_game_search(state: SessionState, captured_genre: str | None, captured_platform: str | None) -> tuple[SessionState, list[str]]:
+    """
+    Helper function to start a game search with the genre and platform captured from the request
     
     Parameters
     ----------
+        state: SessionState
+            Current state of the conversation
         captured_genre: str | None
             genre of the game if it is present in tokens
         captured_platform: str | None
@@ -160,58 +203,88 @@ def handle_game_search(captured_genre: str | None, captured_platform: str | None
 
     Returns
     -------
-        None
+        tuple[SessionState, list[str]]
+            New state of the conversation and the messages to display
     """
+    state = replace(state, genre=captured_genre, platform=captured_platform, genre_result=None, platform_result=None, platform_result_response=None)
 
-    # Initialize genre result and platform result to None
-    genre_result = platform_result = None
-
-    # Initiate a loop if captured genre is None
-    while not captured_genre:
-        genre_input = input(f"{constants.USER}: ")
-        genre_input_tokens = word_tokenize(genre_input)
-        # Get genre result, genre result response, genre result type by executing get_similar_result
-        genre_result, genre_result_response, genre_result_type = get_similar_result(
-            tokens=genre_input_tokens,
-            file_name=constants.GAME_SEARCH_PATH,
-            query_header_name="keyword",
-            result_header_name=["value", "response", "type"],
-            threshold=0.6
-        )
-        
+    # Wait for the genre if it is not captured
+    if not captured_genre:
+        return (replace(state, stage=Stage.AWAITING_GENRE), [])
+
+    # Wait for the platform if it is not captured
+    if not captured_platform:
+        return (replace(state, stage=Stage.AWAITING_PLATFORM), [])
+
+    return finish_game_search(state)
+
+def game_search_step(state: SessionState, user_input: str) -> tuple[SessionState, list[str]]:
+    """
+    Function to handle one user message while a game search is waiting for the genre or the platform
+    
+    Parameters
+    ----------
+        state: SessionState
+            Current state of the conversation
+        user_input: str
+            The actual input in str format from the user
+
+    Returns
+    -------
+        tuple[SessionState, list[str]]
+            New state of the conversation and the messages to display
+    """
+    # Wait for the tokenizer which is being loaded in the background
+    wait_until_ready("punkt")
+
+    input_tokens = word_tokenize(user_input)
+
+    # Get result, result response, result type by executing get_similar_result
+    result, result_response, result_type = get_similar_result(
+        tokens=input_tokens,
+        file_name=constants.GAME_SEARCH_PATH,
+        query_header_name="keyword",
+        result_header_name=["value", "response", "type"],
+        threshold=0.6
+    )
+
+    if state.stage == Stage.AWAITING_GENRE:
         # Check if genre_result is available
-        if genre_result == "not_found" or "genre" not in genre_result_type:
-            print(f"{constants.CHATBOT_NAME}: {GENRE_REPROMPT}")
-            continue
-        
+        if result == "not_found" or "genre" not in result_type:
+            return (state, [GENRE_REPROMPT])
+
+        state = replace(state, genre_result=result)
+        messages = [f"{result_response}. {PLATFORM_MESSAGE if not state.platform else ''}"]
+
         # Continue execution if platform is not captured before
-        print(f"{constants.CHATBOT_NAME}: {genre_result_response}. {PLATFORM_MESSAGE if not captured_platform else ''}")
-        break
-
-    # Initiate a loop if platform is not captured
-    while not captured_platform:
-        platform_input = input(f"{constants.USER}: ")
-        platform_input_tokens = word_tokenize(platform_input)
-
-        # Get similar results
-        platform_result, platform_result_response, platform_result_type = get_similar_result(
-            tokens=platform_input_tokens,
-            file_name=constants.GAME_SEARCH_PATH,
-            query_header_name="keyword",
-            result_header_name=["value", "response", "type"],
-            threshold=0.6
-        )
-        
+        if not state.platform:
+            return (replace(state, stage=Stage.AWAITING_PLATFORM), messages)
+
+    else:
         # Check if platform is found
-        if platform_result == "not_found" or "platform" not in platform_result_type:
-            print(f"{constants.CHATBOT_NAME}: {PLATFORM_REPROMPT}")
-            continue
-        
-        break
-    
-    # Execute search game function to get the game list
-    game_list = search_game(genre_result if genre_result else captured_genre, platform_result if platform_result else captured_platform)
+        if result == "not_found" or "platform" not in result_type:
+            return (state, [PLATFORM_REPROMPT])
 
-    # Display the game list if available
-    list_games(game_list, platform_result_response if platform_result and platform_result != 'na' else '')
+        state = replace(state, platform_result=result, platform_result_response=result_response)
+        messages = []
+
+    new_state, search_messages = finish_game_search(state)
+    return (new_state, messages + search_messages)
 
+def handle_game_search(captured_genre: str | None, captured_platform: str | None) -> None:
+    """
+    Helper function to handle logic when intent is game_search
+    
+    Parameters
+    ----------
+        captured_genre: str | None
+            genre of the game if it is present in tokens
+        captured_platform: str | None
+            platform of the game if it is present in tokens
+
+    Returns
+    -------
+        None
+    """
+    state, messages = begin_game_search(new_session_state(Stage.IDLE), captured_genre, captured_platform)
+    run_dialog(state, messages, game_search_step)
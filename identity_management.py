@@ -1,10 +1,18 @@
-from nltk import word_tokenize, pos_tag, ne_chunk
+from dataclasses import replace
 from utils.preference import update_preferences
+from utils.session import SessionState, Stage, new_session_state, run_dialog
 from utils import constants
+from utils.warmup import wait_until_ready
+from utils.names import get_name_extractor
+from utils.tokenizer import word_tokenize
+from preprocessing import pipeline
 
-def capture_user_name(user_name_input: str) -> str | None:
+# Message used to reprompt the user when the name couldn't be captured
+USERNAME_REPROMPT = "Sorry, I couldn't understand. Could you please provide me with your name?"
+
+def chunk_user_name(user_name_input: str) -> str | None:
     """
-    Function to capture user's last name from the input
+    Function to extract user's last name from the input with the named entity chunker
 
     Parameters
     ----------
@@ -16,15 +24,17 @@ def capture_user_name(user_name_input: str) -> str | None:
     str | None
         return the last extracted name from the input if found
     """
+    # Wait for the models which are being loaded in the background
+    wait_until_ready("punkt", "tagger", "ne_chunker")
 
     # Tokenize the text
     tokens = word_tokenize(user_name_input)
 
-    # Tag the tokens with their part-of-speech (POS) tags
-    pos_tags = pos_tag(tokens)
+    # Tag the tokens with their part-of-speech (POS) tags, same as pos_tag but with the already loaded tagger
+    pos_tags = pipeline.tagger.tag(tokens)
 
-    # Chunk the POS-tagged tokens into named entities (NER)
-    chunks = ne_chunk(pos_tags)
+    # Chunk the POS-tagged tokens into named entities (NER), same as ne_chunk but with the already loaded chunker
+    chunks = pipeline.ne_chunker.parse(pos_tags)
 
     # Initialize empty list
     extracted_names = []
@@ -38,14 +48,59 @@ def capture_user_name(user_name_input: str) -> str | None:
         elif chunk[1] == "NNP":
             extracted_names.append(chunk[0])
 
-    # If extracted_names list is not empty
-    if extracted_names:
-        # Return the last name
-        update_preferences("username", extracted_names[-1])
-        return extracted_names[-1]
-    # Return None if the extracted_names list is empty
-    else:
-        return None 
+    # Return the last name if any was found
+    return extracted_names[-1] if extracted_names else None
+
+def capture_user_name(user_name_input: str) -> str | None:
+    """
+    Function to capture user's last name from the input
+
+    Introductions, bare names and names of the gazetteer are matched right away, only the
+    other inputs go through the named entity chunker.
+
+    Parameters
+    ----------
+    user_name_input : str
+        input text from the user
+
+    Returns
+    -------
+    str | None
+        return the last extracted name from the input if found
+    """
+    username = get_name_extractor().extract(user_name_input, chunk_user_name)
+
+    # Store the name if one was found
+    if username:
+        update_preferences("username", username)
+    return username
+
+def capture_username_step(state: SessionState, user_name_input: str) -> tuple[SessionState, list[str]]:
+    """
+    Function to handle one user message while waiting for the user's name
+
+    Parameters
+    ----------
+        state: SessionState
+            Current state of the conversation
+        user_name_input: str
+            input text from the user
+
+    Returns
+    -------
+        tuple[SessionState, list[str]]
+            New state of the conversation and the messages to display
+    """
+    captured_username = capture_user_name(user_name_input)
+
+    # Reprompt and keep waiting if the name couldn't be captured
+    if not captured_username:
+        return (state, [USERNAME_REPROMPT])
+
+    return (
+        replace(state, stage=Stage.IDLE),
+        [f"Great! Thanks {captured_username}. How may I assist you today?"]
+    )
 
 def handle_capture_username() -> None:
     """
@@ -60,13 +115,5 @@ def handle_capture_username() -> None:
         None
     """
 
-    # Initializing the captured_username to None
-    captured_username = None
-
-    # Initiate a loop and continue till the username is not captured
-    while not captured_username:
-        user_name_input = input(f"{constants.USER}: ")
-        captured_username = capture_user_name(user_name_input)
-        if not captured_username:
-            print(f"{constants.CHATBOT_NAME}: Sorry, I couldn't understand. Could you please provide me with your name?")
-    print(f"{constants.CHATBOT_NAME}: Great! Thanks {captured_username}. How may I assist you today?")
\ No newline at end of file
+    # Continue the loop till the username is not captured
+    run_dialog(new_session_state(Stage.AWAITING_USERNAME), [], capture_username_step)
@@ -1,15 +1,51 @@
-import pandas as pd
 import random
+import re
+import threading
+from utils import constants
 from utils.helpers import get_similar_result, string_replacement_dict
+from utils.matcher import MatchQuery, get_matcher_index, get_multi_head_matcher
+from utils.metrics import Stages, registry, stage
+from utils.resources import get_cached_resource
 
-def get_intent(tokens: list[str]) -> str:
+# Same terms as the default analyzer of the TF-IDF vectorizers, lower case words of two characters or more
+TERM_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+# Lookups of the intent table and how many of them were hits
+_table_counts = {"lookups": 0, "hits": 0}
+_table_counts_lock = threading.Lock()
+
+# Utterances classified from the raw text and utterances which needed the full pre-processing
+_cascade_counts = {"confident": 0, "escalated": 0}
+_cascade_counts_lock = threading.Lock()
+
+def normalize_tokens(tokens: list[str]) -> tuple[str, ...]:
     """
-    Function to get the intent by using the input text tokens
+    Function to get the terms the TF-IDF vectorizer sees for the tokens
+
+    Two inputs with the same terms have the same TF-IDF vector, so they get the same intent.
+
+    Parameters
+    ----------
+        tokens: list[str]
+            Tokens generated from pre-processing the user input
+
+    Returns
+    -------
+        tuple[str, ...]
+            Case folded terms without punctuation, in order
+    """
+    return tuple(TERM_PATTERN.findall(" ".join(tokens).lower()))
+
+def match_intent(tokens: list[str], query: MatchQuery | None = None) -> str:
+    """
+    Function to get the intent with the TF-IDF vectorizer and cosine similarity
     
     Parameters
     ----------
         tokens: list[str]
             Tokens generated from pre-processing the user input
+        query: MatchQuery | None
+            The tokens already vectorized by the multi-head matcher
 
     Returns
     -------
@@ -20,9 +56,231 @@ def get_intent(tokens: list[str]) -> str:
     # Using helper function to get the similar intent
     return get_similar_result(
         tokens=tokens,
-        file_name="data/intent.csv",
+        file_name=constants.INTENT_PATH,
         query_header_name="value",
-        result_header_name="intent"
+        result_header_name="intent",
+        query=query
+    )
+
+def build_intent_table(file_name: str) -> dict[tuple[str, ...], str]:
+    """
+    Function to map the normalized training utterances to their intents
+
+    Every utterance is pre-processed like a user input and the intent stored for its terms is the
+    one the TF-IDF matching gives for them, so a hit always agrees with the full matching.
+
+    Parameters
+    ----------
+        file_name: str
+            Path of the intent file
+
+    Returns
+    -------
+        dict[tuple[str, ...], str]
+            Intent of the terms of every training utterance
+    """
+    import csv
+    from preprocessing import preprocess_text
+
+    with open(file_name, newline="", encoding="utf-8") as f:
+        utterances = {row["value"] for row in csv.DictReader(f)}
+
+    matcher = get_multi_head_matcher()
+    table: dict[tuple[str, ...], str] = {}
+    for utterance in sorted(utterances):
+        terms = normalize_tokens(preprocess_text(utterance))
+        if terms not in table:
+            table[terms] = match_intent(list(terms), matcher.query(" ".join(terms)))
+    return table
+
+def get_intent_table() -> dict[tuple[str, ...], str]:
+    """
+    Function to get the intent of the normalized training utterances, built once and rebuilt only when the file changes
+
+    Parameters
+    ----------
+        None
+
+    Returns
+    -------
+        dict[tuple[str, ...], str]
+            Intent of the terms of every training utterance
+    """
+    return get_cached_resource(
+        key=("intent_table", constants.INTENT_PATH),
+        path=constants.INTENT_PATH,
+        builder=lambda: build_intent_table(constants.INTENT_PATH)
+    )
+
+def get_intent(tokens: list[str], query: MatchQuery | None = None) -> str:
+    """
+    Function to get the intent by using the input text tokens
+
+    Inputs having the same terms as a training utterance are looked up in the intent table,
+    only the other inputs are vectorized and matched.
+    
+    Parameters
+    ----------
+        tokens: list[str]
+            Tokens generated from pre-processing the user input
+        query: MatchQuery | None
+            The tokens already vectorized by the multi-head matcher
+
+    Returns
+    -------
+        str:
+            The intent from the user input
+    """
+    with stage(Stages.INTENT_MATCH):
+        intent = get_intent_table().get(normalize_tokens(tokens))
+
+        with _table_counts_lock:
+            _table_counts["lookups"] += 1
+            _table_counts["hits"] += intent is not None
+
+        return intent if intent is not None else match_intent(tokens, query)
+
+def intent_table_hit_rate() -> dict[str, float]:
+    """
+    Function to get how many intents were found in the intent table
+
+    Parameters
+    ----------
+        None
+
+    Returns
+    -------
+        dict[str, float]
+            Number of lookups and hits and the share of the lookups which were hits
+    """
+    with _table_counts_lock:
+        lookups, hits = _table_counts["lookups"], _table_counts["hits"]
+    return {"lookups": lookups, "hits": hits, "hit_ratio": hits / lookups if lookups else 0.0}
+
+registry.register_gauge("intent_table", intent_table_hit_rate)
+
+def get_confident_intent(text: str, margin: float | None = constants.INTENT_CASCADE_MARGIN) -> str | None:
+    """
+    Function to get the intent from the raw text alone, without POS tagging and lemmatizing it
+
+    The text is only split into lower case words by the TF-IDF analyzer. The intent is returned if
+    its best row passes the similarity threshold and leads the best row of any other intent by the margin.
+
+    Parameters
+    ----------
+        text: str
+            The actual input in str format from the user
+        margin: float | None
+            Lead needed over the best other intent, None to never classify the raw text
+
+    Returns
+    -------
+        str | None
+            The intent, None if the full pre-processing is needed to classify the text
+    """
+    if margin is None:
+        return None
+
+    with stage(Stages.INTENT_MATCH):
+        index = get_matcher_index(constants.INTENT_PATH, "value")
+        query = get_multi_head_matcher().query(text)
+
+        def score_rows(k: int) -> list[tuple[float, int]]:
+            if query.has_head(constants.INTENT_PATH, "value"):
+                return query.top_k(constants.INTENT_PATH, "value", k)
+            return index.top_k(text, k)
+
+        k = constants.INTENT_CASCADE_CANDIDATES
+        candidates = score_rows(k)
+
+        intent = None
+        if candidates and candidates[0][0] >= constants.DEFAULT_SIMILARITY_THRESHOLD:
+            top_score, top_row = candidates[0]
+            top_intent = index.get_value(top_row, "intent")
+            # Score more rows while they all have the top intent, so that the runner-up is the exact score of the
+            # best row of another intent and the margin is the lead over every other intent, never over the rows
+            # of the top intent itself. It is 0.0 if every row of the index has the top intent
+            while True:
+                runner_up = next((score for score, row in candidates[1:] if index.get_value(row, "intent") != top_intent), None)
+                if runner_up is not None or k >= len(index):
+                    break
+                k *= 4
+                candidates = score_rows(k)
+            if top_score - (runner_up or 0.0) >= margin:
+                intent = top_intent
+
+    with _cascade_counts_lock:
+        _cascade_counts["confident" if intent is not None else "escalated"] += 1
+    return intent
+
+def classify_intent(text: str, margin: float | None = constants.INTENT_CASCADE_MARGIN) -> str:
+    """
+    Function to get the intent of the text, pre-processing it only if the raw text is not clear enough
+
+    Parameters
+    ----------
+        text: str
+            The actual input in str format from the user
+        margin: float | None
+            Lead needed over the best other intent to classify the raw text, None to always pre-process it
+
+    Returns
+    -------
+        str
+            The intent of the text
+    """
+    from preprocessing import preprocess_text
+
+    intent = get_confident_intent(text, margin)
+    return intent if intent is not None else get_intent(preprocess_text(text))
+
+def intent_cascade_counts() -> dict[str, int]:
+    with _cascade_counts_lock:
+        return dict(_cascade_counts)
+
+registry.register_gauge("intent_cascade", intent_cascade_counts)
+
+def load_intent_responses(file_name: str) -> dict[str, list[str]]:
+    """
+    Function to load the responses of every intent from the intent_response.csv
+
+    Parameters
+    ----------
+        file_name: str
+            Path of the file
+
+    Returns
+    -------
+        dict[str, list[str]]
+            Responses of every intent, in the order of the file
+    """
+    import pandas as pd
+
+    # Load the intent_response.csv
+    df = pd.read_csv(file_name)
+
+    responses: dict[str, list[str]] = {}
+    for intent, response in zip(df['intent'].tolist(), df['response'].tolist()):
+        responses.setdefault(intent, []).append(response)
+    return responses
+
+def get_intent_responses() -> dict[str, list[str]]:
+    """
+    Function to get the responses of every intent, loaded once and reloaded only when the file changes
+
+    Parameters
+    ----------
+        None
+
+    Returns
+    -------
+        dict[str, list[str]]
+            Responses of every intent
+    """
+    return get_cached_resource(
+        key=("intent_responses", constants.INTENT_RESPONSE_PATH),
+        path=constants.INTENT_RESPONSE_PATH,
+        builder=lambda: load_intent_responses(constants.INTENT_RESPONSE_PATH)
     )
 
 def get_intent_response(intent: str) -> str:
@@ -40,16 +298,13 @@ def get_intent_response(intent: str) -> str:
             The response for the given intent
     """
 
-    # Load the intent_response.csv 
-    df = pd.read_csv('data/intent_response.csv')
-    
     # Get only the responses for the given intent
-    intent_response_df = df[df['intent'] == intent]
+    responses = get_intent_responses().get(intent)
 
     # Check if the given intent has any responses
-    if not intent_response_df.empty:
+    if responses:
         # Get a random response from the list of responses
-        response = random.choice(intent_response_df['response'].tolist())
+        response = random.choice(responses)
             # Check if the matched answer can be further processed
         for key in string_replacement_dict.keys():
             if key in response:
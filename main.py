@@ -1,19 +1,25 @@
+import argparse
 from utils import constants
-from process import chatbot_response
-from identity_management import handle_capture_username
-from utils.preference import clear_preferences
+from process import process_turn
+from utils.session import Stage, new_session_state, print_messages, read_input
+from utils.preference import clear_preferences, expire_sessions, flush_preferences
+from utils.warmup import start_warmup
+from utils.reload import start_reload_watcher
+from utils.metrics import JsonDumpExporter, enable_metrics
+from utils.tokenizer import TOKENIZERS, set_tokenizer
 
 """
 Before executing this program, please download the following packages
 by doing nltk.download(<package_name>)
 
-1. punkt
+1. punkt (not needed with --tokenizer regex)
 2. stopwords
 3. wordnet
 4. averaged_perceptron_tagger
 5. universal_tagset
 6. maxent_ne_chunker
 7. words
+8. names (optional, names in it are recognized without the chunker)
 """
 
 def main():
@@ -30,36 +36,109 @@ def main():
     """
 
     # Welcome user and capture user's username
-    print(f"{constants.CHATBOT_NAME}: Welcome to {constants.STORE_NAME}! My name is {constants.CHATBOT_NAME}")
-    print(f"{constants.CHATBOT_NAME}: May I know your name?")
+    print_messages([f"Welcome to {constants.STORE_NAME}! My name is {constants.CHATBOT_NAME}", "May I know your name?"])
 
-    #Initiate a loop to capture username
-    handle_capture_username()
-    
-    # Initiating IO loop
-    while True:
+    # Load the models and the indexes in the background while the user is typing
+    start_warmup()
+    # Pick up the edits of the data files without a restart
+    start_reload_watcher()
+
+    # The conversation starts by capturing the username
+    state = new_session_state(Stage.AWAITING_USERNAME)
+
+    # Initiating IO loop till the user quits chatting
+    while state.stage != Stage.ENDED:
 
         # Getting the user input
-        user_input = input(f"{constants.USER}: ")
-
-        # Getting the chatbot response
-        response = chatbot_response(user_input=user_input)
-
-        # Check if user wants to quit chatting
-        if response.intent == "goodbye":
-            print(f"{constants.CHATBOT_NAME}: {response}")
-            # Break the loop if the user quits
-            break
-        
-        # Continue to print the response from chatbot
-        print(f"{constants.CHATBOT_NAME}: {response}")
-        
-        # If chatbot response has additional function to execute
-        if response.function_to_execute:
-            response.function_to_execute()
+        user_input = read_input()
+
+        # Getting the chatbot response and the new state of the conversation
+        state, messages = process_turn(state, user_input)
+
+        # Print the response from chatbot
+        print_messages(messages)
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Function to parse the command line arguments
+    
+    Parameters
+    ----------
+        None
+
+    Returns
+    -------
+        argparse.Namespace
+            The parsed arguments
+    """
+    parser = argparse.ArgumentParser(description=f"{constants.CHATBOT_NAME}, the {constants.STORE_NAME} chatbot")
+    parser.add_argument("--serve", action="store_true", help="serve many concurrent conversations over HTTP instead of chatting on the console")
+    parser.add_argument("--host", default=constants.SERVER_HOST, help="host the server binds to")
+    parser.add_argument("--port", type=int, default=constants.SERVER_PORT, help="port the server binds to")
+    parser.add_argument("--workers", type=int, default=constants.SERVER_WORKERS, help="threads processing the turns of the server")
+    parser.add_argument("--build", action="store_true", help="build the indexes and the compiled catalog from the data files and exit")
+    parser.add_argument("--build-catalog", action="store_true", help="compile the games catalog into the binary format and exit")
+    parser.add_argument("--tokenizer", choices=list(TOKENIZERS), default=constants.TOKENIZER, help="tokenizer of the pre-processing, regex is faster and needs no punkt model")
+    parser.add_argument("--metrics", action="store_true", help="time the stages of every turn, the server exposes them on /metrics")
+    parser.add_argument("--metrics-dump", metavar="PATH", help="also write the metrics to this JSON file periodically")
+    parser.add_argument("--startup-report", action="store_true", help="print the import time breakdown of the program and exit")
+    parser.add_argument("--startup-budget", type=float, default=constants.STARTUP_IMPORT_BUDGET_MS, help="milliseconds the imports can take before the startup report fails")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    # Clearing all the preferences before starting the program
-    clear_preferences()
-    # Start execution from here
-    main()
\ No newline at end of file
+    arguments = parse_arguments()
+
+    if arguments.startup_report:
+        from utils.startup import startup_report
+        total = startup_report("main")
+        # Fail loudly if the imports got slower than the budget
+        if total / 1000 > arguments.startup_budget:
+            print(f"Startup imports took longer than the budget of {arguments.startup_budget:.0f} ms")
+            raise SystemExit(1)
+        raise SystemExit(0)
+
+    # Select the tokenizer before the indexes are built or loaded
+    set_tokenizer(arguments.tokenizer)
+
+    if arguments.build:
+        from utils.artifacts import build_artifacts
+        from utils.catalog_store import build_catalog_store
+        from utils.game_catalog import FACET_COLUMNS
+        digests = build_artifacts(constants.ARTIFACTS_PATH)
+        print(f"Built {len(digests)} resources into {constants.ARTIFACTS_PATH}")
+        meta = build_catalog_store(constants.GAMES_PATH, constants.GAMES_STORE_PATH, FACET_COLUMNS)
+        print(f"Compiled {meta['rows']} games from {constants.GAMES_PATH} into {constants.GAMES_STORE_PATH}")
+        raise SystemExit(0)
+
+    if arguments.build_catalog:
+        from utils.catalog_store import build_catalog_store
+        from utils.game_catalog import FACET_COLUMNS
+        meta = build_catalog_store(constants.GAMES_PATH, constants.GAMES_STORE_PATH, FACET_COLUMNS)
+        print(f"Compiled {meta['rows']} games from {constants.GAMES_PATH} into {constants.GAMES_STORE_PATH}")
+        raise SystemExit(0)
+
+    exporter = None
+    if arguments.metrics or arguments.metrics_dump:
+        enable_metrics()
+    if arguments.metrics_dump:
+        exporter = JsonDumpExporter(arguments.metrics_dump)
+        exporter.start()
+
+    # Removing the preferences of the sessions which are no longer active
+    expire_sessions()
+    try:
+        if arguments.serve:
+            # Import the server only when it is needed
+            from server import serve
+            serve(host=arguments.host, port=arguments.port, max_workers=arguments.workers)
+        else:
+            # Clearing all the preferences before starting the program
+            clear_preferences()
+            # Start execution from here
+            main()
+    finally:
+        # Write the pending preference changes before exiting
+        flush_preferences()
+        if exporter is not None:
+            # Write the metrics of the last turns
+            exporter.stop()
\ No newline at end of file
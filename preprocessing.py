@@ -1,7 +1,10 @@
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-from nltk.stem.wordnet import WordNetLemmatizer
-from nltk import pos_tag
+import threading
+from functools import lru_cache
+from typing import Any
+from utils import constants
+from utils.metrics import Stages, registry, stage
+from utils.tokenizer import word_tokenize
+from utils.warmup import wait_until_ready
 
 # A dictionary for defining mappings for pos_tag tags
 posmap: dict[str,str] = {
@@ -11,6 +14,159 @@ posmap: dict[str,str] = {
     "VERB": "v"
 }
 
+class PreprocessingPipeline:
+    """
+    Class to hold the tagger and the lemmatizer used to pre-process the text along with the memoized results
+
+    Two bounded LRU caches are kept, one from (word, pos) to lemma and one from the whitespace
+    normalized utterance to its lemmatized tokens.
+    """
+
+    def __init__(self, lemma_cache_size: int, utterance_cache_size: int) -> None:
+        # The models are loaded the first time they are needed
+        self._tagger: Any | None = None
+        self._lemmatizer: Any | None = None
+        self._ne_chunker: Any | None = None
+        # Every model has its own lock so that they can be loaded concurrently
+        self._tagger_lock = threading.Lock()
+        self._lemmatizer_lock = threading.Lock()
+        self._ne_chunker_lock = threading.Lock()
+        self._cached_lemmatize = lru_cache(maxsize=lemma_cache_size)(self._lemmatize)
+        self._cached_preprocess = lru_cache(maxsize=utterance_cache_size)(self._preprocess)
+
+    @property
+    def tagger(self):
+        # Load the tagger model only once, the first time it is needed
+        if self._tagger is None:
+            with self._tagger_lock:
+                if self._tagger is None:
+                    from nltk.tag import PerceptronTagger
+                    self._tagger = PerceptronTagger()
+        return self._tagger
+
+    @property
+    def lemmatizer(self):
+        if self._lemmatizer is None:
+            with self._lemmatizer_lock:
+                if self._lemmatizer is None:
+                    from nltk.stem.wordnet import WordNetLemmatizer
+                    self._lemmatizer = WordNetLemmatizer()
+        return self._lemmatizer
+
+    @property
+    def ne_chunker(self):
+        if self._ne_chunker is None:
+            with self._ne_chunker_lock:
+                if self._ne_chunker is None:
+                    try:
+                        from nltk.chunk import ne_chunker
+                    except ImportError:
+                        # Older versions of nltk load the pickled chunker through the cache of nltk.data
+                        from nltk.chunk import _MULTICLASS_NE_CHUNKER
+                        from nltk.data import load
+                        self._ne_chunker = load(_MULTICLASS_NE_CHUNKER)
+                    else:
+                        # Same chunker as ne_chunk, which loads it again on every call
+                        self._ne_chunker = ne_chunker()
+        return self._ne_chunker
+
+    def _lemmatize(self, word: str, pos: str) -> str:
+        return self.lemmatizer.lemmatize(word, pos)
+
+    def _preprocess(self, text: str) -> tuple[str, ...]:
+        from nltk.tag.mapping import map_tag
+
+        # Wait for the models which are being loaded in the background
+        wait_until_ready("punkt", "tagger", "wordnet")
+
+        # Tokenization
+        with stage(Stages.TOKENIZE):
+            tokens = word_tokenize(text)
+
+        # # Removing stop words
+        # tokens_without_sw = [word for word in tokens if word.lower() not in stopwords.words("english")]
+
+        # POS tagging with the universal tagset, same as pos_tag(tokens, tagset='universal')
+        with stage(Stages.POS_TAG):
+            tagged_tokens = [(word, map_tag("en-ptb", "universal", tag)) for word, tag in self.tagger.tag(tokens)]
+
+        # Getting lemmatized tokens
+        with stage(Stages.LEMMATIZE):
+            return tuple(self._cached_lemmatize(word, posmap.get(tag, "n")) for word, tag in tagged_tokens)
+
+    def preprocess(self, text: str) -> list[str]:
+        """
+        Function to pre-process the text and return tokenized text
+
+        Parameters
+        ----------
+        text : str
+            text that needs to be pre-processed
+
+        Returns
+        -------
+        list[str]
+            List of lemmatized tokens
+        """
+        # Utterances which only differ in whitespace have the same tokens
+        return list(self._cached_preprocess(" ".join(text.split())))
+
+    def cache_info(self) -> dict[str, dict[str, int]]:
+        """
+        Function to get the hit and miss counters of the caches
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            dict[str, dict[str, int]]
+                hits, misses, size and maxsize of the lemma and the utterance cache
+        """
+        return {
+            name: cache.cache_info()._asdict()
+            for name, cache in (("lemma", self._cached_lemmatize), ("utterance", self._cached_preprocess))
+        }
+
+    def cache_clear(self) -> None:
+        """
+        Function to empty the caches and reset their counters
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            None
+        """
+        self._cached_lemmatize.cache_clear()
+        self._cached_preprocess.cache_clear()
+
+    def cache_hit_ratios(self) -> dict[str, float]:
+        """
+        Function to get the share of the lookups of every cache which were hits
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            dict[str, float]
+                Hit ratio of the lemma and the utterance cache, 0 before the first lookup
+        """
+        return {
+            name: info["hits"] / (info["hits"] + info["misses"]) if info["hits"] + info["misses"] else 0.0
+            for name, info in self.cache_info().items()
+        }
+
+
+# The process-wide pre-processing pipeline
+pipeline = PreprocessingPipeline(constants.LEMMA_CACHE_SIZE, constants.UTTERANCE_CACHE_SIZE)
+registry.register_gauge("cache_hit_ratio", pipeline.cache_hit_ratios)
+
 def preprocess_text(text: str) -> list[str]:
     """
     Function to pre-process the text and return tokenized text
@@ -25,20 +181,4 @@ def preprocess_text(text: str) -> list[str]:
     list[str]
         List of lemmatized tokens
     """
-    # Tokenization
-    tokens = word_tokenize(text)
-
-    # # Removing stop words
-    # tokens_without_sw = [word for word in tokens if word.lower() not in stopwords.words("english")]
-
-    # POS tagging with pos_tag
-    tagged_tokens = pos_tag(tokens, tagset='universal')
-    
-    # Lemmatization
-    lemmatizer = WordNetLemmatizer()
-
-    # Getting lemmatized tokens
-    lemmatized_tokens = [lemmatizer.lemmatize(word, posmap.get(tag, "n")) for word, tag in tagged_tokens]
-
-    # Return lemmatized tokens
-    return lemmatized_tokens
\ No newline at end of file
+    return pipeline.preprocess(text)
@@ -1,21 +1,38 @@
+from dataclasses import replace
 from preprocessing import preprocess_text
-from intent_matching import get_intent, get_intent_response
+from intent_matching import get_confident_intent, get_intent, get_intent_response
 from question_answer import process_user_query
 from typing import Any
-from identity_management import handle_capture_username
-from utils.preference import clear_preferences_except_username
-from game_search import handle_game_search, extract_genre_platform, get_game_search_message
-from game_fact import handle_game_fact
+from identity_management import handle_capture_username, capture_username_step
+from utils.preference import clear_preferences_except_username, use_session
+from utils.session import SessionState, Stage
+from utils.matcher import get_multi_head_matcher
+from utils.resources import use_generation
+from utils.metrics import Stages, count_error, set_turn_intent, stage, turn
+from game_search import handle_game_search, extract_genre_platform, get_game_search_message, begin_game_search, game_search_step
+from game_fact import handle_game_fact, begin_game_fact, game_fact_step
+
+# Message displayed when the request couldn't be processed
+ERROR_MESSAGE = "Something went wrong! Could you please restart the program?"
+
+# Intents whose handlers use the pre-processed tokens, the other intents are answered from the intent alone
+TOKEN_INTENTS = frozenset([
+    "announce_name", "general",
+    "game_search", "platform_recommendation", "genre_exploration",
+    "game_fact", "game_genre_fact", "game_platform_fact",
+])
 
 class ChatbotResponse:
     """
     Class to hold chatbot response along with some other characteristics
     """
 
-    def __init__(self, message: str, intent: str | None = None, function_to_execute: Any | None = None) -> None:
+    def __init__(self, message: str, intent: str | None = None, function_to_execute: Any | None = None, entities: dict[str, Any] | None = None) -> None:
         self.message = message
         self.intent = intent
         self.function_to_execute = function_to_execute
+        # Data extracted from the input which is needed to continue the conversation
+        self.entities = entities or {}
     
     def __str__(self) -> str:
         return self.message
@@ -36,11 +53,22 @@ def chatbot_response(user_input: str) -> ChatbotResponse:
             ChatbotResponse class which contains processed text
     """
     try:
-        # Pre-process the text to get the user input in the form of tokens
-        tokens = preprocess_text(user_input)
+        # Try to get the intent from the raw text first
+        intent = get_confident_intent(user_input)
+
+        tokens, query = [], None
+        # Pre-process the text only if the intent is not clear yet or its handler needs the tokens
+        if intent is None or intent in TOKEN_INTENTS:
+            # Pre-process the text to get the user input in the form of tokens
+            tokens = preprocess_text(user_input)
 
-        # Get the intent using the tokens
-        intent = get_intent(tokens)
+            # Vectorize the tokens once for the intent and the question answer matching
+            query = get_multi_head_matcher().query(' '.join(tokens))
+
+        if intent is None:
+            # Get the intent using the tokens
+            intent = get_intent(tokens, query)
+        set_turn_intent(intent)
 
         # Check if the intent is change_name
         if intent == "change_name":
@@ -52,7 +80,7 @@ def chatbot_response(user_input: str) -> ChatbotResponse:
         # Check if the intent is announce_name or general
         elif intent in ["announce_name", "general"]:
             # Return response from the question_answers csv
-            return ChatbotResponse(message=process_user_query(tokens), intent=intent)
+            return ChatbotResponse(message=process_user_query(tokens, query), intent=intent)
         
         # Check if intent is game_search, platform_recommendation or genre_exploration
         elif intent in ["game_search", "platform_recommendation", "genre_exploration"]:
@@ -66,14 +94,104 @@ def chatbot_response(user_input: str) -> ChatbotResponse:
             return ChatbotResponse(
                 message=get_game_search_message(captured_genre, captured_platform), 
                 intent=intent,
-                function_to_execute = lambda : handle_game_search(captured_genre, captured_platform))
+                function_to_execute = lambda : handle_game_search(captured_genre, captured_platform),
+                entities={"genre": captured_genre, "platform": captured_platform})
         elif intent in ["game_fact", "game_genre_fact", "game_platform_fact"]:
            return ChatbotResponse(
                 message="Please wait...", 
                 intent=intent, 
-                function_to_execute = lambda : handle_game_fact(tokens=tokens, intent=intent)
+                function_to_execute = lambda : handle_game_fact(tokens=tokens, intent=intent),
+                entities={"tokens": tokens}
             ) 
         else:
             return ChatbotResponse(message=get_intent_response(intent), intent=intent)
     except Exception:
-        return ChatbotResponse(message="Something went wrong! Could you please restart the program?")
\ No newline at end of file
+        count_error("chatbot_response")
+        return ChatbotResponse(message=ERROR_MESSAGE)
+
+def idle_step(state: SessionState, user_input: str) -> tuple[SessionState, list[str]]:
+    """
+    Function to handle a new request from the user
+    
+    Parameters
+    ----------
+        state: SessionState
+            Current state of the conversation
+        user_input: str
+            The actual input in str format from the user
+
+    Returns
+    -------
+        tuple[SessionState, list[str]]
+            New state of the conversation and the messages to display
+    """
+    # Getting the chatbot response
+    response = chatbot_response(user_input=user_input)
+    messages = [str(response)]
+
+    match response.intent:
+        # Check if user wants to quit chatting
+        case "goodbye":
+            return (replace(state, stage=Stage.ENDED), messages)
+
+        # Wait for the new name
+        case "change_name":
+            return (replace(state, stage=Stage.AWAITING_USERNAME), messages)
+
+        # Start the game search with the captured genre and platform
+        case "game_search" | "platform_recommendation" | "genre_exploration":
+            state, search_messages = begin_game_search(state, response.entities["genre"], response.entities["platform"])
+            return (state, messages + search_messages)
+
+        # Start resolving the game whose details are requested
+        case "game_fact" | "game_genre_fact" | "game_platform_fact":
+            state, fact_messages = begin_game_fact(state, response.entities["tokens"], response.intent)
+            return (state, messages + fact_messages)
+
+        case _:
+            return (state, messages)
+
+# Function handling the user message for every stage of the conversation
+STEP_FUNCTIONS = {
+    Stage.AWAITING_USERNAME: capture_username_step,
+    Stage.IDLE: idle_step,
+    Stage.AWAITING_GENRE: game_search_step,
+    Stage.AWAITING_PLATFORM: game_search_step,
+    Stage.AWAITING_CONFIRMATION: game_fact_step,
+    Stage.AWAITING_GAME_NAME: game_fact_step,
+    Stage.AWAITING_GAME_REPROMPT: game_fact_step,
+}
+
+def process_turn(state: SessionState, user_input: str) -> tuple[SessionState, list[str]]:
+    """
+    Function to process one user message of a conversation without blocking for further input
+
+    Multi-step dialogs are expressed through the stage of the state, so the next message of the
+    same conversation continues where this one left off.
+    
+    Parameters
+    ----------
+        state: SessionState
+            Current state of the conversation
+        user_input: str
+            The actual input in str format from the user
+
+    Returns
+    -------
+        tuple[SessionState, list[str]]
+            New state of the conversation and the messages to display
+    """
+    # The conversation has already ended
+    if state.stage == Stage.ENDED:
+        return (state, [])
+
+    # Read and write the preferences of the conversation's session, with the data files as they were when the turn started
+    # The time of the turn is recorded under its intent, the follow-up turns of a dialog under the intent which started it
+    with use_session(state.session_id), use_generation(), turn(state.intent or state.stage):
+        try:
+            with stage(Stages.HANDLER):
+                return STEP_FUNCTIONS[state.stage](state, user_input)
+        except Exception:
+            count_error("process_turn")
+            # Go back to idle so that the conversation can continue
+            return (replace(state, stage=Stage.IDLE), [ERROR_MESSAGE])
\ No newline at end of file
@@ -1,7 +1,10 @@
+from utils import constants
 from utils.helpers import string_replacement_dict
 from utils.helpers import get_similar_result
+from utils.matcher import MatchQuery
+from utils.metrics import Stages, stage
 
-def process_user_query(tokens: list[str]) -> str:
+def process_user_query(tokens: list[str], query: MatchQuery | None = None) -> str:
     """
     Function to get the response from question_answer.csv
     
@@ -9,6 +12,8 @@ def process_user_query(tokens: list[str]) -> str:
     ----------
         tokens: list[str]
             Tokens generated from pre-processing the user input
+        query: MatchQuery | None
+            The tokens already vectorized by the multi-head matcher
 
     Returns
     -------
@@ -17,12 +22,14 @@ def process_user_query(tokens: list[str]) -> str:
     """
 
     # Using helper function to get most similar answer
-    matched_answer = get_similar_result(
-        tokens=tokens,
-        file_name="data/question_answer.csv",
-        query_header_name="question",
-        result_header_name="answer"
-    )
+    with stage(Stages.QA_MATCH):
+        matched_answer = get_similar_result(
+            tokens=tokens,
+            file_name=constants.QUESTION_ANSWER_PATH,
+            query_header_name="question",
+            result_header_name="answer",
+            query=query
+        )
 
     # Check if the matched answer can be further processed
     for key in string_replacement_dict.keys():
@@ -0,0 +1,431 @@
+import asyncio
+import http.client
+import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Iterator
+from intent_matching import classify_intent
+from process import process_turn
+from utils import constants
+from utils.metrics import registry
+from utils.preference import expire_sessions
+from utils.reload import start_reload_watcher
+from utils.resources import current_generation, use_generation
+from utils.session import SessionState, Stage
+from utils.warmup import start_warmup, warmup_done, warmup_status
+
+# Reason phrases of the status codes used by the server
+STATUS_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    409: "Conflict",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+
+class HTTPError(Exception):
+    """
+    Exception raised to answer the request with an error status
+    """
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+def score_utterances(utterances: list[str]) -> list[dict[str, str]]:
+    """
+    Function to get the intent of many utterances at once
+
+    Parameters
+    ----------
+        utterances: list[str]
+            Utterances which need to be scored
+
+    Returns
+    -------
+        list[dict[str, str]]
+            The utterance and its intent for every utterance
+    """
+    # All the utterances are scored against the same generation of the intents
+    with use_generation():
+        return [{"message": utterance, "intent": classify_intent(utterance)} for utterance in utterances]
+
+class ChatServer:
+    """
+    Class to serve many concurrent conversations over HTTP
+
+    Every conversation is identified by a session id. The turns of one session are processed one
+    after the other, the turns of different sessions run concurrently on a bounded thread pool.
+
+    Endpoints
+    ---------
+        POST /session
+            Start a conversation, returns the session id and the welcome messages, 409 if the given session id is taken
+        POST /chat
+            Process a message, the body is {"session_id": str, "message": str}
+        POST /batch
+            Get the intent of many utterances, the body is {"messages": list[str]}
+        GET /health
+            Get the status of the server and of the warm-up
+    """
+
+    def __init__(
+        self,
+        host: str = constants.SERVER_HOST,
+        port: int = constants.SERVER_PORT,
+        max_workers: int = constants.SERVER_WORKERS,
+        max_pending: int = constants.SERVER_MAX_PENDING,
+        request_timeout: float = constants.SERVER_REQUEST_TIMEOUT,
+        idle_timeout: float = constants.SERVER_IDLE_TIMEOUT,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.max_pending = max_pending
+        self.request_timeout = request_timeout
+        self.idle_timeout = idle_timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="chat-worker")
+        self.sessions: dict[str, SessionState] = {}
+        self.last_seen: dict[str, float] = {}
+        self._session_locks: dict[str, asyncio.Lock] = {}
+        self._pending = 0
+        self._server: asyncio.AbstractServer | None = None
+        self._cleanup_task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        """
+        Function to start accepting connections
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            None
+        """
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        # Pick the actual port if the server was asked to bind to any free port
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._cleanup_task = asyncio.create_task(self._expire_sessions_periodically())
+
+    async def serve_forever(self) -> None:
+        """
+        Function to start the server and serve until cancelled
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            None
+        """
+        await self.start()
+        print(f"{constants.CHATBOT_NAME} is serving on http://{self.host}:{self.port}")
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def stop(self) -> None:
+        """
+        Function to stop accepting connections and wait for the running turns to finish
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            None
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._cleanup_task.cancel()
+            self._server = None
+            self._cleanup_task = None
+        self.executor.shutdown(wait=True)
+
+    async def _expire_sessions_periodically(self) -> None:
+        # Forget the conversations which have been idle for too long
+        while True:
+            await asyncio.sleep(constants.SESSION_CLEANUP_INTERVAL)
+            before = time.time() - constants.SESSION_TTL
+            for session_id, last_seen in list(self.last_seen.items()):
+                lock = self._session_locks.get(session_id)
+                if last_seen < before and not (lock and lock.locked()):
+                    self.sessions.pop(session_id, None)
+                    self.last_seen.pop(session_id, None)
+                    self._session_locks.pop(session_id, None)
+            await asyncio.get_running_loop().run_in_executor(self.executor, expire_sessions)
+
+    @contextmanager
+    def _pending_work(self) -> Iterator[None]:
+        # Apply backpressure by rejecting the work if too much of it is waiting already
+        if self._pending >= self.max_pending:
+            raise HTTPError(503, "The server is busy, please try again later")
+        self._pending += 1
+        try:
+            yield
+        finally:
+            self._pending -= 1
+
+    async def _run_in_executor(self, function, *args) -> Any:
+        with self._pending_work():
+            return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def _run_turn(self, session_id: str, message: str) -> tuple[SessionState, list[str]]:
+        # The turn is pending while it waits for the turns of the session before it too,
+        # so that a client cannot queue an unbounded number of turns on a single session
+        with self._pending_work():
+            # Turns of the same session are processed in order
+            async with self._session_locks.setdefault(session_id, asyncio.Lock()):
+                state = self.sessions.get(session_id) or SessionState(session_id=session_id, stage=Stage.AWAITING_USERNAME)
+                state, messages = await asyncio.get_running_loop().run_in_executor(self.executor, process_turn, state, message)
+                self.sessions[session_id] = state
+                self.last_seen[session_id] = time.time()
+                return (state, messages)
+
+    async def _with_timeout(self, coroutine) -> Any:
+        # The work keeps running after a timeout so that the session is left in a consistent state
+        task = asyncio.ensure_future(coroutine)
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), self.request_timeout)
+        except asyncio.TimeoutError:
+            raise HTTPError(504, "The request took too long to process")
+
+    async def handle_request(self, method: str, path: str, payload: Any) -> dict[str, Any] | str:
+        """
+        Function to process a request and get the response body
+
+        Parameters
+        ----------
+            method: str
+                HTTP method of the request
+            path: str
+                Path of the request
+            payload: Any
+                Decoded JSON body of the request
+
+        Returns
+        -------
+            dict[str, Any] | str
+                Response body, sent as JSON or as plain text
+        """
+        match (method, path):
+            case ("GET", "/health"):
+                return {"status": "ok", "sessions": len(self.sessions), "pending": self._pending, "ready": warmup_done.is_set(), "warmup": warmup_status(), "generation": current_generation()}
+
+            # Latency histograms, error counters and cache hit ratios in the Prometheus text format
+            case ("GET", "/metrics"):
+                return registry.prometheus_text()
+
+            case ("POST", "/session"):
+                session_id = (payload.get("session_id") if isinstance(payload, dict) else None) or uuid.uuid4().hex
+                if not isinstance(session_id, str):
+                    raise HTTPError(400, "The session_id must be a string")
+                # Wait for the turn of the session which may be running, and never overwrite a conversation
+                async with self._session_locks.setdefault(session_id, asyncio.Lock()):
+                    if session_id in self.sessions:
+                        raise HTTPError(409, f"The session {session_id} already exists")
+                    self.sessions[session_id] = SessionState(session_id=session_id, stage=Stage.AWAITING_USERNAME)
+                    self.last_seen[session_id] = time.time()
+                return {
+                    "session_id": session_id,
+                    "stage": Stage.AWAITING_USERNAME,
+                    "messages": [
+                        f"Welcome to {constants.STORE_NAME}! My name is {constants.CHATBOT_NAME}",
+                        "May I know your name?",
+                    ],
+                }
+
+            case ("POST", "/chat"):
+                if not isinstance(payload, dict) or not isinstance(payload.get("session_id"), str) or not isinstance(payload.get("message"), str):
+                    raise HTTPError(400, "The body must have the session_id and message strings")
+                state, messages = await self._with_timeout(self._run_turn(payload["session_id"], payload["message"]))
+                return {"session_id": state.session_id, "stage": state.stage, "messages": messages}
+
+            case ("POST", "/batch"):
+                utterances = payload.get("messages") if isinstance(payload, dict) else None
+                if not isinstance(utterances, list) or not all(isinstance(utterance, str) for utterance in utterances):
+                    raise HTTPError(400, "The body must have the messages list of strings")
+                if len(utterances) > constants.SERVER_MAX_BATCH_SIZE:
+                    raise HTTPError(413, f"At most {constants.SERVER_MAX_BATCH_SIZE} messages can be scored at once")
+                results = await self._with_timeout(self._run_in_executor(score_utterances, utterances))
+                return {"results": results}
+
+            case (_, "/health" | "/metrics" | "/session" | "/chat" | "/batch"):
+                raise HTTPError(405, f"{method} is not allowed on {path}")
+
+            case _:
+                raise HTTPError(404, f"{path} not found")
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> tuple[str, str, dict[str, str], bytes] | None:
+        # Read the request line, None means the client closed the connection
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, path, _ = request_line.decode("latin-1").split()
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+
+        # Read the headers till the empty line
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        # Read the body
+        try:
+            content_length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise HTTPError(400, "Malformed Content-Length")
+        if content_length > constants.SERVER_MAX_BODY_SIZE:
+            raise HTTPError(413, "The body is too large")
+        body = await reader.readexactly(content_length) if content_length else b""
+
+        return (method.upper(), path.split("?")[0], headers, body)
+
+    async def _write_response(self, writer: asyncio.StreamWriter, status: int, body: dict[str, Any] | str, keep_alive: bool) -> None:
+        if isinstance(body, str):
+            data = body.encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            data = json.dumps(body).encode("utf-8")
+            content_type = "application/json"
+        head = (
+            f"HTTP/1.1 {status} {STATUS_REASONS[status]}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+        )
+        if status == 503:
+            head += "Retry-After: 1\r\n"
+        writer.write(head.encode("latin-1") + b"\r\n" + data)
+        await writer.drain()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            # Serve the requests of the connection till the client closes it or stays idle for too long
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), self.idle_timeout)
+                except asyncio.TimeoutError:
+                    break
+                except asyncio.IncompleteReadError:
+                    break
+                except HTTPError as e:
+                    await self._write_response(writer, e.status, {"error": e.message}, keep_alive=False)
+                    break
+
+                if request is None:
+                    break
+
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+
+                try:
+                    try:
+                        payload = json.loads(body) if body else None
+                    except ValueError:
+                        raise HTTPError(400, "The body must be valid JSON")
+                    status, response = 200, await self.handle_request(method, path, payload)
+                except HTTPError as e:
+                    status, response = e.status, {"error": e.message}
+                except Exception:
+                    status, response = 500, {"error": "Something went wrong while processing the request"}
+
+                await self._write_response(writer, status, response, keep_alive)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+class ChatClient:
+    """
+    Class to talk to a running ChatServer, e.g. over the loopback interface
+    """
+
+    def __init__(self, host: str = constants.SERVER_HOST, port: int = constants.SERVER_PORT, timeout: float = constants.SERVER_REQUEST_TIMEOUT) -> None:
+        self.connection = http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def request(self, method: str, path: str, payload: Any = None) -> tuple[int, dict[str, Any] | str]:
+        """
+        Function to send a request and get the decoded response
+
+        Parameters
+        ----------
+            method: str
+                HTTP method of the request
+            path: str
+                Path of the request
+            payload: Any
+                Body of the request which will be encoded as JSON
+
+        Returns
+        -------
+            tuple[int, dict[str, Any] | str]
+                Status and body of the response, decoded from JSON unless it is plain text like /metrics
+        """
+        body = json.dumps(payload) if payload is not None else None
+        self.connection.request(method, path, body=body, headers={"Content-Type": "application/json"})
+        response = self.connection.getresponse()
+        data = response.read()
+        if response.getheader("Content-Type", "").startswith("application/json"):
+            return (response.status, json.loads(data))
+        return (response.status, data.decode("utf-8"))
+
+    def start_session(self, session_id: str | None = None) -> dict[str, Any]:
+        return self.request("POST", "/session", {"session_id": session_id} if session_id else {})[1]
+
+    def chat(self, session_id: str, message: str) -> dict[str, Any]:
+        return self.request("POST", "/chat", {"session_id": session_id, "message": message})[1]
+
+    def batch(self, messages: list[str]) -> dict[str, Any]:
+        return self.request("POST", "/batch", {"messages": messages})[1]
+
+    def metrics(self) -> str:
+        return self.request("GET", "/metrics")[1]
+
+    def close(self) -> None:
+        self.connection.close()
+
+def serve(host: str = constants.SERVER_HOST, port: int = constants.SERVER_PORT, max_workers: int = constants.SERVER_WORKERS) -> None:
+    """
+    Function to run the chat server till it is interrupted
+
+    Parameters
+    ----------
+        host: str
+            Host to bind to
+        port: int
+            Port to bind to
+        max_workers: int
+            Number of threads processing the turns
+
+    Returns
+    -------
+        None
+    """
+    # Load the models and the indexes in the background while the server starts accepting connections
+    start_warmup()
+    # Pick up the edits of the data files without a restart
+    start_reload_watcher()
+    try:
+        asyncio.run(ChatServer(host=host, port=port, max_workers=max_workers).serve_forever())
+    except KeyboardInterrupt:
+        pass
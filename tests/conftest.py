@@ -0,0 +1,40 @@
+import os
+import sys
+from typing import Iterator
+import pytest
+
+# The modules of the chatbot live at the root of the repository
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from utils import preference
+from utils.preference import PreferenceStore, SQLitePreferenceBackend
+
+@pytest.fixture(autouse=True)
+def preference_store(tmp_path, monkeypatch) -> Iterator[PreferenceStore]:
+    # Keep the preferences of the tests out of the database of the chatbot
+    store = PreferenceStore(SQLitePreferenceBackend(str(tmp_path / "preferences.db")), 0)
+    monkeypatch.setattr(preference, "_store", store)
+    yield store
+    store.close()
+
+@pytest.fixture
+def regex_tokenizer() -> Iterator[None]:
+    # The regex tokenizer needs no NLTK data
+    from utils.tokenizer import REGEX, set_tokenizer, tokenizer_name
+
+    previous = tokenizer_name()
+    set_tokenizer(REGEX)
+    yield
+    set_tokenizer(previous)
+
+@pytest.fixture
+def stopwords(monkeypatch) -> frozenset[str]:
+    # A few stopwords instead of the NLTK corpus, which may not be downloaded
+    import utils.fuzzy
+
+    words = frozenset(["a", "about", "is", "me", "of", "tell", "the", "what"])
+    monkeypatch.setattr(utils.fuzzy, "get_stopwords", lambda: words)
+    return words
@@ -0,0 +1,57 @@
+import pytest
+from utils.fuzzy import DeletionIndex, TitleResolver, edit_distance
+from utils.game_catalog import get_game_catalog
+
+@pytest.fixture(scope="module")
+def catalog():
+    return get_game_catalog()
+
+@pytest.fixture
+def resolver(catalog, stopwords) -> TitleResolver:
+    return TitleResolver(catalog)
+
+@pytest.mark.parametrize("source, target, distance", [
+    ("braid", "braid", 0),
+    ("brain", "braid", 1),
+    ("grnad", "grand", 1),
+    ("quern", "query", 1),
+    ("", "abc", 3),
+])
+def test_edit_distance(source, target, distance):
+    assert edit_distance(source, target) == distance
+
+def test_lookup_finds_the_closest_words_only():
+    index = DeletionIndex(["braid", "brain", "inside", "inside"], 2)
+
+    assert index.lookup("braid") == [(0, "braid")]
+    assert index.lookup("brian") == [(1, "brain"), (2, "braid")]
+    assert index.lookup("brian", 1) == [(1, "brain")]
+    assert index.lookup("outside", 1) == []
+    # A word which is not in the vocabulary is not matched without edits
+    assert index.lookup("brian", 0) == []
+
+def test_lookup_prefers_the_most_frequent_word():
+    index = DeletionIndex(["cart", "card", "card"], 1)
+
+    assert index.lookup("care") == [(1, "card"), (1, "cart")]
+
+@pytest.mark.parametrize("text, game", [
+    ("tell me about braid", "Braid"),
+    ("tell me about inside", "INSIDE"),
+    ("what is quern about", "Quern: Unraveling Time"),
+    ("tell me about grnad theft auto", "Grand Theft Auto V"),
+])
+def test_titles_are_resolved(resolver, text, game):
+    assert resolver.resolve(text.split())[0] == game
+
+@pytest.mark.parametrize("text", [
+    # One-word titles are plain English words, they are not corrected
+    "my brain hurts",
+    "i have a query",
+    "brade",
+    # A prefix made of stopwords only is not a title
+    "the last",
+    "tell me about a game",
+])
+def test_words_close_to_a_title_are_not_taken_for_it(resolver, text):
+    assert resolver.resolve(text.split()) is None
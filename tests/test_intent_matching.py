@@ -0,0 +1,39 @@
+import csv
+import statistics
+import pytest
+from intent_matching import classify_intent, get_confident_intent, get_intent
+from preprocessing import preprocess_text
+from tools.intent_report import DEFAULT_SEED, split_folds, write_fold_data
+from utils import constants
+from utils.resources import clear_cached_resources
+
+@pytest.fixture
+def held_out_phrases(tmp_path, monkeypatch, regex_tokenizer) -> list[dict[str, str]]:
+    # Train on the intent file without the phrases of one fold, like the intent report does
+    with open(constants.INTENT_PATH, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        header, rows = reader.fieldnames, list(reader)
+    held_out = split_folds(rows, 5, DEFAULT_SEED)[0]
+    write_fold_data(str(tmp_path), rows, header, held_out)
+
+    monkeypatch.chdir(tmp_path)
+    clear_cached_resources()
+    try:
+        preprocess_text("Checking the NLTK data")
+    except LookupError:
+        pytest.skip("the NLTK data used by the pre-processing is not downloaded")
+    yield [rows[number] for number in held_out]
+    clear_cached_resources()
+
+@pytest.mark.parametrize("margin", [constants.INTENT_CASCADE_MARGIN] if constants.INTENT_CASCADE_MARGIN is not None else constants.INTENT_CASCADE_REPORT_MARGINS)
+def test_cascade_is_as_accurate_as_the_full_preprocessing(held_out_phrases, margin):
+    full = [get_intent(preprocess_text(phrase["value"])) for phrase in held_out_phrases]
+    cascade = [classify_intent(phrase["value"], margin) for phrase in held_out_phrases]
+
+    def accuracy(intents: list[str]) -> float:
+        return statistics.fmean(intent == phrase["intent"] for intent, phrase in zip(intents, held_out_phrases))
+
+    assert accuracy(cascade) >= accuracy(full)
+
+def test_no_margin_always_preprocesses_the_text():
+    assert get_confident_intent("hello", None) is None
@@ -0,0 +1,90 @@
+import pytest
+import game_fact
+import game_search
+import identity_management
+import process
+from process import ChatbotResponse, process_turn
+from utils.preference import get_preference, use_session
+from utils.session import SessionState, Stage, ScriptedIO, print_messages, read_input, use_io
+
+# Intent of every scripted request, so that the dialogs don't depend on the NLTK models
+RESPONSES = {
+    "find me a game": ChatbotResponse("Let me help you find a game.", intent="game_search", entities={"genre": None, "platform": None}),
+    "action games for pc": ChatbotResponse("Let me help you find a game.", intent="game_search", entities={"genre": "action", "platform": "pc"}),
+    "tell me about that puzzle game": ChatbotResponse("Please wait...", intent="game_fact", entities={"tokens": ["that", "puzzle", "game"]}),
+    "hello": ChatbotResponse("Hello!", intent="greeting"),
+    "bye": ChatbotResponse("Goodbye!", intent="goodbye"),
+}
+
+@pytest.fixture(autouse=True)
+def scripted_nlp(monkeypatch, regex_tokenizer) -> None:
+    monkeypatch.setattr(process, "chatbot_response", lambda user_input: RESPONSES[user_input])
+    monkeypatch.setattr(identity_management, "capture_user_name", lambda text: text[len("i am "):].title() if text.startswith("i am ") else None)
+    # The guesses of the game fact dialog
+    monkeypatch.setattr(game_fact, "resolve_game", lambda tokens: None)
+    monkeypatch.setattr(game_fact, "extract_game_candidates", lambda tokens, k: [(0.6, "Braid"), (0.5, "INSIDE")])
+
+def converse(lines: list[str], state: SessionState | None = None) -> tuple[list[str], list[str]]:
+    # Drive the conversation like the console does, till it ends or the script runs out
+    state = state or SessionState(session_id="test", stage=Stage.AWAITING_USERNAME)
+    stages = []
+    with use_io(ScriptedIO(lines)) as io:
+        while state.stage != Stage.ENDED:
+            try:
+                user_input = read_input()
+            except EOFError:
+                break
+            state, messages = process_turn(state, user_input)
+            print_messages(messages)
+            stages.append(state.stage)
+    return (stages, io.messages)
+
+def test_username_is_asked_again_until_it_is_captured():
+    stages, messages = converse(["hmm", "i am alice", "hello", "bye"])
+
+    assert stages == [Stage.AWAITING_USERNAME, Stage.IDLE, Stage.IDLE, Stage.ENDED]
+    assert messages[1] == "Great! Thanks Alice. How may I assist you today?"
+    assert messages[-1] == "Goodbye!"
+
+def test_game_search_waits_for_the_genre_and_the_platform():
+    stages, messages = converse(["i am alice", "find me a game", "action", "i use a pc"])
+
+    assert stages == [Stage.IDLE, Stage.AWAITING_GENRE, Stage.AWAITING_PLATFORM, Stage.IDLE]
+    assert "action games" in messages[2]
+
+def test_game_search_reprompts_for_an_unknown_genre():
+    stages, _ = converse(["i am alice", "find me a game", "something"])
+
+    assert stages == [Stage.IDLE, Stage.AWAITING_GENRE, Stage.AWAITING_GENRE]
+
+def test_game_search_with_the_genre_and_platform_ends_right_away():
+    stages, _ = converse(["i am alice", "action games for pc"])
+
+    assert stages == [Stage.IDLE, Stage.IDLE]
+
+def test_game_fact_offers_the_alternative_games_when_the_guess_is_rejected():
+    stages, messages = converse(["i am alice", "tell me about that puzzle game", "maybe", "no", "yes"])
+
+    assert stages == [Stage.IDLE, Stage.AWAITING_CONFIRMATION, Stage.AWAITING_CONFIRMATION, Stage.AWAITING_CONFIRMATION, Stage.IDLE]
+    assert "Braid" in messages[2]
+    assert "INSIDE" in messages[-3]
+    with use_session("test"):
+        assert get_preference("game_in_context") == "INSIDE"
+
+def test_game_fact_asks_for_the_game_when_no_guess_is_left():
+    stages, _ = converse(["i am alice", "tell me about that puzzle game", "no", "no"])
+
+    assert stages == [Stage.IDLE, Stage.AWAITING_CONFIRMATION, Stage.AWAITING_CONFIRMATION, Stage.AWAITING_GAME_REPROMPT]
+
+def test_an_error_goes_back_to_idle(monkeypatch):
+    monkeypatch.setattr(game_search, "get_similar_result", lambda **kwargs: 1 / 0)
+
+    stages, messages = converse(["action"], SessionState(session_id="test", stage=Stage.AWAITING_GENRE, intent="game_search"))
+
+    assert stages == [Stage.IDLE]
+    assert messages == [process.ERROR_MESSAGE]
+
+def test_an_ended_conversation_ignores_the_messages():
+    state = SessionState(session_id="test", stage=Stage.ENDED)
+
+    assert process_turn(state, "hello") == (state, [])
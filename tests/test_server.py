@@ -0,0 +1,86 @@
+import asyncio
+import threading
+import time
+from dataclasses import replace
+import pytest
+import server
+from server import ChatServer, HTTPError
+from utils.session import SessionState, Stage
+
+def echo_turn(state: SessionState, message: str) -> tuple[SessionState, list[str]]:
+    # Keep the messages of the session in the intent, so that the order of the turns can be checked
+    time.sleep(0.01)
+    return (replace(state, stage=Stage.IDLE, intent=f"{state.intent or ''}{message}"), [message])
+
+@pytest.fixture
+def chat_server():
+    chat_server = ChatServer(port=0, max_workers=4, max_pending=8, request_timeout=5)
+    yield chat_server
+    chat_server.executor.shutdown(wait=True)
+
+def chat(chat_server: ChatServer, session_id: str, message: str):
+    return chat_server.handle_request("POST", "/chat", {"session_id": session_id, "message": message})
+
+def test_turns_of_a_session_are_processed_in_order(chat_server, monkeypatch):
+    monkeypatch.setattr(server, "process_turn", echo_turn)
+
+    async def run():
+        return await asyncio.gather(*(chat(chat_server, "session", str(i)) for i in range(6)))
+
+    responses = asyncio.run(run())
+
+    assert [response["messages"] for response in responses] == [[str(i)] for i in range(6)]
+    assert chat_server.sessions["session"].intent == "012345"
+    assert chat_server._pending == 0
+
+def test_too_many_pending_turns_are_rejected_with_503(chat_server, monkeypatch):
+    monkeypatch.setattr(server, "process_turn", echo_turn)
+    chat_server.max_pending = 3
+
+    async def run():
+        return await asyncio.gather(*(chat(chat_server, "session", str(i)) for i in range(6)), return_exceptions=True)
+
+    responses = asyncio.run(run())
+
+    assert [response.status for response in responses if isinstance(response, HTTPError)] == [503] * 3
+    assert sum(isinstance(response, dict) for response in responses) == 3
+    assert chat_server._pending == 0
+
+def test_a_slow_turn_times_out_with_504_and_still_updates_the_session(chat_server, monkeypatch):
+    finished = threading.Event()
+
+    def slow_turn(state: SessionState, message: str) -> tuple[SessionState, list[str]]:
+        time.sleep(0.3)
+        finished.set()
+        return echo_turn(state, message)
+
+    monkeypatch.setattr(server, "process_turn", slow_turn)
+    chat_server.request_timeout = 0.05
+
+    async def run():
+        with pytest.raises(HTTPError) as error:
+            await chat(chat_server, "session", "hello")
+        assert error.value.status == 504
+        # The turn keeps running so that the session is left in a consistent state
+        while not finished.is_set() or chat_server._pending:
+            await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+
+    assert chat_server.sessions["session"].intent == "hello"
+
+def test_starting_an_existing_session_is_a_conflict(chat_server):
+    async def run():
+        await chat_server.handle_request("POST", "/session", {"session_id": "session"})
+        with pytest.raises(HTTPError) as error:
+            await chat_server.handle_request("POST", "/session", {"session_id": "session"})
+        return error.value.status
+
+    assert asyncio.run(run()) == 409
+
+@pytest.mark.parametrize("payload", [None, {"session_id": "session"}, {"session_id": 1, "message": "hello"}])
+def test_a_malformed_chat_is_rejected_with_400(chat_server, payload):
+    with pytest.raises(HTTPError) as error:
+        asyncio.run(chat_server.handle_request("POST", "/chat", payload))
+
+    assert error.value.status == 400
@@ -0,0 +1,56 @@
+import pytest
+from utils.tokenizer import RegexTokenizer, set_tokenizer
+
+nltk_tokenize = pytest.importorskip("nltk.tokenize.destructive")
+
+# Messages the way users type them, every one is a single sentence
+PHRASES = [
+    "hello",
+    "Hi there!",
+    "What's the genre of GTA V?",
+    "i'm looking for a game",
+    "I don't know, can't decide...",
+    "They'll love it, won't they?",
+    "we've played it, you'd like it",
+    "Recommend me a game for PC/Xbox.",
+    "show me action games on ps4",
+    "Is it $59.99 or 1,000 points?",
+    "It starts at 10:30 - right?",
+    "My friends' favorite game",
+    "gimme a game, i wanna play",
+    "I cannot find it",
+    "gonna buy one, gotta go",
+    "She said \"play it\" yesterday",
+    "\"Braid\" is great",
+    "He said 'hello' to me",
+    "(maybe) a [strategy] game?",
+    "tell me about e.g. Braid",
+    "the game -- is it good?",
+    "``Quoted'' words",
+    "what about u.s. games",
+    "cost: $30; rating: 9/10",
+    "wow!! really??",
+    "I like RPGs & shooters #gaming @home",
+]
+
+@pytest.fixture(scope="module")
+def tokenizer() -> RegexTokenizer:
+    return RegexTokenizer()
+
+@pytest.mark.parametrize("phrase", PHRASES)
+def test_tokens_are_the_ones_of_the_treebank_tokenizer(tokenizer, phrase):
+    assert tokenizer.tokenize(phrase) == nltk_tokenize.NLTKWordTokenizer().tokenize(phrase)
+
+@pytest.mark.parametrize("text, tokens", [
+    ("Hi. Tell me about Braid.", ["Hi", ".", "Tell", "me", "about", "Braid", "."]),
+    ("Mr. Smith likes it.", ["Mr.", "Smith", "likes", "it", "."]),
+    ("It costs 3. Buy it", ["It", "costs", "3", ".", "Buy", "it"]),
+    ("version 3. next one", ["version", "3.", "next", "one"]),
+    ('She said "B." Then left', ["She", "said", "``", "B", ".", "''", "Then", "left"]),
+])
+def test_periods_are_split_where_a_sentence_ends(tokenizer, text, tokens):
+    assert tokenizer.tokenize(text) == tokens
+
+def test_an_unknown_tokenizer_is_rejected():
+    with pytest.raises(ValueError):
+        set_tokenizer("whitespace")
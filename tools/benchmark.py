@@ -0,0 +1,409 @@
+"""
+Benchmark of the matching and search hot paths on synthetic corpora
+
+The data files are scaled up with a fixed seed and every scale is measured in a fresh interpreter
+started in a directory holding the synthetic data/ folder, so the chatbot builds its indexes from
+the synthetic files and the peak memory of a scale doesn't include the previous ones.
+
+    python -m tools.benchmark --save-baseline benchmark_baseline.json
+    python -m tools.benchmark --baseline benchmark_baseline.json
+
+The run fails with exit code 1 if a function got slower or used more memory than the baseline
+by more than the tolerance.
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable
+
+# Root of the repository, added to the path of the interpreters measuring the scales
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Data files which are scaled up, the other data files are copied as they are
+SCALED_FILES = ("intent.csv", "question_answer.csv", "games.csv")
+
+# Default scales, seed and number of measured calls of every function
+DEFAULT_SCALES = (10, 100, 1000)
+DEFAULT_SEED = 1234
+DEFAULT_ITERATIONS = 200
+
+# Relative slowdown or memory growth over the baseline which fails the run
+DEFAULT_TOLERANCE = 0.25
+# Latency differences below this many milliseconds are noise and never fail the run
+MIN_LATENCY_DELTA_MS = 0.05
+
+# Metrics compared against the baseline
+COMPARED_METRICS = ("p50_ms", "p95_ms", "peak_memory_kb")
+
+# Words appended to the titles of the synthetic games
+TITLE_SUFFIXES = ("Remastered", "Origins", "Legends", "Reloaded", "Chronicles", "Unleashed", "Definitive Edition", "Online")
+
+def read_rows(file_name: str) -> tuple[list[str], list[dict[str, str]]]:
+    with open(file_name, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        return (reader.fieldnames, list(reader))
+
+def write_rows(file_name: str, header: list[str], rows: list[dict[str, str]]) -> None:
+    with open(file_name, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=header)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def perturb(text: str, vocabulary: list[str], rng: random.Random) -> str:
+    """
+    Function to make a near duplicate of a sentence by replacing, inserting or swapping words
+
+    Parameters
+    ----------
+        text: str
+            Original sentence
+        vocabulary: list[str]
+            Words which can be inserted
+        rng: random.Random
+            Seeded random generator
+
+    Returns
+    -------
+        str
+            The perturbed sentence
+    """
+    words = text.split()
+    if not words:
+        return rng.choice(vocabulary)
+    for _ in range(rng.randint(1, 2)):
+        position = rng.randrange(len(words))
+        match rng.randrange(3):
+            case 0:
+                words[position] = rng.choice(vocabulary)
+            case 1:
+                words.insert(position, rng.choice(vocabulary))
+            case _:
+                other = rng.randrange(len(words))
+                words[position], words[other] = words[other], words[position]
+    return " ".join(words)
+
+def scale_sentences(rows: list[dict[str, str]], column: str, scale: int, rng: random.Random) -> list[dict[str, str]]:
+    """
+    Function to scale up a file of sentences, every row is kept and followed by perturbed copies of it
+
+    Parameters
+    ----------
+        rows: list[dict[str, str]]
+            Rows of the original file
+        column: str
+            Column holding the sentence, the other columns are copied
+        scale: int
+            Number of rows generated for every original row
+        rng: random.Random
+            Seeded random generator
+
+    Returns
+    -------
+        list[dict[str, str]]
+            Rows of the scaled file
+    """
+    vocabulary = sorted({word for row in rows for word in row[column].split()})
+    scaled_rows = []
+    for row in rows:
+        scaled_rows.append(row)
+        # The placeholder rows like no_intent/na are kept only once
+        if row[column] == "na" or row[column].startswith("no_"):
+            continue
+        for _ in range(scale - 1):
+            scaled_rows.append({**row, column: perturb(row[column], vocabulary, rng)})
+    return scaled_rows
+
+def scale_games(rows: list[dict[str, str]], scale: int, rng: random.Random) -> list[dict[str, str]]:
+    """
+    Function to scale up the games catalog with games made of the words of the original titles
+
+    Parameters
+    ----------
+        rows: list[dict[str, str]]
+            Rows of the original catalog
+        scale: int
+            Number of games generated for every original game
+        rng: random.Random
+            Seeded random generator
+
+    Returns
+    -------
+        list[dict[str, str]]
+            Rows of the scaled catalog, the original games first
+    """
+    scaled_rows = list(rows)
+    title_words = [row["name"].split() for row in rows]
+    for number in range(len(rows) * (scale - 1)):
+        # Start of a title, end of another title, a suffix and a number so that every title is unique
+        first, second = rng.choice(title_words), rng.choice(title_words)
+        name = " ".join(first[:max(1, len(first) // 2)] + second[len(second) // 2:] + [rng.choice(TITLE_SUFFIXES), str(number)])
+        description_row, facet_row = rng.choice(rows), rng.choice(rows)
+        scaled_rows.append({
+            "name": name,
+            "short_description": description_row["short_description"],
+            "description": description_row["description"],
+            "platform": facet_row["platform"],
+            "genre": facet_row["genre"],
+        })
+    return scaled_rows
+
+def generate_corpus(directory: str, scale: int, seed: int = DEFAULT_SEED) -> None:
+    """
+    Function to write a data/ folder with the data files scaled up by the given factor
+
+    Parameters
+    ----------
+        directory: str
+            Directory in which the data/ folder is created
+        scale: int
+            Number of rows generated for every row of the original files
+        seed: int
+            Seed of the random generator, the same seed always gives the same files
+
+    Returns
+    -------
+        None
+    """
+    rng = random.Random(seed)
+    source_directory = os.path.join(ROOT, "data")
+    data_directory = os.path.join(directory, "data")
+    os.makedirs(data_directory, exist_ok=True)
+
+    for file_name in sorted(os.listdir(source_directory)):
+        if file_name.endswith(".csv") and file_name not in SCALED_FILES:
+            shutil.copy(os.path.join(source_directory, file_name), data_directory)
+
+    header, rows = read_rows(os.path.join(source_directory, "intent.csv"))
+    write_rows(os.path.join(data_directory, "intent.csv"), header, scale_sentences(rows, "value", scale, rng))
+
+    header, rows = read_rows(os.path.join(source_directory, "question_answer.csv"))
+    write_rows(os.path.join(data_directory, "question_answer.csv"), header, scale_sentences(rows, "question", scale, rng))
+
+    header, rows = read_rows(os.path.join(source_directory, "games.csv"))
+    write_rows(os.path.join(data_directory, "games.csv"), header, scale_games(rows, scale, rng))
+
+def measure(function: Callable[..., Any], arguments: list[tuple], iterations: int) -> dict[str, float]:
+    """
+    Function to measure the latency distribution, throughput and peak memory of a function
+
+    The first call is made with tracemalloc running, so the peak memory includes building the
+    indexes the function needs if no function measured before it built them. The calls which
+    follow are timed without tracemalloc.
+
+    Parameters
+    ----------
+        function: Callable[..., Any]
+            Function to measure
+        arguments: list[tuple]
+            Arguments of the calls, used in turn
+        iterations: int
+            Number of timed calls
+
+    Returns
+    -------
+        dict[str, float]
+            Latency percentiles and mean in milliseconds, calls per second and peak memory in KiB
+    """
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    function(*arguments[0])
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latencies = []
+    for iteration in range(iterations):
+        start = time.perf_counter()
+        function(*arguments[iteration % len(arguments)])
+        latencies.append(time.perf_counter() - start)
+
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "p50_ms": quantiles[49] * 1000,
+        "p95_ms": quantiles[94] * 1000,
+        "p99_ms": quantiles[98] * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "throughput": len(latencies) / sum(latencies),
+        "peak_memory_kb": peak_memory / 1024,
+    }
+
+def run_benchmarks(iterations: int, seed: int) -> dict[str, Any]:
+    """
+    Function to measure the hot paths on the data files of the current directory
+
+    The same queries, taken from the original files, are used at every scale.
+
+    Parameters
+    ----------
+        iterations: int
+            Number of timed calls of every function
+        seed: int
+            Seed of the choice of the queries and of the random game sampling
+
+    Returns
+    -------
+        dict[str, Any]
+            Measurements of every function and the maximum resident memory of the process
+    """
+    import resource
+    from game_fact import extract_game, get_game_data
+    from game_search import search_game
+    from intent_matching import get_intent
+    from preprocessing import pipeline, preprocess_text
+    from question_answer import process_user_query
+
+    rng = random.Random(seed)
+    # search_game picks the listed games at random
+    random.seed(seed)
+
+    source_directory = os.path.join(ROOT, "data")
+    utterances = [row["value"] for row in read_rows(os.path.join(source_directory, "intent.csv"))[1] if row["value"] != "na"]
+    questions = [row["question"] for row in read_rows(os.path.join(source_directory, "question_answer.csv"))[1] if not row["question"].startswith("no_")]
+    games = [row["name"] for row in read_rows(os.path.join(source_directory, "games.csv"))[1]]
+    genres = ["action", "adventure", "puzzle", "na"]
+    platforms = ["pc", "xbox", "playstation", "na"]
+
+    utterances = [rng.choice(utterances) for _ in range(iterations)]
+    questions = [rng.choice(questions) for _ in range(iterations)]
+    games = [rng.choice(games) for _ in range(iterations)]
+
+    def preprocess_uncached(text: str) -> list[str]:
+        # Measure the tokenizer, the tagger and the lemmatizer rather than the caches
+        pipeline.cache_clear()
+        return preprocess_text(text)
+
+    results = {"preprocess_text": measure(preprocess_uncached, [(utterance,) for utterance in utterances], iterations)}
+
+    # The tokens are computed before timing the functions which take them
+    utterance_tokens = [(preprocess_text(utterance),) for utterance in utterances]
+    question_tokens = [(preprocess_text(question),) for question in questions]
+    game_tokens = [(preprocess_text(f"tell me about {game}"),) for game in games]
+
+    results["get_intent"] = measure(get_intent, utterance_tokens, iterations)
+    results["process_user_query"] = measure(process_user_query, question_tokens, iterations)
+    results["extract_game"] = measure(extract_game, game_tokens, iterations)
+    results["search_game"] = measure(search_game, [(rng.choice(genres), rng.choice(platforms)) for _ in range(iterations)], iterations)
+    results["get_game_data"] = measure(get_game_data, [(game, "short_description") for game in games], iterations)
+
+    # Kilobytes on Linux
+    return {"functions": results, "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+def run_scale(scale: int, iterations: int, seed: int) -> dict[str, Any]:
+    """
+    Function to generate the corpus of a scale and measure it in a fresh interpreter
+
+    Parameters
+    ----------
+        scale: int
+            Scale of the corpus
+        iterations: int
+            Number of timed calls of every function
+        seed: int
+            Seed of the corpus and of the queries
+
+    Returns
+    -------
+        dict[str, Any]
+            Measurements of the scale
+    """
+    with tempfile.TemporaryDirectory(prefix=f"benchmark-{scale}x-") as directory:
+        generate_corpus(directory, scale, seed)
+        results_path = os.path.join(directory, "results.json")
+        environment = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")]))}
+        subprocess.run(
+            [sys.executable, "-m", "tools.benchmark", "--measure", results_path, "--iterations", str(iterations), "--seed", str(seed)],
+            cwd=directory,
+            env=environment,
+            check=True
+        )
+        with open(results_path, encoding="utf-8") as f:
+            return json.load(f)
+
+def compare_results(results: dict[str, Any], baseline: dict[str, Any], tolerance: float) -> list[str]:
+    """
+    Function to find the measurements which got worse than the baseline by more than the tolerance
+
+    Parameters
+    ----------
+        results: dict[str, Any]
+            Measurements of every scale
+        baseline: dict[str, Any]
+            Stored measurements of every scale
+        tolerance: float
+            Allowed relative growth, e.g. 0.25 for 25%
+
+    Returns
+    -------
+        list[str]
+            Description of every regression, empty if there is none
+    """
+    regressions = []
+    for scale, scale_results in results.items():
+        for function, measurements in scale_results["functions"].items():
+            baseline_measurements = baseline.get(scale, {}).get("functions", {}).get(function)
+            if baseline_measurements is None:
+                continue
+            for metric in COMPARED_METRICS:
+                value, baseline_value = measurements[metric], baseline_measurements[metric]
+                if value <= baseline_value * (1 + tolerance):
+                    continue
+                if metric.endswith("_ms") and value - baseline_value < MIN_LATENCY_DELTA_MS:
+                    continue
+                regressions.append(f"{scale}x {function} {metric}: {value:.3f} (baseline {baseline_value:.3f})")
+    return regressions
+
+def print_results(results: dict[str, Any]) -> None:
+    print(f"{'scale':>6} {'function':<20} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'calls/s':>10} {'peak KiB':>10}")
+    for scale, scale_results in results.items():
+        for function, measurements in scale_results["functions"].items():
+            print(
+                f"{scale + 'x':>6} {function:<20} {measurements['p50_ms']:>9.3f} {measurements['p95_ms']:>9.3f} "
+                f"{measurements['p99_ms']:>9.3f} {measurements['throughput']:>10.1f} {measurements['peak_memory_kb']:>10.0f}"
+            )
+        print(f"{scale + 'x':>6} {'max rss KiB':<20} {scale_results['max_rss_kb']:>9}")
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the matching and search hot paths on synthetic corpora")
+    parser.add_argument("--scales", type=int, nargs="+", default=list(DEFAULT_SCALES), help="sizes of the corpora relative to the data files")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS, help="timed calls of every function")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="seed of the corpora and of the queries")
+    parser.add_argument("--baseline", help="JSON file of a previous run to compare against, regressions fail the run")
+    parser.add_argument("--save-baseline", help="write the results to this JSON file")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed relative growth over the baseline")
+    # Used by the interpreter measuring a scale
+    parser.add_argument("--measure", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+
+    if arguments.measure:
+        measurements = run_benchmarks(arguments.iterations, arguments.seed)
+        with open(arguments.measure, "w", encoding="utf-8") as f:
+            json.dump(measurements, f)
+        raise SystemExit(0)
+
+    results = {str(scale): run_scale(scale, arguments.iterations, arguments.seed) for scale in arguments.scales}
+    print_results(results)
+
+    if arguments.save_baseline:
+        with open(arguments.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if arguments.baseline:
+        with open(arguments.baseline, encoding="utf-8") as f:
+            regressions = compare_results(results, json.load(f), arguments.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regressions over the baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            raise SystemExit(1)
+        print("No regressions over the baseline")
@@ -0,0 +1,239 @@
+"""
+Accuracy and latency report of the intent cascade on held-out phrases of intent.csv
+
+The phrases are split into folds with a fixed seed. For every fold the chatbot is trained on the
+other phrases, in a fresh interpreter started in a directory holding the reduced data/ folder,
+and the phrases of the fold are classified with the full pre-processing and with the cascade
+for every margin.
+
+    python -m tools.intent_report --margins 0.1 0.2 0.3
+
+The run fails with exit code 1 if the cascade with the configured margin is less accurate than
+the full pre-processing.
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any
+from utils import constants
+
+# Root of the repository, added to the path of the interpreters evaluating the folds
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_FOLDS = 5
+DEFAULT_SEED = 1234
+
+# Name of the configuration which always pre-processes the text
+FULL = "full"
+
+def split_folds(rows: list[dict[str, str]], folds: int, seed: int) -> list[list[int]]:
+    """
+    Function to split the phrases into folds, the placeholder rows are never held out
+
+    Parameters
+    ----------
+        rows: list[dict[str, str]]
+            Rows of the intent file
+        folds: int
+            Number of folds
+        seed: int
+            Seed of the shuffle
+
+    Returns
+    -------
+        list[list[int]]
+            Rows held out in every fold
+    """
+    held_out = [number for number, row in enumerate(rows) if row["intent"] != "no_intent"]
+    random.Random(seed).shuffle(held_out)
+    return [sorted(held_out[fold::folds]) for fold in range(folds)]
+
+def evaluate_fold(phrases: list[dict[str, str]], margins: list[float]) -> dict[str, list[dict[str, Any]]]:
+    """
+    Function to classify the held-out phrases with every configuration, on the data files of the current directory
+
+    The caches of the pre-processing are cleared before every phrase so that every configuration pays for it.
+
+    Parameters
+    ----------
+        phrases: list[dict[str, str]]
+            Held-out rows with their intent and phrase
+        margins: list[float]
+            Margins of the cascade
+
+    Returns
+    -------
+        dict[str, list[dict[str, Any]]]
+            For every configuration, the predicted intent, whether the cascade escalated and the time of every phrase
+    """
+    from intent_matching import get_confident_intent, get_intent, get_intent_table
+    from preprocessing import pipeline, preprocess_text
+
+    # Build the indexes before timing
+    get_intent_table()
+
+    configurations = {FULL: None, **{f"margin {margin:g}": margin for margin in margins}}
+    results = {name: [] for name in configurations}
+    for phrase in phrases:
+        for name, margin in configurations.items():
+            pipeline.cache_clear()
+            start = time.perf_counter()
+            intent = get_confident_intent(phrase["value"], margin)
+            escalated = intent is None
+            if escalated:
+                intent = get_intent(preprocess_text(phrase["value"]))
+            results[name].append({"intent": intent, "escalated": escalated, "ms": (time.perf_counter() - start) * 1000})
+    return results
+
+def write_fold_data(directory: str, rows: list[dict[str, str]], header: list[str], held_out: list[int]) -> None:
+    """
+    Function to write the data files of the chatbot in the directory, without the held-out rows of the intent file
+
+    Parameters
+    ----------
+        directory: str
+            Directory in which the data/ folder is created
+        rows: list[dict[str, str]]
+            Rows of the intent file
+        header: list[str]
+            Columns of the intent file
+        held_out: list[int]
+            Rows of the fold
+
+    Returns
+    -------
+        None
+    """
+    held_out_rows = set(held_out)
+    data_directory = os.path.join(directory, "data")
+    os.makedirs(data_directory)
+    for file_name in os.listdir(os.path.join(ROOT, "data")):
+        if file_name.endswith(".csv") and file_name != "intent.csv":
+            shutil.copy(os.path.join(ROOT, "data", file_name), data_directory)
+
+    with open(os.path.join(data_directory, "intent.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=header)
+        writer.writeheader()
+        writer.writerows(row for number, row in enumerate(rows) if number not in held_out_rows)
+
+def run_fold(rows: list[dict[str, str]], header: list[str], held_out: list[int], margins: list[float]) -> dict[str, list[dict[str, Any]]]:
+    """
+    Function to train on the rows which are not held out and evaluate the held-out rows in a fresh interpreter
+
+    Parameters
+    ----------
+        rows: list[dict[str, str]]
+            Rows of the intent file
+        header: list[str]
+            Columns of the intent file
+        held_out: list[int]
+            Rows of the fold
+        margins: list[float]
+            Margins of the cascade
+
+    Returns
+    -------
+        dict[str, list[dict[str, Any]]]
+            Evaluation of the held-out rows, in order
+    """
+    with tempfile.TemporaryDirectory(prefix="intent-report-") as directory:
+        write_fold_data(directory, rows, header, held_out)
+
+        phrases_path = os.path.join(directory, "phrases.json")
+        results_path = os.path.join(directory, "results.json")
+        with open(phrases_path, "w", encoding="utf-8") as f:
+            json.dump([rows[number] for number in held_out], f)
+
+        environment = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")]))}
+        subprocess.run(
+            [sys.executable, "-m", "tools.intent_report", "--evaluate", phrases_path, results_path, "--margins", *map(str, margins)],
+            cwd=directory,
+            env=environment,
+            check=True
+        )
+        with open(results_path, encoding="utf-8") as f:
+            return json.load(f)
+
+def summarize(phrases: list[dict[str, str]], results: dict[str, list[dict[str, Any]]]) -> dict[str, dict[str, float]]:
+    """
+    Function to get the accuracy, the agreement with the full pre-processing and the latency of every configuration
+
+    Parameters
+    ----------
+        phrases: list[dict[str, str]]
+            Held-out rows of all the folds
+        results: dict[str, list[dict[str, Any]]]
+            Evaluation of the rows for every configuration, in the same order
+
+    Returns
+    -------
+        dict[str, dict[str, float]]
+            Summary of every configuration
+    """
+    summary = {}
+    for name, evaluations in results.items():
+        latencies = [evaluation["ms"] for evaluation in evaluations]
+        summary[name] = {
+            "accuracy": statistics.fmean(evaluation["intent"] == phrase["intent"] for evaluation, phrase in zip(evaluations, phrases)),
+            "agreement": statistics.fmean(evaluation["intent"] == full["intent"] for evaluation, full in zip(evaluations, results[FULL])),
+            "escalated": statistics.fmean(evaluation["escalated"] for evaluation in evaluations),
+            "mean_ms": statistics.fmean(latencies),
+            "p95_ms": statistics.quantiles(latencies, n=100, method="inclusive")[94],
+        }
+    return summary
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compare the accuracy and latency of the intent cascade with the full pre-processing")
+    parser.add_argument("--folds", type=int, default=DEFAULT_FOLDS, help="number of folds of the held-out phrases")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="seed of the split into folds")
+    parser.add_argument(
+        "--margins",
+        type=float,
+        nargs="+",
+        default=[constants.INTENT_CASCADE_MARGIN] if constants.INTENT_CASCADE_MARGIN is not None else constants.INTENT_CASCADE_REPORT_MARGINS,
+        help="margins of the cascade to evaluate"
+    )
+    # Used by the interpreter evaluating a fold
+    parser.add_argument("--evaluate", nargs=2, metavar=("PHRASES", "RESULTS"), help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+
+    if arguments.evaluate:
+        phrases_path, results_path = arguments.evaluate
+        with open(phrases_path, encoding="utf-8") as f:
+            fold_results = evaluate_fold(json.load(f), arguments.margins)
+        with open(results_path, "w", encoding="utf-8") as f:
+            json.dump(fold_results, f)
+        raise SystemExit(0)
+
+    with open(os.path.join(ROOT, "data", "intent.csv"), newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        header, rows = reader.fieldnames, list(reader)
+
+    phrases: list[dict[str, str]] = []
+    results: dict[str, list[dict[str, Any]]] = {}
+    for held_out in split_folds(rows, arguments.folds, arguments.seed):
+        for name, evaluations in run_fold(rows, header, held_out, arguments.margins).items():
+            results.setdefault(name, []).extend(evaluations)
+        phrases.extend(rows[number] for number in held_out)
+
+    summary = summarize(phrases, results)
+    print(f"{len(phrases)} held-out phrases in {arguments.folds} folds")
+    print(f"{'configuration':<16} {'accuracy':>9} {'agreement':>10} {'escalated':>10} {'mean ms':>9} {'p95 ms':>9}")
+    for name, line in summary.items():
+        print(f"{name:<16} {line['accuracy']:>9.1%} {line['agreement']:>10.1%} {line['escalated']:>10.1%} {line['mean_ms']:>9.3f} {line['p95_ms']:>9.3f}")
+
+    configured = f"margin {constants.INTENT_CASCADE_MARGIN:g}" if constants.INTENT_CASCADE_MARGIN is not None else FULL
+    if configured in summary and summary[configured]["accuracy"] < summary[FULL]["accuracy"]:
+        print(f"The cascade with the configured {configured} is less accurate than the full pre-processing")
+        raise SystemExit(1)
@@ -0,0 +1,289 @@
+"""
+In-process load test with simulated shoppers talking to the chatbot concurrently
+
+Every simulated user has its own session and holds a few conversations picked by weight: a
+greeting, a game search answering the genre and platform follow-ups, or a game fact question
+answering the confirmations. The opening messages are the examples of intent.csv. The users
+run on a thread pool like the turns of the server, for every number of users given.
+
+    python -m tools.loadtest --users 1 4 16 64
+
+Everything runs offline in the current process, the preferences are written to the usual
+database under sessions which are removed at the end.
+"""
+import argparse
+import csv
+import gc
+import os
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import Any
+
+# Default numbers of concurrent users, conversations held by every user and seed
+DEFAULT_USERS = (1, 4, 16, 64)
+DEFAULT_CONVERSATIONS = 10
+DEFAULT_SEED = 1234
+
+# Weight of every kind of conversation and the intents whose examples open it
+SCRIPTS = {
+    "greeting": (2, ("greeting",)),
+    "game_search": (3, ("game_search", "genre_exploration", "platform_recommendation")),
+    "game_fact": (4, ("game_fact", "game_genre_fact", "game_platform_fact")),
+}
+
+# Answers of the simulated users to the follow-up questions
+GENRES = ("action", "adventure", "puzzle")
+PLATFORMS = ("pc", "xbox", "playstation")
+CONFIRMATIONS = ("yes", "yes", "no")
+
+# Follow-up answers after which a conversation is abandoned, e.g. if it keeps asking for the game
+MAX_FOLLOW_UPS = 6
+
+@dataclass
+class LoadResult:
+    """
+    Class to hold the measurements of the turns of a load level
+    """
+
+    latencies: list[float] = field(default_factory=list)
+    # Turns answered with the error message and turns which raised
+    error_turns: int = 0
+    exceptions: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def record(self, seconds: float, error: bool) -> None:
+        with self.lock:
+            self.latencies.append(seconds)
+            self.error_turns += error
+
+def load_examples(file_name: str = "data/intent.csv") -> dict[str, list[str]]:
+    """
+    Function to get the opening messages of every kind of conversation from the intent examples
+
+    Parameters
+    ----------
+        file_name: str
+            Path of the intent file
+
+    Returns
+    -------
+        dict[str, list[str]]
+            Example messages of every kind of conversation in SCRIPTS
+    """
+    with open(file_name, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    return {
+        script: [row["value"] for row in rows if row["intent"] in intents]
+        for script, (_, intents) in SCRIPTS.items()
+    }
+
+def load_game_names(file_name: str = "data/games.csv") -> list[str]:
+    with open(file_name, newline="", encoding="utf-8") as f:
+        return [row["name"] for row in csv.DictReader(f)]
+
+def add_typo(text: str, rng: random.Random) -> str:
+    # Swap two neighbouring letters, like a fast typist would
+    if len(text) < 4:
+        return text
+    position = rng.randrange(1, len(text) - 2)
+    return text[:position] + text[position + 1] + text[position] + text[position + 2:]
+
+def follow_up(stage: str, rng: random.Random, game_names: list[str]) -> str | None:
+    """
+    Function to get the answer of a simulated user to the question of the given stage
+
+    Parameters
+    ----------
+        stage: str
+            Stage the conversation is waiting in
+        rng: random.Random
+            Random generator of the user
+        game_names: list[str]
+            Names of the games of the catalog
+
+    Returns
+    -------
+        str | None
+            The answer, None if the conversation is not waiting for one
+    """
+    from utils.session import Stage
+
+    match stage:
+        case Stage.AWAITING_GENRE:
+            return rng.choice(GENRES)
+        case Stage.AWAITING_PLATFORM:
+            return rng.choice(PLATFORMS)
+        case Stage.AWAITING_CONFIRMATION:
+            return rng.choice(CONFIRMATIONS)
+        case Stage.AWAITING_GAME_NAME | Stage.AWAITING_GAME_REPROMPT:
+            return rng.choice(game_names)
+        case _:
+            return None
+
+def simulate_user(user: str, conversations: int, seed: int, examples: dict[str, list[str]], game_names: list[str], result: LoadResult) -> None:
+    """
+    Function to hold the conversations of a simulated user and record the time of every turn
+
+    Parameters
+    ----------
+        user: str
+            Id of the user, also used as the session id
+        conversations: int
+            Number of conversations to hold after telling the username
+        seed: int
+            Seed of the random generator of the user
+        examples: dict[str, list[str]]
+            Opening messages of every kind of conversation
+        game_names: list[str]
+            Names of the games of the catalog
+        result: LoadResult
+            Measurements the turns are recorded into
+
+    Returns
+    -------
+        None
+    """
+    from process import ERROR_MESSAGE, process_turn
+    from utils.preference import clear_preferences
+    from utils.session import SessionState, Stage
+
+    rng = random.Random(seed)
+    scripts = list(SCRIPTS)
+    weights = [weight for weight, _ in SCRIPTS.values()]
+
+    def send(state: SessionState, message: str) -> SessionState:
+        start = time.perf_counter()
+        try:
+            state, messages = process_turn(state, message)
+        except Exception:
+            with result.lock:
+                result.exceptions += 1
+            return replace(state, stage=Stage.IDLE)
+        result.record(time.perf_counter() - start, ERROR_MESSAGE in messages)
+        return state
+
+    state = SessionState(session_id=user, stage=Stage.AWAITING_USERNAME)
+    state = send(state, f"I am {user.rsplit('-', 1)[-1].capitalize()}")
+
+    for _ in range(conversations):
+        script = rng.choices(scripts, weights)[0]
+        message = rng.choice(examples[script])
+        if script == "game_fact":
+            # Name the game, sometimes with a typo so that the confirmation is asked
+            game_name = rng.choice(game_names)
+            message = f"{message} {add_typo(game_name, rng) if rng.random() < 0.3 else game_name}"
+        state = send(state, message)
+
+        for _ in range(MAX_FOLLOW_UPS):
+            answer = follow_up(state.stage, rng, game_names)
+            if answer is None:
+                break
+            state = send(state, answer)
+        else:
+            # Abandon the dialog
+            state = replace(state, stage=Stage.IDLE)
+
+    clear_preferences(user)
+
+def resident_memory() -> int:
+    """
+    Function to get the resident memory of the process on Linux
+
+    Parameters
+    ----------
+        None
+
+    Returns
+    -------
+        int
+            Resident memory in bytes
+    """
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+def run_level(users: int, conversations: int, seed: int, examples: dict[str, list[str]], game_names: list[str]) -> dict[str, Any]:
+    """
+    Function to run the given number of simulated users concurrently and summarize their turns
+
+    Parameters
+    ----------
+        users: int
+            Number of concurrent users
+        conversations: int
+            Number of conversations held by every user
+        seed: int
+            Seed of the random generators of the users
+        examples: dict[str, list[str]]
+            Opening messages of every kind of conversation
+        game_names: list[str]
+            Names of the games of the catalog
+
+    Returns
+    -------
+        dict[str, Any]
+            Throughput, latency percentiles, error rate and memory growth of the level
+    """
+    result = LoadResult()
+    gc.collect()
+    memory_before = resident_memory()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users, thread_name_prefix="loadtest") as executor:
+        futures = [
+            executor.submit(simulate_user, f"load-{users}-user{number}", conversations, seed + number, examples, game_names, result)
+            for number in range(users)
+        ]
+        for future in futures:
+            future.result()
+    elapsed = time.perf_counter() - start
+
+    gc.collect()
+    turns = len(result.latencies) + result.exceptions
+    quantiles = statistics.quantiles(result.latencies, n=100, method="inclusive") if len(result.latencies) >= 2 else [0.0] * 99
+    return {
+        "users": users,
+        "turns": turns,
+        "seconds": elapsed,
+        "throughput": turns / elapsed if elapsed else 0.0,
+        "p50_ms": quantiles[49] * 1000,
+        "p95_ms": quantiles[94] * 1000,
+        "p99_ms": quantiles[98] * 1000,
+        "error_rate": (result.error_turns + result.exceptions) / turns if turns else 0.0,
+        "memory_growth_mb": (resident_memory() - memory_before) / 2 ** 20,
+    }
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load test the chatbot with concurrent simulated users")
+    parser.add_argument("--users", type=int, nargs="+", default=list(DEFAULT_USERS), help="numbers of concurrent users to run, one level after the other")
+    parser.add_argument("--conversations", type=int, default=DEFAULT_CONVERSATIONS, help="conversations held by every user")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="seed of the simulated users")
+    parser.add_argument("--warm", action="store_true", help="load the models and the indexes before the first level")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+
+    if arguments.warm:
+        from utils.warmup import WARMUP_TASKS, start_warmup, wait_until_ready
+        start_warmup()
+        wait_until_ready(*WARMUP_TASKS)
+
+    examples = load_examples()
+    game_names = load_game_names()
+    # search_game picks the listed games at random
+    random.seed(arguments.seed)
+
+    print(f"{'users':>6} {'turns':>7} {'turns/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'rss +MB':>8}")
+    for users in arguments.users:
+        level = run_level(users, arguments.conversations, arguments.seed, examples, game_names)
+        print(
+            f"{level['users']:>6} {level['turns']:>7} {level['throughput']:>9.1f} {level['p50_ms']:>9.2f} "
+            f"{level['p95_ms']:>9.2f} {level['p99_ms']:>9.2f} {level['error_rate']:>7.2%} {level['memory_growth_mb']:>8.1f}"
+        )
+
+    from utils.preference import flush_preferences
+    flush_preferences()
@@ -0,0 +1,188 @@
+"""
+Replay of recorded conversations through the full dialog, without a console
+
+Every line of the transcript file is a conversation:
+
+    {"id": "fact-typo", "turns": [{"user": "I am Alice", "bot": ["Great! Thanks Alice. How may I assist you today?"]}, ...]}
+
+The user messages are sent turn by turn like the console and the server do, the time of every
+turn is measured and the chatbot messages are compared to the "bot" messages when they are given.
+
+    python -m tools.replay transcripts.jsonl
+    python -m tools.replay transcripts.jsonl --record recorded.jsonl
+
+The run fails with exit code 1 if the messages of a turn differ from the transcript.
+"""
+import argparse
+import difflib
+import json
+import random
+import statistics
+import time
+from typing import Any, Iterator
+
+# Seed of the random choices of the responses, reset before every conversation
+DEFAULT_SEED = 1234
+
+def read_transcripts(file_name: str) -> Iterator[dict[str, Any]]:
+    """
+    Function to read the recorded conversations, blank lines are skipped
+
+    Parameters
+    ----------
+        file_name: str
+            Path of the JSONL transcript file
+
+    Returns
+    -------
+        Iterator[dict[str, Any]]
+            Every conversation with its id and turns
+    """
+    with open(file_name, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            conversation = json.loads(line)
+            conversation.setdefault("id", str(line_number))
+            yield conversation
+
+def replay_conversation(conversation: dict[str, Any], seed: int = DEFAULT_SEED) -> dict[str, Any]:
+    """
+    Function to send the user messages of a conversation and collect the chatbot messages and timings
+
+    The conversation gets its own session, which is cleared before and after the replay.
+
+    Parameters
+    ----------
+        conversation: dict[str, Any]
+            Recorded conversation with its id and turns
+        seed: int
+            Seed of the random choices of the responses
+
+    Returns
+    -------
+        dict[str, Any]
+            Id of the conversation and, for every turn, the user message, the expected and actual
+            chatbot messages, the stage the turn ended in and its duration in milliseconds
+    """
+    from process import process_turn
+    from utils.preference import clear_preferences
+    from utils.session import SessionState, Stage
+
+    session_id = f"replay-{conversation['id']}"
+    clear_preferences(session_id)
+    random.seed(seed)
+
+    state = SessionState(session_id=session_id, stage=Stage.AWAITING_USERNAME)
+    turns = []
+    for turn in conversation["turns"]:
+        start = time.perf_counter()
+        state, messages = process_turn(state, turn["user"])
+        turns.append({
+            "user": turn["user"],
+            "expected": turn.get("bot"),
+            "bot": messages,
+            "stage": state.stage,
+            "ms": (time.perf_counter() - start) * 1000,
+        })
+        if state.stage == Stage.ENDED:
+            break
+
+    clear_preferences(session_id)
+    return {"id": conversation["id"], "turns": turns}
+
+def diff_turn(conversation_id: str, number: int, turn: dict[str, Any]) -> list[str]:
+    """
+    Function to get the differences between the expected and the actual chatbot messages of a turn
+
+    Parameters
+    ----------
+        conversation_id: str
+            Id of the conversation
+        number: int
+            Number of the turn, starting from 1
+        turn: dict[str, Any]
+            Replayed turn
+
+    Returns
+    -------
+        list[str]
+            Lines of the unified diff, empty if the messages match or none are expected
+    """
+    if turn["expected"] is None or turn["expected"] == turn["bot"]:
+        return []
+    return list(difflib.unified_diff(
+        turn["expected"],
+        turn["bot"],
+        fromfile=f"{conversation_id} turn {number} expected",
+        tofile=f"{conversation_id} turn {number} actual",
+        lineterm=""
+    ))
+
+def print_report(results: list[dict[str, Any]], verbose: bool) -> int:
+    """
+    Function to print the timings and the differences of the replayed conversations
+
+    Parameters
+    ----------
+        results: list[dict[str, Any]]
+            Replayed conversations
+        verbose: bool
+            Also print the timing of every turn
+
+    Returns
+    -------
+        int
+            Number of turns whose messages differ from the transcript
+    """
+    mismatches = 0
+    latencies = []
+    for result in results:
+        turn_latencies = [turn["ms"] for turn in result["turns"]]
+        latencies.extend(turn_latencies)
+        print(f"{result['id']}: {len(turn_latencies)} turns in {sum(turn_latencies):.1f} ms, slowest {max(turn_latencies, default=0):.1f} ms")
+
+        for number, turn in enumerate(result["turns"], start=1):
+            if verbose:
+                print(f"  {number:>3} {turn['ms']:>9.2f} ms  [{turn['stage']}] {turn['user']}")
+            diff = diff_turn(result["id"], number, turn)
+            if diff:
+                mismatches += 1
+                print("\n".join(f"    {line}" for line in diff))
+
+    if len(latencies) >= 2:
+        quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+        print(f"{len(results)} conversations, {len(latencies)} turns: p50 {quantiles[49]:.2f} ms, p95 {quantiles[94]:.2f} ms, p99 {quantiles[98]:.2f} ms")
+    print(f"{mismatches} turns differ from the transcripts")
+    return mismatches
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Replay recorded conversations and report their timings and differences")
+    parser.add_argument("transcripts", help="JSONL file with one conversation per line")
+    parser.add_argument("--record", metavar="PATH", help="write the conversations with the actual chatbot messages to this JSONL file")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="seed of the random choices of the responses")
+    parser.add_argument("--warm", action="store_true", help="load the models and the indexes before the first turn")
+    parser.add_argument("--verbose", action="store_true", help="print the timing of every turn")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+
+    if arguments.warm:
+        from utils.warmup import WARMUP_TASKS, start_warmup, wait_until_ready
+        start_warmup()
+        wait_until_ready(*WARMUP_TASKS)
+
+    results = [replay_conversation(conversation, arguments.seed) for conversation in read_transcripts(arguments.transcripts)]
+
+    if arguments.record:
+        with open(arguments.record, "w", encoding="utf-8") as f:
+            for result in results:
+                turns = [{"user": turn["user"], "bot": turn["bot"]} for turn in result["turns"]]
+                f.write(json.dumps({"id": result["id"], "turns": turns}) + "\n")
+
+    from utils.preference import flush_preferences
+    flush_preferences()
+
+    if print_report(results, arguments.verbose):
+        raise SystemExit(1)
@@ -0,0 +1,242 @@
+"""
+Parity of the regex tokenizer with word_tokenize of nltk on the phrases of the data files
+
+The corpus is made of the phrases of intent.csv and question_answer.csv, the game names and the
+search keywords, along with chat-like variants of the intent phrases: lowercased, with
+contractions, with trailing punctuation and after a greeting. Every phrase is tokenized with
+both tokenizers, then pre-processed and classified in a fresh interpreter per tokenizer.
+
+    python -m tools.tokenizer_parity --show 20
+
+Without the punkt model, the reference splits the sentences with an untrained punkt tokenizer,
+which knows no abbreviations. The run fails with exit code 1 if an intent differs.
+"""
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable
+from utils import constants
+
+# Root of the repository, added to the path of the interpreters classifying the phrases
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Phrases of the data files, by file and column
+SOURCES = [
+    (constants.INTENT_PATH, "value"),
+    (constants.QUESTION_ANSWER_PATH, "question"),
+    (constants.GAMES_PATH, "name"),
+    (constants.GAME_SEARCH_PATH, "keyword"),
+]
+
+# Contractions of the chat-like variants
+CONTRACTIONS = {
+    "what is": "what's",
+    "do not": "don't",
+    "i am": "i'm",
+    "it is": "it's",
+    "can not": "can't",
+    "you are": "you're",
+    "i would": "i'd",
+    "i will": "i'll",
+    "is not": "isn't",
+}
+
+def chat_variants(phrase: str) -> list[str]:
+    """
+    Function to write a phrase the way users type it
+
+    Parameters
+    ----------
+        phrase: str
+            Phrase of the intent file
+
+    Returns
+    -------
+        list[str]
+            Variants of the phrase, without the phrase itself
+    """
+    lowered = phrase.lower().rstrip(" .?!")
+    contracted = lowered
+    for expanded, contraction in CONTRACTIONS.items():
+        contracted = contracted.replace(expanded, contraction)
+    variants = [lowered, f"{lowered}?", f"{lowered}!!", f"{lowered}...", f"Hi. {phrase}", f"hey, {lowered}"]
+    if contracted != lowered:
+        variants += [contracted, f"{contracted.capitalize()}?"]
+    return variants
+
+def load_corpus() -> list[str]:
+    """
+    Function to get the phrases of the data files and the chat-like variants of the intent phrases
+
+    Parameters
+    ----------
+        None
+
+    Returns
+    -------
+        list[str]
+            Distinct phrases, in order
+    """
+    phrases = []
+    for file_name, column in SOURCES:
+        with open(os.path.join(ROOT, file_name), newline="", encoding="utf-8") as f:
+            rows = [row[column] for row in csv.DictReader(f) if row[column]]
+        phrases += rows
+        if file_name == constants.INTENT_PATH:
+            phrases += [variant for row in rows for variant in chat_variants(row)]
+    return list(dict.fromkeys(phrases))
+
+def reference_tokenizer() -> tuple[str, Callable[[str], list[str]]]:
+    """
+    Function to get the tokenizer the regex tokenizer is compared with
+
+    Parameters
+    ----------
+        None
+
+    Returns
+    -------
+        tuple[str, Callable[[str], list[str]]]
+            Name and function of word_tokenize, or of its stand-in if the punkt model is not installed
+    """
+    from nltk.tokenize import word_tokenize
+
+    try:
+        word_tokenize("Checking punkt.")
+        return ("word_tokenize", word_tokenize)
+    except LookupError:
+        from nltk.tokenize.destructive import NLTKWordTokenizer
+        from nltk.tokenize.punkt import PunktSentenceTokenizer
+
+        sentence_tokenizer = PunktSentenceTokenizer()
+        word_tokenizer = NLTKWordTokenizer()
+        return (
+            "untrained punkt + Treebank",
+            lambda text: [token for sentence in sentence_tokenizer.tokenize(text) for token in word_tokenizer.tokenize(sentence)]
+        )
+
+def time_tokenizer(tokenize: Callable[[str], list[str]], phrases: list[str]) -> float:
+    # Microseconds per phrase, the first tokenization of every phrase is not timed
+    for phrase in phrases:
+        tokenize(phrase)
+    start = time.perf_counter()
+    for phrase in phrases:
+        tokenize(phrase)
+    return (time.perf_counter() - start) / len(phrases) * 1e6
+
+def classify_phrases(phrases: list[str]) -> list[dict[str, Any]]:
+    """
+    Function to pre-process and classify the phrases with the tokenizer selected by CHATBOT_TOKENIZER
+
+    Parameters
+    ----------
+        phrases: list[str]
+            Phrases of the corpus
+
+    Returns
+    -------
+        list[dict[str, Any]]
+            Pre-processed tokens and intent of every phrase
+    """
+    from intent_matching import get_intent
+    from preprocessing import preprocess_text
+
+    results = []
+    for phrase in phrases:
+        tokens = preprocess_text(phrase)
+        results.append({"tokens": tokens, "intent": get_intent(tokens)})
+    return results
+
+def run_classification(phrases_path: str, tokenizer: str) -> list[dict[str, Any]]:
+    """
+    Function to classify the phrases in a fresh interpreter using the given tokenizer
+
+    Parameters
+    ----------
+        phrases_path: str
+            JSON file with the phrases
+        tokenizer: str
+            Name of the tokenizer
+
+    Returns
+    -------
+        list[dict[str, Any]]
+            Pre-processed tokens and intent of every phrase, in order
+    """
+    results_path = f"{phrases_path}.{tokenizer}.json"
+    environment = {
+        **os.environ,
+        "CHATBOT_TOKENIZER": tokenizer,
+        "PYTHONPATH": os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])),
+    }
+    subprocess.run(
+        [sys.executable, "-m", "tools.tokenizer_parity", "--classify", phrases_path, results_path],
+        cwd=ROOT,
+        env=environment,
+        check=True
+    )
+    with open(results_path, encoding="utf-8") as f:
+        return json.load(f)
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compare the regex tokenizer with word_tokenize of nltk on the phrases of the data files")
+    parser.add_argument("--show", type=int, default=10, help="number of differences of every kind to print")
+    # Used by the interpreters classifying the phrases
+    parser.add_argument("--classify", nargs=2, metavar=("PHRASES", "RESULTS"), help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+
+    if arguments.classify:
+        phrases_path, results_path = arguments.classify
+        with open(phrases_path, encoding="utf-8") as f:
+            classified = classify_phrases(json.load(f))
+        with open(results_path, "w", encoding="utf-8") as f:
+            json.dump(classified, f)
+        raise SystemExit(0)
+
+    from utils.tokenizer import NLTK, REGEX, TOKENIZERS
+
+    phrases = load_corpus()
+    reference_name, reference = reference_tokenizer()
+    regex_tokenize = TOKENIZERS[REGEX]
+
+    # Tokens
+    token_differences = [
+        (phrase, expected, actual)
+        for phrase in phrases
+        if (expected := reference(phrase)) != (actual := regex_tokenize(phrase))
+    ]
+    print(f"{len(phrases)} phrases, reference tokenizer: {reference_name}")
+    print(f"{len(token_differences)} phrases tokenized differently")
+    for phrase, expected, actual in token_differences[:arguments.show]:
+        print(f"  {phrase!r}\n    {reference_name}: {expected}\n    regex: {actual}")
+    print(f"{reference_name}: {time_tokenizer(reference, phrases):.1f} us per phrase, regex: {time_tokenizer(regex_tokenize, phrases):.1f} us per phrase")
+
+    # Intents
+    with tempfile.TemporaryDirectory(prefix="tokenizer-parity-") as directory:
+        phrases_path = os.path.join(directory, "phrases.json")
+        with open(phrases_path, "w", encoding="utf-8") as f:
+            json.dump(phrases, f)
+        expected_results = run_classification(phrases_path, NLTK)
+        actual_results = run_classification(phrases_path, REGEX)
+
+    preprocessing_differences = sum(expected["tokens"] != actual["tokens"] for expected, actual in zip(expected_results, actual_results))
+    intent_differences = [
+        (phrase, expected["intent"], actual["intent"])
+        for phrase, expected, actual in zip(phrases, expected_results, actual_results)
+        if expected["intent"] != actual["intent"]
+    ]
+    print(f"{preprocessing_differences} phrases pre-processed differently")
+    print(f"{len(intent_differences)} phrases classified differently")
+    for phrase, expected, actual in intent_differences[:arguments.show]:
+        print(f"  {phrase!r}: {expected} with nltk, {actual} with regex")
+
+    if intent_differences:
+        raise SystemExit(1)
@@ -0,0 +1,155 @@
+import hashlib
+import importlib
+import json
+import os
+import sys
+from typing import Any
+from utils import constants
+from utils.resources import cached_resources, clear_cached_resources, set_prebuilt_resources
+
+# Version of the layout of the artifacts, artifacts with another version are ignored
+ARTIFACTS_VERSION = 1
+
+# Kinds of cached resources which are stored in the artifacts, the first item of their key
+# The games catalog has its own compiled format which is memory mapped instead (see utils/catalog_store.py)
+ARTIFACT_KINDS = ("matcher_index", "entity_lexicon", "intent_responses", "intent_table")
+
+def build_all_resources() -> None:
+    from intent_matching import get_intent_responses, get_intent_table
+    from utils.lexicon import get_entity_lexicon
+    from utils.matcher import get_matcher_index
+
+    # Fit every index the chatbot queries
+    for file_name, query_header_name in constants.MATCHER_HEADS + [(constants.GAME_SEARCH_PATH, "keyword")]:
+        get_matcher_index(file_name, query_header_name)
+    get_entity_lexicon()
+    get_intent_responses()
+    get_intent_table()
+
+# Modules whose code builds the stored resources, e.g. the pre-processing of the intent table
+BUILD_MODULES = ("intent_matching", "preprocessing", "utils.lexicon", "utils.matcher", "utils.tokenizer")
+
+def build_inputs_digest() -> str:
+    """
+    Function to get a digest of what the resources are built from besides the data files
+
+    The data files are checked by the digest of every resource, this covers the code of the modules
+    building them, the available genres and platforms of the lexicon and the stopwords.
+
+    Parameters
+    ----------
+        None
+
+    Returns
+    -------
+        str
+            Hex digest of the build inputs
+    """
+    from utils.lexicon import get_stopwords
+
+    digest = hashlib.sha256()
+    for name in BUILD_MODULES:
+        with open(importlib.import_module(name).__file__, "rb") as f:
+            digest.update(f.read())
+    digest.update(json.dumps([constants.AVAILABLE_GENRES, constants.AVAILABLE_PLATFORMS, sorted(get_stopwords())]).encode("utf-8"))
+    return digest.hexdigest()
+
+def artifacts_environment() -> dict[str, Any]:
+    """
+    Function to get the versions the artifacts depend on, pickled models can only be loaded by the same versions
+
+    The intent table holds pre-processed utterances, so artifacts built with another tokenizer are not used either,
+    nor artifacts built by other code or from other genres, platforms or stopwords (see build_inputs_digest).
+
+    Parameters
+    ----------
+        None
+
+    Returns
+    -------
+        dict[str, Any]
+            Version of the artifacts layout, of python and of the libraries of the pickled models, the tokenizer
+            and the digest of the other build inputs
+    """
+    import numpy
+    import scipy
+    import sklearn
+    from utils.tokenizer import tokenizer_name
+
+    return {
+        "version": ARTIFACTS_VERSION,
+        "python": list(sys.version_info[:2]),
+        "numpy": numpy.__version__,
+        "scipy": scipy.__version__,
+        "sklearn": sklearn.__version__,
+        "tokenizer": tokenizer_name(),
+        "inputs": build_inputs_digest(),
+    }
+
+def build_artifacts(path: str = constants.ARTIFACTS_PATH) -> dict[Any, str]:
+    """
+    Function to build every resource from the data files and store them in a single artifacts file
+
+    The file is written uncompressed so that the numpy arrays of the resources can be memory mapped
+    when it is loaded, and it is written next to the old one and swapped in at the end.
+
+    Parameters
+    ----------
+        path: str
+            Path of the artifacts file
+
+    Returns
+    -------
+        dict[Any, str]
+            Digest of the file every stored resource was built from, keyed by the key of the resource
+    """
+    from joblib import dump
+
+    # Build everything from the files, not from the previous artifacts
+    set_prebuilt_resources({})
+    clear_cached_resources()
+    build_all_resources()
+
+    resources = {
+        key: (cached.digest, cached.value)
+        for key, cached in cached_resources().items()
+        if key[0] in ARTIFACT_KINDS
+    }
+
+    temporary_path = f"{path}.tmp"
+    dump({"environment": artifacts_environment(), "resources": resources}, temporary_path)
+    os.replace(temporary_path, path)
+    return {key: digest for key, (digest, _) in resources.items()}
+
+def load_artifacts(path: str = constants.ARTIFACTS_PATH) -> dict[Any, tuple[str, Any]]:
+    """
+    Function to load the resources stored by build_artifacts
+
+    Every resource is used only as long as the digest of its file matches, otherwise it is built
+    from the file as usual (see utils/resources.py).
+
+    Parameters
+    ----------
+        path: str
+            Path of the artifacts file
+
+    Returns
+    -------
+        dict[Any, tuple[str, Any]]
+            Digest of the file and resource for every key, empty if there are no usable artifacts
+    """
+    if not os.path.exists(path):
+        return {}
+
+    from joblib import load
+
+    try:
+        # The numpy arrays are memory mapped instead of being read
+        artifacts = load(path, mmap_mode="r")
+    except Exception:
+        # Unreadable artifacts are rebuilt from the files
+        return {}
+
+    if artifacts.get("environment") != artifacts_environment():
+        return {}
+    return artifacts["resources"]
@@ -0,0 +1,220 @@
+from __future__ import annotations
+import json
+import mmap
+import os
+import shutil
+from typing import TYPE_CHECKING, Iterator
+from utils.resources import file_digest
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Version of the layout of the compiled catalog, a store with another version is ignored
+STORE_VERSION = 1
+
+# Name of the file describing the compiled catalog
+META_FILE = "meta.json"
+
+def split_facets(value) -> list[str]:
+    """
+    Function to split a comma separated facet cell into its lower case values
+
+    Parameters
+    ----------
+        value: Any
+            Value of the cell, e.g. "Action, Adventure"
+
+    Returns
+    -------
+        list[str]
+            Values of the cell, e.g. ["action", "adventure"]
+    """
+    return [facet.strip() for facet in str(value).lower().split(",")]
+
+class TextColumn:
+    """
+    Class to read the values of a text column of the compiled catalog on demand
+
+    The values are stored one after the other in a memory mapped utf-8 blob and located with an
+    offset table, so only the pages of the values which are read are loaded, and they are shared
+    by all the processes mapping the same store.
+    """
+
+    def __init__(self, offsets: np.ndarray, nulls: np.ndarray, blob: mmap.mmap | bytes) -> None:
+        self.offsets = offsets
+        self.nulls = nulls
+        self.blob = blob
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row: int) -> str | None:
+        # Same indexing as a list, including negative rows
+        row = range(len(self))[row]
+        if self.nulls[row]:
+            return None
+        return self.blob[int(self.offsets[row]):int(self.offsets[row + 1])].decode("utf-8")
+
+    def __iter__(self) -> Iterator[str | None]:
+        for row in range(len(self)):
+            yield self[row]
+
+    def tolist(self) -> list[str | None]:
+        return list(self)
+
+class CatalogStore:
+    """
+    Class to hold a compiled catalog opened from disk
+    """
+
+    def __init__(self, store_path: str) -> None:
+        import numpy as np
+
+        with open(os.path.join(store_path, META_FILE), encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+        self.columns: dict[str, TextColumn] = {}
+        for column in self.meta["columns"]:
+            blob_path = os.path.join(store_path, f"{column}.blob")
+            if os.path.getsize(blob_path):
+                with open(blob_path, "rb") as f:
+                    # The mapping stays valid after the file is closed
+                    blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                # Empty files can't be mapped
+                blob = b""
+            self.columns[column] = TextColumn(
+                np.load(os.path.join(store_path, f"{column}.offsets.npy"), mmap_mode="r"),
+                np.load(os.path.join(store_path, f"{column}.nulls.npy"), mmap_mode="r"),
+                blob
+            )
+
+        self.facet_codes: dict[str, tuple[np.ndarray, np.ndarray]] = {
+            column: (
+                np.load(os.path.join(store_path, f"{column}.facet_indptr.npy"), mmap_mode="r"),
+                np.load(os.path.join(store_path, f"{column}.facet_codes.npy"), mmap_mode="r")
+            )
+            for column in self.meta["facets"]
+        }
+
+    def facet_postings(self, column: str) -> dict[str, np.ndarray]:
+        """
+        Function to get the sorted rows having every value of a facet column from its integer codes
+
+        Parameters
+        ----------
+            column: str
+                Name of the facet column
+
+        Returns
+        -------
+            dict[str, numpy.ndarray]
+                Rows having every facet value
+        """
+        import numpy as np
+
+        values = self.meta["facets"][column]
+        indptr, codes = self.facet_codes[column]
+
+        # Row of every code, then group the rows by code, the stable sort keeps the rows of a code sorted
+        rows = np.repeat(np.arange(len(indptr) - 1, dtype=np.int32), np.diff(indptr))
+        order = np.argsort(codes, kind="stable")
+        sorted_rows = rows[order]
+        boundaries = np.searchsorted(codes[order], np.arange(len(values) + 1))
+        return {value: sorted_rows[boundaries[code]:boundaries[code + 1]] for code, value in enumerate(values)}
+
+def build_catalog_store(file_name: str, store_path: str, facet_columns: list[str]) -> dict:
+    """
+    Function to compile a catalog csv file into the binary store
+
+    Text columns are written as a utf-8 blob with an offset table and a null mask, facet columns
+    are also written as integer codes into the list of their distinct values. The store is written
+    next to the old one and swapped in at the end, so readers never see a half written store.
+
+    Parameters
+    ----------
+        file_name: str
+            Path of the catalog csv file
+        store_path: str
+            Directory of the compiled catalog
+        facet_columns: list[str]
+            Columns holding comma separated facets
+
+    Returns
+    -------
+        dict
+            Description of the compiled catalog
+    """
+    import numpy as np
+    import pandas as pd
+
+    df = pd.read_csv(file_name)
+
+    temporary_path = f"{store_path}.tmp"
+    shutil.rmtree(temporary_path, ignore_errors=True)
+    os.makedirs(temporary_path)
+
+    # Text columns
+    for column in df.columns:
+        nulls = df[column].isna().to_numpy()
+        encoded = [b"" if null else str(value).encode("utf-8") for value, null in zip(df[column].tolist(), nulls)]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(value) for value in encoded])
+        np.save(os.path.join(temporary_path, f"{column}.offsets.npy"), offsets)
+        np.save(os.path.join(temporary_path, f"{column}.nulls.npy"), nulls.astype(np.bool_))
+        with open(os.path.join(temporary_path, f"{column}.blob"), "wb") as f:
+            f.write(b"".join(encoded))
+
+    # Facet columns as integer codes
+    facets: dict[str, list[str]] = {}
+    for column in facet_columns:
+        codes_by_value: dict[str, int] = {}
+        codes: list[int] = []
+        indptr = [0]
+        for value in df[column].tolist():
+            codes.extend(codes_by_value.setdefault(facet, len(codes_by_value)) for facet in split_facets(value))
+            indptr.append(len(codes))
+        facets[column] = list(codes_by_value)
+        np.save(os.path.join(temporary_path, f"{column}.facet_indptr.npy"), np.array(indptr, dtype=np.int64))
+        np.save(os.path.join(temporary_path, f"{column}.facet_codes.npy"), np.array(codes, dtype=np.int32))
+
+    meta = {
+        "version": STORE_VERSION,
+        "source_digest": file_digest(file_name),
+        "rows": len(df),
+        "columns": list(df.columns),
+        "facets": facets,
+    }
+    with open(os.path.join(temporary_path, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+    # Swap the new store in
+    shutil.rmtree(store_path, ignore_errors=True)
+    os.replace(temporary_path, store_path)
+    return meta
+
+def open_catalog_store(store_path: str, file_name: str) -> CatalogStore | None:
+    """
+    Function to open the compiled catalog if it is up to date with the csv file
+
+    Parameters
+    ----------
+        store_path: str
+            Directory of the compiled catalog
+        file_name: str
+            Path of the catalog csv file the store was compiled from
+
+    Returns
+    -------
+        CatalogStore | None
+            The opened store, None if there is no store or it was compiled from another version of the file
+    """
+    try:
+        with open(os.path.join(store_path, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if meta.get("version") != STORE_VERSION or meta.get("source_digest") != file_digest(file_name):
+        return None
+    return CatalogStore(store_path)
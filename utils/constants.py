@@ -1,11 +1,99 @@
+import os
+
 CHATBOT_NAME = "Beetle Juice"
 STORE_NAME = "Gamebox"
 USER = "You"
 
 DEFAULT_SIMILARITY_THRESHOLD = 0.65
 
-PREFERENCE_PATH = "data/preferences.json"
+# Rows an index needs before it is scored in shards on several processes
+SHARDED_SCORING_MIN_ROWS = 200_000
+# Processes scoring the shards, there is one shard per process
+SHARDED_SCORING_WORKERS = os.cpu_count() or 1
+# Sharded matrices a worker process keeps mapped
+SHARDED_SCORING_MAX_MATRICES = 4
+
+# Milliseconds importing the program can take before the startup report fails
+STARTUP_IMPORT_BUDGET_MS = 500
+
+# Number of (word, pos) lemmas and pre-processed utterances kept in memory
+LEMMA_CACHE_SIZE = 4096
+UTTERANCE_CACHE_SIZE = 2048
+# Number of (facet column, keyword) lookups of the games catalog kept in memory, the keywords are typed by the users
+KEYWORD_ROWS_CACHE_SIZE = 1024
+
+PREFERENCE_DB_PATH = "data/preferences.db"
+# Preferences every session starts with
+DEFAULT_PREFERENCES = {
+    "username": "",
+    "game_in_context": "",
+}
+# Session used when the conversation is not tied to a specific session, e.g. the command line
+DEFAULT_SESSION_ID = "default"
+# Seconds of inactivity after which the preferences of a session are removed
+SESSION_TTL = 24 * 60 * 60
+# Seconds to wait after the last preference update before writing the preferences to the database
+PREFERENCE_FLUSH_DELAY = 0.5
+# Seconds between two cleanups of the expired sessions by the server
+SESSION_CLEANUP_INTERVAL = 10 * 60
+
 GAME_SEARCH_PATH = "data/game_search.csv"
+GAMES_PATH = "data/games.csv"
+# Compiled catalog built from GAMES_PATH with --build-catalog
+GAMES_STORE_PATH = "data/games.catalog"
+# Indexes and tables built from the data files with --build
+ARTIFACTS_PATH = "data/artifacts.joblib"
+# Seconds between two checks of the data files for changes which need to be reloaded
+RELOAD_POLL_INTERVAL = 2.0
+# Time the stages of every turn, also turned on with --metrics
+METRICS_ENABLED = os.environ.get("CHATBOT_METRICS", "") not in ("", "0")
+# File and seconds between two writes of the metrics by the JSON exporter
+METRICS_DUMP_PATH = "data/metrics.json"
+METRICS_DUMP_INTERVAL = 15.0
+INTENT_PATH = "data/intent.csv"
+INTENT_RESPONSE_PATH = "data/intent_response.csv"
+QUESTION_ANSWER_PATH = "data/question_answer.csv"
+
+# Files and columns matched against the user input, the input is vectorized once for all of them
+MATCHER_HEADS = [
+    (INTENT_PATH, "value"),
+    (QUESTION_ANSWER_PATH, "question"),
+    (GAMES_PATH, "name"),
+]
+
+# Tokenizer of the pre-processing, "nltk" for word_tokenize or "regex" for the compiled tokenizer (see utils/tokenizer.py)
+TOKENIZER = os.environ.get("CHATBOT_TOKENIZER", "nltk")
+
+# Threads loading the NLP models and the indexes in the background at startup
+WARMUP_WORKERS = 4
+
+# Lead of the best intent over the best other intent with which the raw text is classified without POS tagging,
+# None to always pre-process the text before classifying it. Only set it to a margin which python -m tools.intent_report
+# shows to be as accurate as the full pre-processing on the held-out phrases
+INTENT_CASCADE_MARGIN = None
+# Margins evaluated by the report when none is configured
+INTENT_CASCADE_REPORT_MARGINS = [0.1, 0.2, 0.3]
+# Rows of the intent file scored first when looking for the best other intent
+INTENT_CASCADE_CANDIDATES = 10
+
+# Number of alternative games offered when the user rejects the guessed game
+GAME_CANDIDATES = 3
+# Most typos tolerated in a word of a game title, shorter words tolerate fewer (see utils/fuzzy.py)
+FUZZY_MAX_EDIT_DISTANCE = 2
+
+# Settings of the chat server started with --serve
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8080
+# Threads processing the turns
+SERVER_WORKERS = 4
+# Requests which can wait for a thread before new ones are rejected
+SERVER_MAX_PENDING = 64
+# Seconds a request can take before the client gets a timeout
+SERVER_REQUEST_TIMEOUT = 30
+# Seconds a connection can stay idle before it is closed
+SERVER_IDLE_TIMEOUT = 60
+SERVER_MAX_BODY_SIZE = 1024 * 1024
+SERVER_MAX_BATCH_SIZE = 1000
 
 PS_ALTERNATIVES = [
     "ps",
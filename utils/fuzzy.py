@@ -0,0 +1,242 @@
+from typing import Iterable
+from utils import constants
+from utils.game_catalog import GameCatalog, get_game_catalog, normalize_title
+from utils.lexicon import get_stopwords
+from utils.resources import get_cached_resource
+
+def edit_distance(source: str, target: str) -> int:
+    """
+    Function to get the number of insertions, deletions, substitutions and transpositions of adjacent
+    characters needed to turn one string into the other (optimal string alignment distance)
+
+    Parameters
+    ----------
+        source: str
+            First string
+        target: str
+            Second string
+
+    Returns
+    -------
+        int
+            The edit distance
+    """
+    before_previous_row: list[int] = []
+    previous_row = list(range(len(target) + 1))
+    for i in range(1, len(source) + 1):
+        row = [i] + [0] * len(target)
+        for j in range(1, len(target) + 1):
+            cost = 0 if source[i - 1] == target[j - 1] else 1
+            row[j] = min(previous_row[j] + 1, row[j - 1] + 1, previous_row[j - 1] + cost)
+            # Swapped adjacent characters, e.g. "grnad" and "grand"
+            if i > 1 and j > 1 and source[i - 1] == target[j - 2] and source[i - 2] == target[j - 1]:
+                row[j] = min(row[j], before_previous_row[j - 2] + 1)
+        before_previous_row, previous_row = previous_row, row
+    return previous_row[-1]
+
+def max_edit_distance(word: str) -> int:
+    """
+    Function to get the number of typos tolerated in a word, short words have to be typed exactly
+
+    Parameters
+    ----------
+        word: str
+            The word
+
+    Returns
+    -------
+        int
+            0 up to 3 characters, 1 up to 7 characters, FUZZY_MAX_EDIT_DISTANCE after that
+    """
+    if len(word) <= 3:
+        return 0
+    if len(word) <= 7:
+        return min(1, constants.FUZZY_MAX_EDIT_DISTANCE)
+    return constants.FUZZY_MAX_EDIT_DISTANCE
+
+def deletes(word: str, max_distance: int) -> set[str]:
+    """
+    Function to get the strings obtained by deleting up to max_distance characters from the word
+
+    Parameters
+    ----------
+        word: str
+            The word
+        max_distance: int
+            Most characters to delete
+
+    Returns
+    -------
+        set[str]
+            The word itself and all its deletes
+    """
+    results = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {candidate[:i] + candidate[i + 1:] for candidate in frontier for i in range(len(candidate))}
+        results |= frontier
+    return results
+
+class DeletionIndex:
+    """
+    Class to look up the words within a small edit distance of a word without scanning the vocabulary
+
+    Every word of the vocabulary is indexed under all its deletes (symmetric delete, as done by
+    SymSpell). Two words within edit distance k share a delete of at most k characters, so the
+    candidates of a lookup are found by generating the deletes of the looked up word only.
+    """
+
+    def __init__(self, words: Iterable[str], max_distance: int) -> None:
+        self.max_distance = max_distance
+        # Number of times every word was added, used to break ties between equally close words
+        self.counts: dict[str, int] = {}
+        self.deletes: dict[str, list[str]] = {}
+        for word in words:
+            self.counts[word] = self.counts.get(word, 0) + 1
+            if self.counts[word] == 1:
+                for delete in deletes(word, max_distance):
+                    self.deletes.setdefault(delete, []).append(word)
+
+    def lookup(self, word: str, max_distance: int | None = None) -> list[tuple[int, str]]:
+        """
+        Function to get the words of the vocabulary within the given edit distance of the word
+
+        Parameters
+        ----------
+            word: str
+                Word to look up
+            max_distance: int | None
+                Most edits allowed, at most the distance the index was built with
+
+        Returns
+        -------
+            list[tuple[int, str]]
+                Edit distance and word of the matches, closest and most frequent first
+        """
+        if word in self.counts:
+            return [(0, word)]
+
+        max_distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        if max_distance <= 0:
+            return []
+
+        # Candidates share a delete with the word, the actual distance is verified on the few of them
+        candidates = {candidate for delete in deletes(word, max_distance) for candidate in self.deletes.get(delete, ())}
+        matches = []
+        for candidate in candidates:
+            if abs(len(candidate) - len(word)) > max_distance:
+                continue
+            distance = edit_distance(word, candidate)
+            if distance <= max_distance:
+                matches.append((distance, candidate))
+        return sorted(matches, key=lambda match: (match[0], -self.counts[match[1]], match[1]))
+
+class TitleResolver:
+    """
+    Class to find a game title mentioned in the user input while tolerating typos
+
+    Every word of the input is corrected to the closest word used in the titles, aliases and title
+    prefixes of the catalog, then the longest run of corrected words which is one of them is taken.
+    One-word titles are often plain English words, e.g. "Braid" or "Inside", so a run of a single
+    word has to be typed exactly, otherwise "brain" would be taken for "Braid".
+    """
+
+    def __init__(self, catalog: GameCatalog) -> None:
+        self.catalog = catalog
+
+        # Titles and aliases mapped to their row, exact titles take precedence over aliases
+        self.phrases: dict[str, int] = dict(catalog.title_index)
+        for alias, row in catalog.alias_index.items():
+            self.phrases.setdefault(alias, row)
+
+        # Prefixes of the titles too, e.g. "grand theft auto", as long as they have two words which are
+        # not stopwords, so that "the last" alone doesn't point to "The Last of Us"
+        stopwords = get_stopwords()
+        for prefix, row in catalog.prefix_index.items():
+            if sum(word not in stopwords for word in prefix.split()) >= 2:
+                self.phrases.setdefault(prefix, row)
+
+        self.max_words = max((len(phrase.split()) for phrase in self.phrases), default=0)
+        self.index = DeletionIndex(
+            (word for phrase in self.phrases for word in phrase.split()),
+            constants.FUZZY_MAX_EDIT_DISTANCE
+        )
+
+    def correct(self, word: str) -> tuple[str, int]:
+        """
+        Function to correct a word of the input to the closest word of the titles
+
+        Parameters
+        ----------
+            word: str
+                Normalized word of the input
+
+        Returns
+        -------
+            tuple[str, int]
+                Corrected word and the edits made, the word itself if it is not close to any word of the titles
+        """
+        matches = self.index.lookup(word, max_edit_distance(word))
+        if not matches:
+            return (word, 0)
+        distance, corrected_word = matches[0]
+        return (corrected_word, distance)
+
+    def resolve(self, tokens: list[str]) -> tuple[str, int] | None:
+        """
+        Function to find the game mentioned in the tokens
+
+        Parameters
+        ----------
+            tokens: list[str]
+                user input in the form of tokens
+
+        Returns
+        -------
+            tuple[str, int] | None
+                Name of the game and the edits made to the input to match it, None if no game is mentioned
+        """
+        words = normalize_title(" ".join(tokens)).split()
+        corrections = [self.correct(word) for word in words]
+
+        # Longer titles are more specific, among the runs of the same length the one with the fewest edits wins
+        for length in range(min(self.max_words, len(words)), 0, -1):
+            best_match = None
+            for start in range(len(words) - length + 1):
+                span = corrections[start:start + length]
+                span_words = [word for word, _ in span]
+                # A title can also be typed without spaces, e.g. "gta v" for "gtav"
+                row = self.phrases.get(" ".join(span_words), self.phrases.get("".join(span_words)))
+                if row is None:
+                    continue
+                distance = sum(distance for _, distance in span)
+                # A single corrected word is left to the similarity matcher
+                if length == 1 and distance > 0:
+                    continue
+                if best_match is None or distance < best_match[1]:
+                    best_match = (row, distance)
+            if best_match is not None:
+                row, distance = best_match
+                return (self.catalog.get(row, "name"), distance)
+        return None
+
+def get_title_resolver() -> TitleResolver:
+    """
+    Function to get the process-wide typo tolerant title resolver
+
+    The resolver is built once and rebuilt only when the contents of the games file change.
+
+    Parameters
+    ----------
+        None
+
+    Returns
+    -------
+        TitleResolver
+            Resolver over the current games catalog
+    """
+    return get_cached_resource(
+        key=("title_resolver", constants.GAMES_PATH),
+        path=constants.GAMES_PATH,
+        builder=lambda: TitleResolver(get_game_catalog())
+    )
@@ -0,0 +1,279 @@
+from __future__ import annotations
+import re
+from functools import lru_cache
+from typing import TYPE_CHECKING
+from utils import constants
+from utils.catalog_store import TextColumn, open_catalog_store, split_facets
+from utils.resources import get_cached_resource
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Mapping between roman numerals and numbers used in game titles
+ROMAN_NUMERALS: dict[str, str] = {
+    "i": "1",
+    "ii": "2",
+    "iii": "3",
+    "iv": "4",
+    "v": "5",
+    "vi": "6",
+    "vii": "7",
+    "viii": "8",
+    "ix": "9",
+    "x": "10",
+}
+
+# Columns which hold comma separated facets and are indexed for filtering
+FACET_COLUMNS = ["genre", "platform"]
+
+def normalize_title(title: str) -> str:
+    """
+    Function to normalize a game title so that it can be used as a lookup key
+
+    Parameters
+    ----------
+        title: str
+            Title of the game
+
+    Returns
+    -------
+        str
+            Case folded title with punctuation removed and whitespace collapsed
+    """
+    return " ".join(re.sub(r"[^\w\s]", " ", title.casefold()).split())
+
+def title_aliases(title: str) -> list[str]:
+    """
+    Function to generate the alternate names by which a game can be referred to
+
+    Parameters
+    ----------
+        title: str
+            Title of the game
+
+    Returns
+    -------
+        list[str]
+            List of normalized aliases of the title
+    """
+    normalized_title = normalize_title(title)
+    words = normalized_title.split()
+    variants = [words]
+
+    # Title without the subtitle, e.g. "the witcher 3"
+    if ":" in title:
+        main_title = normalize_title(title.split(":")[0]).split()
+        if main_title:
+            variants.append(main_title)
+
+    # Titles without the leading article, e.g. "witcher 3 wild hunt"
+    for variant in list(variants):
+        if len(variant) > 1 and variant[0] == "the":
+            variants.append(variant[1:])
+
+    # Roman numerals written as numbers and vice versa, e.g. "grand theft auto 5"
+    numbers_to_roman = {number: roman for roman, number in ROMAN_NUMERALS.items()}
+    for variant in list(variants):
+        if any(word in ROMAN_NUMERALS for word in variant[1:]):
+            variants.append([ROMAN_NUMERALS.get(word, word) if index else word for index, word in enumerate(variant)])
+        if any(word in numbers_to_roman for word in variant[1:]):
+            variants.append([numbers_to_roman.get(word, word) if index else word for index, word in enumerate(variant)])
+
+    aliases = []
+    for variant in variants:
+        aliases.append(" ".join(variant))
+        # Spaces removed, e.g. "witcher3"
+        aliases.append("".join(variant))
+
+    # Acronym of titles with three or more words, e.g. "gtav", "rdr2"
+    if len(words) >= 3:
+        aliases.append("".join(word if word.isdigit() else word[0] for word in words))
+
+    # Remove duplicates while keeping the order
+    return [alias for alias in dict.fromkeys(aliases) if alias != normalized_title]
+
+class GameCatalog:
+    """
+    Class to hold the games catalog in memory along with the indexes used to look up games by name
+    """
+
+    def __init__(self, file_name: str, store_path: str | None = None) -> None:
+        import numpy as np
+
+        self.file_name = file_name
+
+        # Use the compiled catalog if it is up to date, the text is then read from disk only when it is needed
+        self.store = open_catalog_store(store_path, file_name) if store_path else None
+        if self.store is not None:
+            self.columns: dict[str, list | TextColumn] = dict(self.store.columns)
+            # The names are needed by the lookup indexes anyway
+            self.columns["name"] = self.store.columns["name"].tolist()
+        else:
+            import pandas as pd
+
+            # Load the catalog and keep the columns as plain lists
+            df = pd.read_csv(file_name)
+            self.columns = {column: df[column].tolist() for column in df.columns}
+
+        # Build the lookup indexes
+        self.title_index: dict[str, int] = {}
+        self.alias_index: dict[str, int] = {}
+        self.prefix_index: dict[str, int] = {}
+        for row, name in enumerate(self.columns["name"]):
+            normalized_title = normalize_title(name)
+            # If the same title is present more than once, the first row wins
+            self.title_index.setdefault(normalized_title, row)
+
+            for alias in title_aliases(name):
+                self.alias_index.setdefault(alias, row)
+
+            # Prefixes are indexed on word boundaries, e.g. "grand", "grand theft", "grand theft auto"
+            words = normalized_title.split()
+            for length in range(1, len(words) + 1):
+                self.prefix_index.setdefault(" ".join(words[:length]), row)
+
+        # Build the inverted index from every facet value to the sorted rows having it
+        self.facet_index: dict[str, dict[str, np.ndarray]] = {}
+        for column in FACET_COLUMNS:
+            if self.store is not None:
+                # The compiled catalog has the facets as integer codes, no text needs to be parsed
+                self.facet_index[column] = self.store.facet_postings(column)
+                continue
+            postings: dict[str, list[int]] = {}
+            for row, value in enumerate(self.columns[column]):
+                for facet in split_facets(value):
+                    postings.setdefault(facet, []).append(row)
+            self.facet_index[column] = {facet: np.array(rows, dtype=np.int32) for facet, rows in postings.items()}
+
+        # Rows matching a keyword, computed on first use and bounded since any keyword can be typed
+        self._cached_keyword_rows = lru_cache(maxsize=constants.KEYWORD_ROWS_CACHE_SIZE)(self._keyword_rows)
+
+    def __len__(self) -> int:
+        return len(self.columns["name"])
+
+    @property
+    def names(self) -> list[str]:
+        return self.columns["name"]
+
+    def find(self, game_name: str) -> int | None:
+        """
+        Function to find the row of a game by its title, an alias or a prefix of the title
+
+        Parameters
+        ----------
+            game_name: str
+                Name of the game
+
+        Returns
+        -------
+            int | None
+                Row of the game if found else None
+        """
+        key = normalize_title(game_name)
+        if not key:
+            return None
+
+        # Exact titles take precedence over aliases and aliases over prefixes
+        for index in (self.title_index, self.alias_index, self.prefix_index):
+            row = index.get(key)
+            if row is not None:
+                return row
+        return None
+
+    def get(self, row: int, column_name: str):
+        """
+        Function to get the value of a column for the given row
+
+        Parameters
+        ----------
+            row: int
+                Row of the game
+            column_name: str
+                Name of the column
+
+        Returns
+        -------
+            Any
+                Value present in the cell
+        """
+        return self.columns[column_name][row]
+
+    def rows_matching(self, column_name: str, keyword: str) -> np.ndarray:
+        """
+        Function to get the rows having a facet which contains the keyword
+
+        Only the distinct facet values are scanned, never the rows of the catalog, and the results of the
+        most recent keywords are memoized.
+
+        Parameters
+        ----------
+            column_name: str
+                Name of the facet column
+            keyword: str
+                Keyword to look for, e.g. "action" or "playstation"
+
+        Returns
+        -------
+            numpy.ndarray
+                Sorted array of matching rows
+        """
+        return self._cached_keyword_rows(column_name, keyword)
+
+    def _keyword_rows(self, column_name: str, keyword: str) -> np.ndarray:
+        import numpy as np
+
+        postings = [facet_rows for facet, facet_rows in self.facet_index[column_name].items() if keyword in facet]
+        return np.unique(np.concatenate(postings)) if postings else np.empty(0, dtype=np.int32)
+
+    def filter(self, criteria: dict[str, list[str]]) -> np.ndarray:
+        """
+        Function to get the rows matching all the keywords of all the given facet columns
+
+        Parameters
+        ----------
+            criteria: dict[str, list[str]]
+                Mapping of facet column to the keywords which must all be present
+
+        Returns
+        -------
+            numpy.ndarray
+                Sorted array of matching rows
+        """
+        import numpy as np
+
+        postings = [self.rows_matching(column, keyword.strip()) for column, keywords in criteria.items() for keyword in keywords]
+
+        # Without any criteria, all the rows match
+        if not postings:
+            return np.arange(len(self), dtype=np.int32)
+
+        # Intersect starting from the smallest posting list so that the intermediate results stay small
+        postings.sort(key=len)
+        rows = postings[0]
+        for other_rows in postings[1:]:
+            if not len(rows):
+                break
+            rows = np.intersect1d(rows, other_rows, assume_unique=True)
+        return rows
+
+def get_game_catalog() -> GameCatalog:
+    """
+    Function to get the process-wide games catalog
+
+    The catalog is loaded once and reloaded only when the contents of the file change. The compiled
+    catalog built with --build-catalog is used when it was compiled from the current file.
+
+    Parameters
+    ----------
+        None
+
+    Returns
+    -------
+        GameCatalog
+            The loaded catalog
+    """
+    return get_cached_resource(
+        key=("game_catalog", constants.GAMES_PATH),
+        path=constants.GAMES_PATH,
+        builder=lambda: GameCatalog(constants.GAMES_PATH, constants.GAMES_STORE_PATH)
+    )
@@ -1,7 +1,5 @@
 from utils import constants
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import pandas as pd
+from utils.matcher import MatchQuery, get_matcher_index
 from utils.preference import get_preference
 from typing import Any
 
@@ -10,10 +8,12 @@ string_replacement_dict: dict[str, Any] = {
     "@game_in_context": lambda: get_preference("game_in_context")
 }
 
-def get_similar_result(tokens: list[str], file_name: str, query_header_name: str, result_header_name: str | list[str], threshold: float | None = constants.DEFAULT_SIMILARITY_THRESHOLD) -> str | tuple[str]:
+def get_similar_result(tokens: list[str], file_name: str, query_header_name: str, result_header_name: str | list[str], threshold: float | None = constants.DEFAULT_SIMILARITY_THRESHOLD, query: MatchQuery | None = None) -> str | tuple[str]:
     """
     Function to get similar result by using TF-IDF vectorizer and cosine similarity
     
+    The TF-IDF index of the file is fitted once and reused until the file changes.
+    
     Parameters
     ----------
         tokens: list[str]
@@ -26,6 +26,8 @@ def get_similar_result(tokens: list[str], file_name: str, query_header_name: str
             Name of column or list of columns in the file where the results will be stored
         threshold: float | None
             similarity threshold to be used. When nothing is specified, the threshold defaults to 0.7
+        query: MatchQuery | None
+            The tokens already vectorized by the multi-head matcher. When it has a head for the file and column, it is used instead of vectorizing the tokens again
 
 
     Returns
@@ -33,44 +35,27 @@ def get_similar_result(tokens: list[str], file_name: str, query_header_name: str
         str | tuple[str]:
             Most similar result or tuple of results from the file
     """
-    # Join tokens into a single string
-    user_input_str = ' '.join(tokens)
-
-    # Create TF-IDF vectorizer
-    vectorizer = TfidfVectorizer()
-
-    # Load the file 
-    df = pd.read_csv(file_name)
-
-    # Perform fit and transform on the column name which needs to be queried
-    values_tfidf = vectorizer.fit_transform(df[query_header_name])
+    # Get the index fitted on the column which needs to be queried
+    index = get_matcher_index(file_name, query_header_name)
 
-    # Transform user input
-    user_input_tfidf = vectorizer.transform([user_input_str])
-
-    # Calculate cosine similarity between user input and values
-    similarities = cosine_similarity(user_input_tfidf, values_tfidf)
-
-    # Find the index of the most similar result
-    most_similar_index = similarities.argmax()
+    # Find the index and the score of the most similar result
+    if query is not None and query.has_head(file_name, query_header_name):
+        similarity_score, most_similar_index = query.most_similar(file_name, query_header_name)
+    else:
+        # Join tokens into a single string
+        similarity_score, most_similar_index = index.most_similar(' '.join(tokens))
 
     # Get the similar index after calculating threshold
-    similar_index_after_threshold = most_similar_index if similarities[0, most_similar_index] >= threshold else 0
+    similar_index_after_threshold = most_similar_index if similarity_score >= threshold else 0
 
     # Get the corresponding intent by checking the threshold
     # If the result header name is a string
     if isinstance(result_header_name, str):
-        matched_result = df.loc[
-            similar_index_after_threshold, 
-            result_header_name
-        ]
+        matched_result = index.get_value(similar_index_after_threshold, result_header_name)
     # If the result header name is a list
     elif isinstance(result_header_name, list):
         matched_result = (
-            df.loc[
-                similar_index_after_threshold, 
-                header_name
-            ]
+            index.get_value(similar_index_after_threshold, header_name)
             for header_name in result_header_name
         )
     
@@ -0,0 +1,154 @@
+import csv
+import threading
+from utils import constants
+from utils.resources import get_cached_resource
+
+# Entity types extracted by the lexicon
+GENRE = "genre"
+PLATFORM = "platform"
+
+# Key marking the end of a phrase in the trie
+_END = ""
+
+# English stopwords, loaded once
+_stopwords: frozenset[str] | None = None
+_stopwords_lock = threading.Lock()
+
+def get_stopwords() -> frozenset[str]:
+    """
+    Function to get the english stopwords of nltk as a set
+
+    Parameters
+    ----------
+        None
+
+    Returns
+    -------
+        frozenset[str]
+            Lower case stopwords
+    """
+    global _stopwords
+    if _stopwords is None:
+        with _stopwords_lock:
+            if _stopwords is None:
+                from nltk.corpus import stopwords
+                _stopwords = frozenset(word.lower() for word in stopwords.words("english"))
+    return _stopwords
+
+class EntityLexicon:
+    """
+    Class to hold the phrases naming a genre or a platform compiled into a token trie
+
+    Every phrase maps to the canonical value of the entity, e.g. "ps4" and "play station 4"
+    both map to "playstation 4", which is the value used to filter the games catalog.
+    """
+
+    def __init__(self, file_name: str) -> None:
+        self.file_name = file_name
+        self.stopwords = get_stopwords()
+        self.trie: dict = {}
+
+        # Aliases from the game search file, rows naming more than one value or none are left out
+        with open(file_name, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if row["type"] in (GENRE, PLATFORM) and row["value"] != "na" and "," not in row["value"]:
+                    self.add(row["keyword"], row["type"], row["value"])
+
+        # The available genres and platforms which have no alias are their own canonical value
+        for genre in constants.AVAILABLE_GENRES:
+            self.add(genre, GENRE, genre)
+        for platform in constants.AVAILABLE_PLATFORMS:
+            self.add(platform, PLATFORM, platform)
+
+    def tokenize(self, phrase: str) -> list[str]:
+        # Phrases are matched the same way as the user input, lower case without stopwords
+        return [word for word in phrase.lower().split() if word not in self.stopwords]
+
+    def add(self, phrase: str, entity_type: str, value: str) -> None:
+        """
+        Function to add a phrase to the trie, the first value added for a phrase wins
+
+        Parameters
+        ----------
+            phrase: str
+                Words naming the entity
+            entity_type: str
+                GENRE or PLATFORM
+            value: str
+                Canonical value of the entity
+
+        Returns
+        -------
+            None
+        """
+        words = self.tokenize(phrase)
+        if not words:
+            return
+        node = self.trie
+        for word in words:
+            node = node.setdefault(word, {})
+        node.setdefault(_END, (entity_type, value))
+
+    def extract(self, tokens: list[str]) -> dict[str, list[str]]:
+        """
+        Function to find the genres and platforms named in the tokens
+
+        The tokens are scanned once from left to right and the longest phrase starting at
+        every position is taken, so "play station 4" is read as "playstation 4" and not as
+        "playstation" followed by an unknown "4".
+
+        Parameters
+        ----------
+            tokens: list[str]
+                list of tokens from the user input
+
+        Returns
+        -------
+            dict[str, list[str]]
+                Canonical values found for every entity type, in the order they appear without duplicates
+        """
+        tokens = [word.lower() for word in tokens]
+        tokens = [word for word in tokens if word not in self.stopwords]
+
+        entities: dict[str, dict[str, None]] = {GENRE: {}, PLATFORM: {}}
+        position = 0
+        while position < len(tokens):
+            # Walk down the trie as far as the tokens go and remember the last complete phrase
+            node = self.trie
+            match, match_end = None, position
+            for end in range(position, len(tokens)):
+                node = node.get(tokens[end])
+                if node is None:
+                    break
+                if _END in node:
+                    match, match_end = node[_END], end + 1
+
+            if match is None:
+                position += 1
+            else:
+                entity_type, value = match
+                entities[entity_type][value] = None
+                position = match_end
+
+        return {entity_type: list(values) for entity_type, values in entities.items()}
+
+def get_entity_lexicon() -> EntityLexicon:
+    """
+    Function to get the process-wide genre and platform lexicon
+
+    The lexicon is compiled once and compiled again only when the game search file changes.
+
+    Parameters
+    ----------
+        None
+
+    Returns
+    -------
+        EntityLexicon
+            The compiled lexicon
+    """
+    return get_cached_resource(
+        key=("entity_lexicon", constants.GAME_SEARCH_PATH),
+        path=constants.GAME_SEARCH_PATH,
+        builder=lambda: EntityLexicon(constants.GAME_SEARCH_PATH)
+    )
@@ -0,0 +1,425 @@
+from __future__ import annotations
+import threading
+from typing import TYPE_CHECKING
+from utils import constants
+from utils.resources import get_cached_resource
+
+if TYPE_CHECKING:
+    import numpy as np
+    from scipy.sparse import csr_matrix
+    from utils.sharding import ShardedScorer
+
+class MatcherIndex:
+    """
+    Class to hold a TF-IDF index fitted on one column of a csv file along with the remaining columns of the file
+    """
+
+    def __init__(self, file_name: str, query_header_name: str) -> None:
+        import pandas as pd
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        self.file_name = file_name
+        self.query_header_name = query_header_name
+
+        # Load the file
+        df = pd.read_csv(file_name)
+
+        # Perform fit and transform on the column name which needs to be queried
+        # The rows of the matrix are L2 normalized by the vectorizer, so cosine similarity is a plain dot product
+        self.vectorizer = TfidfVectorizer()
+        self.matrix = self.vectorizer.fit_transform(df[query_header_name])
+
+        # Keep the columns as plain lists so that results can be picked without going through pandas
+        self.columns: dict[str, list] = {column: df[column].tolist() for column in df.columns}
+
+        # Large indexes are scored in shards on several processes, the matrix is then backed by shared memory
+        self.scorer: ShardedScorer | None = None
+        if self.matrix.shape[0] >= constants.SHARDED_SCORING_MIN_ROWS:
+            from utils.sharding import ShardedScorer
+            self.scorer = ShardedScorer(self.matrix.tocsr(), constants.SHARDED_SCORING_WORKERS)
+            self.matrix = self.scorer.matrix
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    def __getstate__(self) -> dict:
+        # The shared memory of the scorer can't be pickled, it is set up again when the index is loaded
+        state = self.__dict__.copy()
+        if self.scorer is not None:
+            state["matrix"] = self.matrix.copy()
+            state["scorer"] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        if self.matrix.shape[0] >= constants.SHARDED_SCORING_MIN_ROWS:
+            from utils.sharding import ShardedScorer
+            self.scorer = ShardedScorer(self.matrix.tocsr(), constants.SHARDED_SCORING_WORKERS)
+            self.matrix = self.scorer.matrix
+
+    def similarities(self, text: str):
+        """
+        Function to get the cosine similarity of the text with every row of the index
+
+        Parameters
+        ----------
+            text: str
+                Text which needs to be matched
+
+        Returns
+        -------
+            numpy.ndarray
+                1D array having the similarity score for every row
+        """
+        # Transform user input
+        user_input_tfidf = self.vectorizer.transform([text])
+
+        # Calculate cosine similarity between user input and values
+        return self.matrix.dot(user_input_tfidf.T).toarray().ravel()
+
+    def top_k_vector(self, user_input_tfidf: csr_matrix, k: int) -> list[tuple[float, int]]:
+        """
+        Function to get the k rows which are most similar to an already vectorized input
+
+        Parameters
+        ----------
+            user_input_tfidf: csr_matrix
+                L2 normalized TF-IDF vector of the input in the vocabulary of this index
+            k: int
+                Number of rows to return
+
+        Returns
+        -------
+            list[tuple[float, int]]
+                similarity score and index of the rows, most similar first
+        """
+        if self.scorer is not None:
+            return self.scorer.top_k(user_input_tfidf, k)
+        return top_k_similarities(self.matrix.dot(user_input_tfidf.T).toarray().ravel(), k)
+
+    def most_similar(self, text: str) -> tuple[float, int]:
+        """
+        Function to get the row which is most similar to the text
+
+        Parameters
+        ----------
+            text: str
+                Text which needs to be matched
+
+        Returns
+        -------
+            tuple[float, int]
+                similarity score and index of the most similar row
+        """
+        if self.scorer is not None:
+            return self.top_k(text, 1)[0]
+
+        similarities = self.similarities(text)
+
+        # Find the index of the most similar result
+        most_similar_index = int(similarities.argmax())
+
+        return (float(similarities[most_similar_index]), most_similar_index)
+
+    def top_k(self, text: str, k: int) -> list[tuple[float, int]]:
+        """
+        Function to get the k rows which are most similar to the text
+
+        Parameters
+        ----------
+            text: str
+                Text which needs to be matched
+            k: int
+                Number of rows to return
+
+        Returns
+        -------
+            list[tuple[float, int]]
+                similarity score and index of the rows, most similar first
+        """
+        return self.top_k_vector(self.vectorizer.transform([text]), k)
+
+    def get_value(self, index: int, header_name: str):
+        """
+        Function to get the value of a column for the given row
+
+        Parameters
+        ----------
+            index: int
+                Index of the row
+            header_name: str
+                Name of the column
+
+        Returns
+        -------
+            Any
+                Value present in the cell
+        """
+        return self.columns[header_name][index]
+
+def top_k_similarities(similarities: np.ndarray, k: int) -> list[tuple[float, int]]:
+    """
+    Function to pick the k highest similarity scores
+
+    Ties are broken by the index of the row, the same way argmax picks the first maximum.
+
+    Parameters
+    ----------
+        similarities: numpy.ndarray
+            1D array having the similarity score for every row
+        k: int
+            Number of rows to return
+
+    Returns
+    -------
+        list[tuple[float, int]]
+            similarity score and index of the rows, most similar first
+    """
+    import numpy as np
+
+    k = min(k, len(similarities))
+    if k <= 0:
+        return []
+
+    # Partition first so that only k rows need to be sorted, the rows tied with the k-th score are kept for the tie break
+    if k < len(similarities):
+        kth_score = np.partition(similarities, -k)[-k]
+        candidates = np.flatnonzero(similarities >= kth_score)
+    else:
+        candidates = np.arange(len(similarities))
+
+    # Sort by descending score, then by ascending index
+    order = np.lexsort((candidates, -similarities[candidates]))[:k]
+    return [(float(similarities[candidates[i]]), int(candidates[i])) for i in order]
+
+def get_matcher_index(file_name: str, query_header_name: str) -> MatcherIndex:
+    """
+    Function to get the fitted index for a column of a file
+
+    The index is fitted once and reused until the contents of the file change.
+
+    Parameters
+    ----------
+        file_name: str
+            Name of the file which will be searched for similarity
+        query_header_name: str
+            Name of column in the file which will be used to match the user input
+
+    Returns
+    -------
+        MatcherIndex
+            Fitted index for the given file and column
+    """
+    return get_cached_resource(
+        key=("matcher_index", file_name, query_header_name),
+        path=file_name,
+        builder=lambda: MatcherIndex(file_name, query_header_name)
+    )
+
+class MatchQuery:
+    """
+    Class to hold one input vectorized against the shared vocabulary of a MultiHeadMatcher
+
+    The input is counted the first time a head is scored, so a query which ends up unused costs nothing,
+    and the similarity scores of a head are computed the first time they are needed and reused after that.
+    """
+
+    def __init__(self, matcher: "MultiHeadMatcher", text: str) -> None:
+        self.matcher = matcher
+        self.text = text
+        self._counts: csr_matrix | None = None
+        self._similarities: dict[tuple[str, str], np.ndarray] = {}
+
+    @property
+    def counts(self) -> csr_matrix:
+        if self._counts is None:
+            self._counts = self.matcher.vectorizer.transform([self.text])
+        return self._counts
+
+    def has_head(self, file_name: str, query_header_name: str) -> bool:
+        return (file_name, query_header_name) in self.matcher.heads
+
+    def similarities(self, file_name: str, query_header_name: str) -> np.ndarray:
+        """
+        Function to get the cosine similarity of the input with every row of a head
+
+        Parameters
+        ----------
+            file_name: str
+                Name of the file of the head
+            query_header_name: str
+                Name of the column of the head
+
+        Returns
+        -------
+            numpy.ndarray
+                1D array having the similarity score for every row of the head
+        """
+        key = (file_name, query_header_name)
+        similarities = self._similarities.get(key)
+        if similarities is None:
+            index, _ = self.matcher.heads[key]
+            similarities = index.matrix.dot(self.tfidf(file_name, query_header_name).T).toarray().ravel()
+            self._similarities[key] = similarities
+        return similarities
+
+    def tfidf(self, file_name: str, query_header_name: str) -> csr_matrix:
+        """
+        Function to get the TF-IDF vector of the input in the vocabulary of a head
+
+        Parameters
+        ----------
+            file_name: str
+                Name of the file of the head
+            query_header_name: str
+                Name of the column of the head
+
+        Returns
+        -------
+            csr_matrix
+                L2 normalized TF-IDF vector of the input
+        """
+        from sklearn.preprocessing import normalize
+
+        _, projection = self.matcher.heads[(file_name, query_header_name)]
+        # Counts weighted by the idf of the head and L2 normalized, same as the vectorizer of the head would do
+        return normalize(self.counts @ projection)
+
+    def most_similar(self, file_name: str, query_header_name: str) -> tuple[float, int]:
+        """
+        Function to get the row of a head which is most similar to the input
+
+        Parameters
+        ----------
+            file_name: str
+                Name of the file of the head
+            query_header_name: str
+                Name of the column of the head
+
+        Returns
+        -------
+            tuple[float, int]
+                similarity score and index of the most similar row
+        """
+        if self.matcher.heads[(file_name, query_header_name)][0].scorer is not None:
+            return self.top_k(file_name, query_header_name, 1)[0]
+
+        similarities = self.similarities(file_name, query_header_name)
+        most_similar_index = int(similarities.argmax())
+        return (float(similarities[most_similar_index]), most_similar_index)
+
+    def top_k(self, file_name: str, query_header_name: str, k: int) -> list[tuple[float, int]]:
+        """
+        Function to get the k rows of a head which are most similar to the input
+
+        Large heads are scored in shards on several processes instead of computing every similarity here.
+
+        Parameters
+        ----------
+            file_name: str
+                Name of the file of the head
+            query_header_name: str
+                Name of the column of the head
+            k: int
+                Number of rows to return
+
+        Returns
+        -------
+            list[tuple[float, int]]
+                similarity score and index of the rows, most similar first
+        """
+        index, _ = self.matcher.heads[(file_name, query_header_name)]
+        if index.scorer is not None:
+            return index.top_k_vector(self.tfidf(file_name, query_header_name), k)
+        return top_k_similarities(self.similarities(file_name, query_header_name), k)
+
+class MultiHeadMatcher:
+    """
+    Class to score one input against several matcher indexes (heads) while tokenizing and counting it only once
+
+    The input is counted against the union of the vocabularies of the heads. Every head has a
+    sparse projection from the shared vocabulary to its own vocabulary which applies its idf
+    weights, so the scores are exactly the ones the head's own vectorizer would give.
+    """
+
+    def __init__(self, indexes: list[MatcherIndex]) -> None:
+        from scipy.sparse import csr_matrix
+        from sklearn.feature_extraction.text import CountVectorizer
+
+        # Union of the vocabularies of all the heads
+        vocabulary: dict[str, int] = {}
+        for index in indexes:
+            for term in index.vectorizer.vocabulary_:
+                vocabulary.setdefault(term, len(vocabulary))
+
+        # The analyzer is the same as the default one of the TfidfVectorizer of the heads
+        self.vectorizer = CountVectorizer(vocabulary=vocabulary)
+        self.indexes = indexes
+
+        # Projection of every head, keyed by (file name, query header name)
+        self.heads: dict[tuple[str, str], tuple[MatcherIndex, csr_matrix]] = {}
+        for index in indexes:
+            head_vocabulary = index.vectorizer.vocabulary_
+            shared_columns = [vocabulary[term] for term in head_vocabulary]
+            head_columns = list(head_vocabulary.values())
+            projection = csr_matrix(
+                (index.vectorizer.idf_[head_columns], (shared_columns, head_columns)),
+                shape=(len(vocabulary), len(head_vocabulary))
+            )
+            self.heads[(index.file_name, index.query_header_name)] = (index, projection)
+
+    def query(self, text: str) -> MatchQuery:
+        """
+        Function to vectorize the input once so that it can be scored against every head
+
+        Parameters
+        ----------
+            text: str
+                Text which needs to be matched
+
+        Returns
+        -------
+            MatchQuery
+                The vectorized input
+        """
+        return MatchQuery(self, text)
+
+
+# The multi-head matchers built from the most recent indexes of the heads, keyed by the ids of the indexes
+# Turns pinned to an older generation of the indexes keep their matcher while the new one is in use
+_multi_head_matchers: dict[tuple[int, ...], MultiHeadMatcher] = {}
+_multi_head_lock = threading.Lock()
+
+# Generations of the indexes whose matchers are kept
+MULTI_HEAD_MATCHERS_KEPT = 2
+
+def get_multi_head_matcher() -> MultiHeadMatcher:
+    """
+    Function to get the matcher over all the heads in MATCHER_HEADS
+
+    The matcher is rebuilt only when one of the indexes of the heads is rebuilt.
+
+    Parameters
+    ----------
+        None
+
+    Returns
+    -------
+        MultiHeadMatcher
+            Matcher over the current indexes
+    """
+    indexes = [get_matcher_index(file_name, query_header_name) for file_name, query_header_name in constants.MATCHER_HEADS]
+    # The matcher holds the indexes, so their ids are not reused while it is kept
+    key = tuple(id(index) for index in indexes)
+
+    matcher = _multi_head_matchers.get(key)
+    if matcher is None:
+        with _multi_head_lock:
+            matcher = _multi_head_matchers.get(key)
+            if matcher is None:
+                matcher = MultiHeadMatcher(indexes)
+                _multi_head_matchers[key] = matcher
+                # Drop the matchers of the oldest generations
+                while len(_multi_head_matchers) > MULTI_HEAD_MATCHERS_KEPT:
+                    _multi_head_matchers.pop(next(iter(_multi_head_matchers)))
+    return matcher
@@ -0,0 +1,359 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator
+from utils import constants
+
+# Upper bounds in seconds of the buckets of the latency histograms
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Stages timed while processing a turn
+class Stages:
+    TOKENIZE = "tokenize"
+    POS_TAG = "pos_tag"
+    LEMMATIZE = "lemmatize"
+    INTENT_MATCH = "intent_match"
+    QA_MATCH = "qa_match"
+    ENTITY_EXTRACTION = "entity_extraction"
+    CATALOG_SEARCH = "catalog_search"
+    PREFERENCE_IO = "preference_io"
+    HANDLER = "handler"
+
+class Histogram:
+    """
+    Class to count observations in fixed buckets, the quantiles are estimated from the buckets
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        # The last count is the +Inf bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """
+        Function to estimate a quantile by interpolating linearly inside the bucket holding it
+
+        Parameters
+        ----------
+            q: float
+                Quantile between 0 and 1, e.g. 0.95
+
+        Returns
+        -------
+            float
+                Estimated value, 0 if nothing was observed
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                # Values above the last bucket are reported as the last bound
+                upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def summary(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+class MetricsRegistry:
+    """
+    Class to hold the latency histograms of the stages and of the turns along with the error counters
+
+    Gauges are read from the registered functions when the metrics are exported, so the caches
+    don't need to report every hit.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.stage_latency: dict[str, Histogram] = {}
+        self.turn_latency: dict[str, Histogram] = {}
+        self.errors: dict[str, int] = {}
+        self.gauges: dict[str, Callable[[], dict[str, float]]] = {}
+
+    def observe_stage(self, stage: str, seconds: float) -> None:
+        with self.lock:
+            self.stage_latency.setdefault(stage, Histogram()).observe(seconds)
+
+    def observe_turn(self, intent: str, seconds: float) -> None:
+        with self.lock:
+            self.turn_latency.setdefault(intent, Histogram()).observe(seconds)
+
+    def count_error(self, stage: str) -> None:
+        with self.lock:
+            self.errors[stage] = self.errors.get(stage, 0) + 1
+
+    def register_gauge(self, name: str, function: Callable[[], dict[str, float]]) -> None:
+        """
+        Function to register a function giving gauge values, read at every export
+
+        Parameters
+        ----------
+            name: str
+                Name of the gauge
+            function: Callable[[], dict[str, float]]
+                Function giving the value of the gauge for every label, e.g. the hit ratio of every cache
+
+        Returns
+        -------
+            None
+        """
+        self.gauges[name] = function
+
+    def snapshot(self) -> dict[str, Any]:
+        """
+        Function to get the current value of all the metrics
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            dict[str, Any]
+                Summary of the histograms, error counters and gauges
+        """
+        with self.lock:
+            snapshot = {
+                "stages": {stage: histogram.summary() for stage, histogram in self.stage_latency.items()},
+                "intents": {intent: histogram.summary() for intent, histogram in self.turn_latency.items()},
+                "errors": dict(self.errors),
+            }
+        snapshot["gauges"] = {name: function() for name, function in self.gauges.items()}
+        return snapshot
+
+    def prometheus_text(self) -> str:
+        """
+        Function to get the metrics in the Prometheus text exposition format
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            str
+                The metrics, one sample per line
+        """
+        lines = []
+        with self.lock:
+            for name, label, histograms in (
+                ("chatbot_stage_latency_seconds", "stage", self.stage_latency),
+                ("chatbot_turn_latency_seconds", "intent", self.turn_latency),
+            ):
+                lines.append(f"# TYPE {name} histogram")
+                for value, histogram in histograms.items():
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f'{name}_bucket{{{label}="{value}",le="{le}"}} {cumulative}')
+                    lines.append(f'{name}_sum{{{label}="{value}"}} {histogram.sum}')
+                    lines.append(f'{name}_count{{{label}="{value}"}} {histogram.count}')
+
+            lines.append("# TYPE chatbot_errors_total counter")
+            for stage, count in self.errors.items():
+                lines.append(f'chatbot_errors_total{{stage="{stage}"}} {count}')
+
+        for name, function in self.gauges.items():
+            lines.append(f"# TYPE chatbot_{name} gauge")
+            for label, value in function().items():
+                lines.append(f'chatbot_{name}{{name="{label}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+# The process-wide registry
+registry = MetricsRegistry()
+
+# The timers do nothing unless the metrics are enabled
+_enabled = constants.METRICS_ENABLED
+
+# Intent of the turn which is being processed
+_turn_intent: ContextVar[str | None] = ContextVar("turn_intent", default=None)
+
+# Returned by the timers while the metrics are disabled
+_disabled_timer = nullcontext()
+
+def enable_metrics(enabled: bool = True) -> None:
+    """
+    Function to turn the collection of the metrics on or off
+
+    Parameters
+    ----------
+        enabled: bool
+            True to collect the metrics
+
+    Returns
+    -------
+        None
+    """
+    global _enabled
+    _enabled = enabled
+
+def metrics_enabled() -> bool:
+    return _enabled
+
+@contextmanager
+def _timer(stage: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe_stage(stage, time.perf_counter() - start)
+
+def stage(name: str):
+    """
+    Function to time a stage of the turn, e.g. `with stage(Stages.INTENT_MATCH): ...`
+
+    Parameters
+    ----------
+        name: str
+            Name of the stage, one of Stages
+
+    Returns
+    -------
+        ContextManager
+            Timer of the stage, a shared no-op context manager while the metrics are disabled
+    """
+    if not _enabled:
+        return _disabled_timer
+    return _timer(name)
+
+@contextmanager
+def _turn_timer(label: str) -> Iterator[None]:
+    token = _turn_intent.set(None)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe_turn(_turn_intent.get() or label, time.perf_counter() - start)
+        _turn_intent.reset(token)
+
+def turn(label: str):
+    """
+    Function to time a whole turn, the time is recorded under the intent of the turn if it is set
+
+    Parameters
+    ----------
+        label: str
+            Label used if no intent is set during the turn, e.g. the stage of the conversation
+
+    Returns
+    -------
+        ContextManager
+            Timer of the turn, a shared no-op context manager while the metrics are disabled
+    """
+    if not _enabled:
+        return _disabled_timer
+    return _turn_timer(label)
+
+def set_turn_intent(intent: str) -> None:
+    """
+    Function to set the intent under which the time of the current turn is recorded
+
+    Parameters
+    ----------
+        intent: str
+            Intent of the turn
+
+    Returns
+    -------
+        None
+    """
+    if _enabled:
+        _turn_intent.set(intent)
+
+def count_error(stage: str) -> None:
+    """
+    Function to count an error which was handled, e.g. by the blanket except of a turn
+
+    Parameters
+    ----------
+        stage: str
+            Where the error happened
+
+    Returns
+    -------
+        None
+    """
+    if _enabled:
+        registry.count_error(stage)
+
+class JsonDumpExporter:
+    """
+    Class to write a snapshot of the metrics to a JSON file periodically
+    """
+
+    def __init__(self, path: str = constants.METRICS_DUMP_PATH, interval: float = constants.METRICS_DUMP_INTERVAL) -> None:
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def export(self) -> None:
+        """
+        Function to write the current snapshot, the file is replaced atomically
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            None
+        """
+        snapshot = registry.snapshot()
+        snapshot["time"] = time.time()
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, indent=2)
+        os.replace(temporary_path, self.path)
+
+    def run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.export()
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name="metrics-exporter", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Function to stop the exporter after writing a last snapshot
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            None
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.export()
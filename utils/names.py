@@ -0,0 +1,176 @@
+import re
+import threading
+from typing import Callable
+from utils.lexicon import get_stopwords
+from utils.metrics import registry
+
+# Tiers of the name extractor, from the cheapest to the slowest
+PATTERN = "pattern"
+BARE = "bare"
+GAZETTEER = "gazetteer"
+NE_CHUNK = "ne_chunk"
+# The slowest tier ran and found no name either
+NOT_FOUND = "not_found"
+
+# Phrases which are always followed by a name
+_STRONG_LEAD = r"my\s+name\s+is|my\s+name's|name's|call\s+me|you\s+can\s+call\s+me"
+# Phrases which are followed by a name only if it looks like one, e.g. not in "I'm fine"
+_WEAK_LEAD = r"i\s+am|i'm|im|this\s+is|it's|it\s+is"
+
+# A short message introducing the user, optionally after a greeting, e.g. "Hi, my name is Alice."
+NAME_PATTERN = re.compile(
+    rf"^(?:(?:hi|hello|hey)\b[\s,!.]*)?(?:(?P<strong>{_STRONG_LEAD})|(?P<weak>{_WEAK_LEAD}))\s+"
+    r"(?P<name>[^\W\d_][\w'-]*(?:\s+[^\W\d_][\w'-]*)?)[\s.!]*$",
+    re.IGNORECASE
+)
+
+# Words of a message
+WORD_PATTERN = re.compile(r"[^\W\d_][\w'-]*")
+
+# Short replies which are not names even when they are capitalized
+NOT_NAMES = frozenset(["hi", "hello", "hey", "yes", "no", "yeah", "nope", "ok", "okay", "thanks", "bye", "fine", "good", "sure"])
+
+class NameExtractor:
+    """
+    Class to extract the name of the user from a message with the cheapest method which is sure of it
+
+    Introductions like "my name is X" or "I'm X" and a bare capitalized word are matched with
+    patterns, names in the gazetteer of nltk are looked up in a set, and only the other messages
+    are handed to the slow named entity chunker. Like the chunker, the last word of a name is
+    returned, e.g. "Smith" for "I am John Smith".
+    """
+
+    def __init__(self) -> None:
+        self.stopwords = get_stopwords()
+        # The gazetteer is loaded the first time it is needed
+        self._gazetteer: frozenset[str] | None = None
+        self._gazetteer_lock = threading.Lock()
+        self._counts_lock = threading.Lock()
+        self.counts = dict.fromkeys((PATTERN, BARE, GAZETTEER, NE_CHUNK, NOT_FOUND), 0)
+
+    @property
+    def gazetteer(self) -> frozenset[str]:
+        if self._gazetteer is None:
+            with self._gazetteer_lock:
+                if self._gazetteer is None:
+                    try:
+                        from nltk.corpus import names
+                        self._gazetteer = frozenset(name.lower() for name in names.words())
+                    except LookupError:
+                        # The names corpus is optional, without it the tier never matches
+                        self._gazetteer = frozenset()
+        return self._gazetteer
+
+    def is_name(self, word: str) -> bool:
+        return word.lower() not in self.stopwords and word.lower() not in NOT_NAMES
+
+    def fast_extract(self, text: str) -> tuple[str, str] | None:
+        """
+        Function to extract the name with the patterns and the gazetteer
+
+        Parameters
+        ----------
+            text: str
+                Message of the user
+
+        Returns
+        -------
+            tuple[str, str] | None
+                Name and tier which found it, None if the message is ambiguous
+        """
+        text = text.strip()
+
+        # Introductions
+        match = NAME_PATTERN.match(text)
+        if match:
+            words = match["name"].split()
+            if all(self.is_name(word) for word in words) and (
+                match["strong"] or all(word[0].isupper() for word in words) or words[-1].lower() in self.gazetteer
+            ):
+                return (words[-1], PATTERN)
+
+        words = WORD_PATTERN.findall(text)
+
+        # A single capitalized word, e.g. "Alice"
+        if len(words) == 1 and len(text) == len(words[0]) and words[0][0].isupper() and self.is_name(words[0]):
+            return (words[0], BARE)
+
+        # Known names, capitalized unless they are the whole message
+        names = [
+            word for word in words
+            if word.lower() in self.gazetteer and self.is_name(word) and (word[0].isupper() or len(words) == 1)
+        ]
+        if names:
+            return (names[-1], GAZETTEER)
+
+        return None
+
+    def extract(self, text: str, fallback: Callable[[str], str | None]) -> str | None:
+        """
+        Function to extract the name, escalating to the fallback only if the fast tiers are not sure
+
+        Parameters
+        ----------
+            text: str
+                Message of the user
+            fallback: Callable[[str], str | None]
+                Slow extractor, e.g. the named entity chunker
+
+        Returns
+        -------
+            str | None
+                The name, None if no tier found one
+        """
+        extracted = self.fast_extract(text)
+        if extracted is not None:
+            name, tier = extracted
+        else:
+            name = fallback(text)
+            tier = NE_CHUNK if name else NOT_FOUND
+
+        with self._counts_lock:
+            self.counts[tier] += 1
+        return name
+
+    def tier_counts(self) -> dict[str, int]:
+        """
+        Function to get how many names every tier extracted
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            dict[str, int]
+                Number of messages handled by every tier, including the messages in which no name was found
+        """
+        with self._counts_lock:
+            return dict(self.counts)
+
+
+# The process-wide name extractor, created the first time it is needed
+_extractor: NameExtractor | None = None
+_extractor_lock = threading.Lock()
+
+def get_name_extractor() -> NameExtractor:
+    """
+    Function to get the shared name extractor
+
+    Parameters
+    ----------
+        None
+
+    Returns
+    -------
+        NameExtractor
+            The name extractor
+    """
+    global _extractor
+    if _extractor is None:
+        with _extractor_lock:
+            if _extractor is None:
+                _extractor = NameExtractor()
+                # Export how often the chunker still runs
+                registry.register_gauge("name_extraction_tier", _extractor.tier_counts)
+    return _extractor
@@ -1,97 +1,473 @@
-import json
+import atexit
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
 from utils import constants
+from utils.metrics import Stages, stage
 
-def load_preferences() -> dict[str,str]:
+# The session whose preferences are read and written when no session is given explicitly
+current_session: ContextVar[str] = ContextVar("current_session", default=constants.DEFAULT_SESSION_ID)
+
+class SQLitePreferenceBackend:
+    """
+    Class to persist the preferences of every session in a SQLite database running in WAL mode
+
+    A single connection is opened the first time it is needed and shared by all the threads under
+    a lock, so the PRAGMAs and the schema run once and the compiled statements stay cached. Reads
+    are rare since the store keeps the sessions in memory, so they don't need a connection of their own.
+    """
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY,
+            last_seen REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen)",
+        """
+        CREATE TABLE IF NOT EXISTS preferences (
+            session_id TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT NOT NULL,
+            PRIMARY KEY (session_id, key)
+        )
+        """,
+    )
+
+    # The statements are parameterized so that sqlite3 can reuse the compiled statements
+    SELECT_PREFERENCES = "SELECT key, value FROM preferences WHERE session_id = ?"
+    UPSERT_PREFERENCE = (
+        "INSERT INTO preferences (session_id, key, value) VALUES (?, ?, ?) "
+        "ON CONFLICT (session_id, key) DO UPDATE SET value = excluded.value"
+    )
+    UPSERT_SESSION = (
+        "INSERT INTO sessions (session_id, last_seen) VALUES (?, ?) "
+        "ON CONFLICT (session_id) DO UPDATE SET last_seen = excluded.last_seen"
+    )
+    SELECT_EXPIRED_SESSIONS = "SELECT session_id FROM sessions WHERE last_seen < ?"
+    DELETE_SESSION_PREFERENCES = "DELETE FROM preferences WHERE session_id = ?"
+    DELETE_SESSION = "DELETE FROM sessions WHERE session_id = ?"
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._connection: sqlite3.Connection | None = None
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # Use the shared connection, opening it if it is not open yet
+        with self._lock:
+            if self._connection is None:
+                # The connection is used by many threads but never by two of them at once
+                connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+                # WAL lets other processes read while the chatbot writes
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute("PRAGMA synchronous=NORMAL")
+                with connection:
+                    for statement in self.SCHEMA:
+                        connection.execute(statement)
+                self._connection = connection
+            yield self._connection
+
+    def close(self) -> None:
+        """
+        Function to close the connection, it is opened again if the backend is used afterwards
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            None
+        """
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def load(self, session_id: str) -> dict[str, str]:
+        """
+        Function to read the stored preferences of a session
+
+        Parameters
+        ----------
+            session_id: str
+                Id of the session
+
+        Returns
+        -------
+            dict[str, str]
+                A dictionary containing the stored preferences of the session
+        """
+        with self._connect() as connection:
+            return dict(connection.execute(self.SELECT_PREFERENCES, (session_id,)).fetchall())
+
+    def save(self, changes: dict[str, dict[str, str]], last_seen: dict[str, float]) -> None:
+        """
+        Function to write the changed preferences of multiple sessions in a single transaction
+
+        Parameters
+        ----------
+            changes: dict[str, dict[str, str]]
+                Changed preferences keyed by session id
+            last_seen: dict[str, float]
+                Time of the last activity keyed by session id
+
+        Returns
+        -------
+            None
+        """
+        with self._connect() as connection, connection:
+            connection.executemany(
+                self.UPSERT_PREFERENCE,
+                [(session_id, key, value) for session_id, values in changes.items() for key, value in values.items()]
+            )
+            connection.executemany(self.UPSERT_SESSION, list(last_seen.items()))
+
+    def expire(self, before: float) -> list[str]:
+        """
+        Function to delete the sessions which were last active before the given time
+
+        Parameters
+        ----------
+            before: float
+                Unix timestamp before which the sessions are considered expired
+
+        Returns
+        -------
+            list[str]
+                Ids of the deleted sessions
+        """
+        with self._connect() as connection, connection:
+            session_ids = [row[0] for row in connection.execute(self.SELECT_EXPIRED_SESSIONS, (before,)).fetchall()]
+            connection.executemany(self.DELETE_SESSION_PREFERENCES, [(session_id,) for session_id in session_ids])
+            connection.executemany(self.DELETE_SESSION, [(session_id,) for session_id in session_ids])
+        return session_ids
+
+class PreferenceStore:
+    """
+    Class to hold the preferences of every session in memory and write them back to the backend in the background
+
+    Reads are served from memory. Writes mark the session as dirty and schedule a flush which is
+    debounced, so a burst of updates from any number of sessions results in a single transaction.
+    """
+
+    def __init__(self, backend: SQLitePreferenceBackend, flush_delay: float) -> None:
+        self.backend = backend
+        self.flush_delay = flush_delay
+        self._sessions: dict[str, dict[str, str]] = {}
+        self._last_seen: dict[str, float] = {}
+        self._pending: dict[str, dict[str, str]] = {}
+        self._timer: threading.Timer | None = None
+        self._lock = threading.RLock()
+
+    def _load(self, session_id: str) -> dict[str, str]:
+        # Read the session from the backend only the first time it is needed
+        preferences = self._sessions.get(session_id)
+        if preferences is None:
+            preferences = dict(constants.DEFAULT_PREFERENCES)
+            preferences.update(self.backend.load(session_id))
+            self._sessions[session_id] = preferences
+        return preferences
+
+    def get_all(self, session_id: str) -> dict[str, str]:
+        """
+        Function to get a copy of all the preferences of a session
+
+        Parameters
+        ----------
+            session_id: str
+                Id of the session
+
+        Returns
+        -------
+            dict[str, str]
+                A dictionary containing preferences
+        """
+        with self._lock:
+            self._last_seen[session_id] = time.time()
+            return dict(self._load(session_id))
+
+    def get(self, session_id: str, key: str) -> str | None:
+        """
+        Function to get the preference of a session if available
+
+        Parameters
+        ----------
+            session_id: str
+                Id of the session
+            key: str
+                The key that needs to be fetched
+
+        Returns
+        -------
+            str | None
+                The value of the given key
+        """
+        with self._lock:
+            self._last_seen[session_id] = time.time()
+            return self._load(session_id).get(key)
+
+    def update(self, session_id: str, values: dict[str, str]) -> None:
+        """
+        Function to update the preferences of a session in memory and schedule them to be written to the backend
+
+        Parameters
+        ----------
+            session_id: str
+                Id of the session
+            values: dict[str, str]
+                The keys and values that need to be updated or created
+
+        Returns
+        -------
+            None
+        """
+        with self._lock:
+            self._load(session_id).update(values)
+            self._pending.setdefault(session_id, {}).update(values)
+            self._last_seen[session_id] = time.time()
+
+            # Restart the timer so that the backend is written only once the updates settle down
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.flush_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self) -> None:
+        """
+        Function to write the pending changes of all the sessions to the backend
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            None
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+            if not self._pending:
+                return
+
+            # Take the pending changes so that the sessions can keep being updated while they are written
+            pending, self._pending = self._pending, {}
+            last_seen = {session_id: self._last_seen[session_id] for session_id in pending}
+
+        try:
+            self.backend.save(pending, last_seen)
+        except Exception:
+            # Put the changes back, newer changes of the same keys take precedence
+            with self._lock:
+                for session_id, values in pending.items():
+                    self._pending[session_id] = {**values, **self._pending.get(session_id, {})}
+            raise
+
+    def expire(self, ttl: float) -> int:
+        """
+        Function to remove the sessions which were not active in the last ttl seconds
+
+        Parameters
+        ----------
+            ttl: float
+                Time to live of a session in seconds
+
+        Returns
+        -------
+            int
+                Number of sessions removed from the backend
+        """
+        before = time.time() - ttl
+
+        # Persist the pending changes first
+        self.flush()
+
+        with self._lock:
+            # Drop the idle sessions from memory and record the activity of the others so that they are not expired
+            for session_id, last_seen in list(self._last_seen.items()):
+                if last_seen < before:
+                    self._sessions.pop(session_id, None)
+                    self._last_seen.pop(session_id, None)
+            self.backend.save({}, dict(self._last_seen))
+
+            expired_sessions = self.backend.expire(before)
+            for session_id in expired_sessions:
+                self._sessions.pop(session_id, None)
+                self._last_seen.pop(session_id, None)
+
+        return len(expired_sessions)
+
+    def close(self) -> None:
+        """
+        Function to write the pending changes and close the backend, e.g. when the program exits
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            None
+        """
+        try:
+            self.flush()
+        finally:
+            self.backend.close()
+
+# The process-wide preference store
+_store = PreferenceStore(SQLitePreferenceBackend(constants.PREFERENCE_DB_PATH), constants.PREFERENCE_FLUSH_DELAY)
+
+# Make sure pending changes are not lost and the database is closed when the program exits
+atexit.register(_store.close)
+
+@contextmanager
+def use_session(session_id: str) -> Iterator[None]:
     """
-    Function to read preferences.json and return the data in dictionary form
-    
+    Context manager to read and write the preferences of the given session within the block
+
     Parameters
     ----------
-        None
+        session_id: str
+            Id of the session
 
     Returns
     -------
-        dict[str,str]:
-            A dictionary containing preferences 
+        Iterator[None]
     """
+    token = current_session.set(session_id)
+    try:
+        yield
+    finally:
+        current_session.reset(token)
 
-    with open(constants.PREFERENCE_PATH, "r") as f:
-        data = json.load(f)
-    return data
+def load_preferences(session_id: str | None = None) -> dict[str,str]:
+    """
+    Function to get the preferences of a session in dictionary form
+
+    Parameters
+    ----------
+        session_id: str | None
+            Id of the session. Defaults to the current session
 
-def get_preference(key: str) -> str | None:
+    Returns
+    -------
+        dict[str,str]:
+            A dictionary containing preferences
+    """
+    with stage(Stages.PREFERENCE_IO):
+        return _store.get_all(session_id or current_session.get())
+
+def get_preference(key: str, session_id: str | None = None) -> str | None:
     """
-    Function to get the preference if available 
-    
+    Function to get the preference if available
+
     Parameters
     ----------
         key: str
             The key that needs to be fetched
+        session_id: str | None
+            Id of the session. Defaults to the current session
 
     Returns
     -------
         str | None
-            The value of the given key from preferences.json 
+            The value of the given key
     """
-    preferences = load_preferences()
-    return preferences.get(key)   
+    with stage(Stages.PREFERENCE_IO):
+        return _store.get(session_id or current_session.get(), key)
 
-def update_preferences(key: str, value: str) -> None:
+def update_preferences(key: str, value: str, session_id: str | None = None) -> None:
     """
-    Function to update the preference if available or create a new one 
-    
+    Function to update the preference if available or create a new one
+
     Parameters
     ----------
         key: str
             The key that needs to be updated or created
         value: str
             The value corresponding to the key that will be inserted
+        session_id: str | None
+            Id of the session. Defaults to the current session
 
     Returns
     -------
-        None 
+        None
+    """
+    with stage(Stages.PREFERENCE_IO):
+        _store.update(session_id or current_session.get(), {key: value})
+
+def clear_preferences(session_id: str | None = None) -> None:
     """
-    preferences = load_preferences()
-    preferences[key] = value
+    Function to clear preferences of a session. This is done when the user exits the program
+
+    Parameters
+    ----------
+        session_id: str | None
+            Id of the session. Defaults to the current session
 
-    with open(constants.PREFERENCE_PATH, "w") as f:
-        json.dump(preferences, f)
+    Returns
+    -------
+        None
+    """
+    session_id = session_id or current_session.get()
+    with stage(Stages.PREFERENCE_IO):
+        preferences = _store.get_all(session_id)
+        _store.update(session_id, {key: "" for key in preferences.keys()})
 
-def clear_preferences() -> None:
+def clear_preferences_except_username(session_id: str | None = None) -> None:
     """
-    Function to clear preferences. This is done when the user exits the program
-    
+    Function to clear preferences of a session except username.
+
     Parameters
     ----------
+        session_id: str | None
+            Id of the session. Defaults to the current session
+
+    Returns
+    -------
         None
+    """
+    session_id = session_id or current_session.get()
+    with stage(Stages.PREFERENCE_IO):
+        preferences = _store.get_all(session_id)
+        _store.update(session_id, {key: "" for key in preferences.keys() if key != "username"})
+
+def expire_sessions(ttl: float = constants.SESSION_TTL) -> int:
+    """
+    Function to remove the preferences of all the sessions which were not active in the last ttl seconds
+
+    Parameters
+    ----------
+        ttl: float
+            Time to live of a session in seconds
 
     Returns
     -------
-        None 
+        int
+            Number of sessions removed
     """
-    preferences = load_preferences()
-    for key in preferences.keys():
-        preferences[key] = ""
+    return _store.expire(ttl)
 
-    with open(constants.PREFERENCE_PATH, "w") as f:
-        json.dump(preferences, f)
-    
-def clear_preferences_except_username() -> None:
+def flush_preferences() -> None:
     """
-    Function to clear preferences except username.
-    
+    Function to immediately write the pending preference changes to the database
+
     Parameters
     ----------
         None
 
     Returns
     -------
-        None 
+        None
     """
-    preferences = load_preferences()
-    for key in preferences.keys():
-        if key != "username":
-            preferences[key] = ""
-
-    with open(constants.PREFERENCE_PATH, "w") as f:
-        json.dump(preferences, f)
+    _store.flush()
@@ -0,0 +1,124 @@
+import threading
+from utils import constants
+from utils.resources import cached_resources, file_signature, reload_resource, set_watched
+
+class ReloadWatcher:
+    """
+    Class to poll the files the resources are built from and rebuild the resources in the background
+
+    A file is reloaded once its modification time and size are the same on two polls in a row, so
+    a file which is still being written is not loaded half way. The new resource is swapped in
+    atomically, the turns which are running keep using the generation they started with.
+    """
+
+    def __init__(self, interval: float = constants.RELOAD_POLL_INTERVAL) -> None:
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        # Signature of every changed file seen on the previous poll
+        self._pending: dict[str, tuple[int, int]] = {}
+
+    def poll(self) -> list:
+        """
+        Function to check the files once and rebuild the resources of the files which have changed
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            list
+                Keys of the resources which were swapped
+        """
+        reloaded = []
+        signatures: dict[str, tuple[int, int] | None] = {}
+        for key, cached in cached_resources().items():
+            if cached.path not in signatures:
+                try:
+                    signatures[cached.path] = file_signature(cached.path)
+                except OSError:
+                    # The file is being replaced, try again on the next poll
+                    signatures[cached.path] = None
+            signature = signatures[cached.path]
+            if signature is None or signature == cached.signature:
+                continue
+
+            # Wait for the file to settle
+            if self._pending.get(cached.path) != signature:
+                continue
+
+            try:
+                if reload_resource(key, cached):
+                    reloaded.append(key)
+            except Exception:
+                # Keep serving the old version, e.g. if the new file can't be parsed
+                pass
+
+        self._pending = {path: signature for path, signature in signatures.items() if signature is not None}
+        return reloaded
+
+    def run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+    def start(self) -> None:
+        """
+        Function to start watching the files on a daemon thread
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            None
+        """
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self.run, name="reload-watcher", daemon=True)
+        self._thread.start()
+        # The turns no longer need to check the files themselves
+        set_watched(True)
+
+    def stop(self) -> None:
+        """
+        Function to stop watching the files
+
+        Parameters
+        ----------
+            None
+
+        Returns
+        -------
+            None
+        """
+        set_watched(False)
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+# The process-wide watcher
+_watcher: ReloadWatcher | None = None
+
+def start_reload_watcher(interval: float = constants.RELOAD_POLL_INTERVAL) -> ReloadWatcher:
+    """
+    Function to start the process-wide reload watcher, calling it again returns the running watcher
+
+    Parameters
+    ----------
+        interval: float
+            Seconds between two polls of the files
+
+    Returns
+    -------
+        ReloadWatcher
+            The running watcher
+    """
+    global _watcher
+    if _watcher is None:
+        _watcher = ReloadWatcher(interval)
+        _watcher.start()
+    return _watcher
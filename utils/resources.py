@@ -0,0 +1,322 @@
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator
+
+class CachedResource:
+    """
+    Class to hold a resource built from a file along with the state of the file it was built from
+
+    It is never modified once published, since the generations pinned by the turns share it.
+    """
+
+    def __init__(self, value: Any, signature: tuple[int, int], digest: str, path: str, builder: Callable[[], Any]) -> None:
+        self.value = value
+        self.signature = signature
+        self.digest = digest
+        # Kept so that the resource can be rebuilt in the background when the file changes
+        self.path = path
+        self.builder = builder
+
+
+# Registry of the resources built so far, keyed by the caller supplied key
+# The dictionary is never modified, a new one is swapped in whenever a resource is built (copy on write),
+# so a reference to it is a consistent snapshot of one generation of the resources
+_resources: dict[Any, CachedResource] = {}
+# Incremented every time a new dictionary of resources is swapped in
+_generation = 0
+
+# Resources pinned by the current turn, see use_generation
+_pinned: ContextVar[dict[Any, CachedResource] | None] = ContextVar("pinned_resources", default=None)
+
+# Set while the files are watched by the reload watcher, the resources are then served without checking the files
+_watched = False
+# Set while the reload watcher rebuilds the resources, the files are then always checked
+_checking_files: ContextVar[bool] = ContextVar("checking_files", default=False)
+
+# Resources loaded from the build artifacts along with the digest of the file they were built from, loaded on first use
+_prebuilt: dict[Any, tuple[str, Any]] | None = None
+_prebuilt_lock = threading.Lock()
+
+# Locks to make sure a resource is built only once even if it is requested from multiple threads
+_registry_lock = threading.Lock()
+_build_locks: dict[Any, threading.Lock] = {}
+
+def file_signature(path: str) -> tuple[int, int]:
+    """
+    Function to get a cheap signature of the file which changes whenever the file is modified
+
+    Parameters
+    ----------
+        path: str
+            Path of the file
+
+    Returns
+    -------
+        tuple[int, int]
+            modification time in nanoseconds and size of the file
+    """
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+def file_digest(path: str) -> str:
+    """
+    Function to get the sha256 hash of the contents of the file
+
+    Parameters
+    ----------
+        path: str
+            Path of the file
+
+    Returns
+    -------
+        str
+            Hex digest of the file contents
+    """
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def set_prebuilt_resources(prebuilt: dict[Any, tuple[str, Any]]) -> None:
+    """
+    Function to replace the resources taken from the build artifacts
+
+    Parameters
+    ----------
+        prebuilt: dict[Any, tuple[str, Any]]
+            Digest of the file and resource for every key, empty to always build the resources
+
+    Returns
+    -------
+        None
+    """
+    global _prebuilt
+    with _prebuilt_lock:
+        _prebuilt = prebuilt
+
+def get_prebuilt_resource(key: Any, digest: str) -> Any | None:
+    """
+    Function to get a resource from the build artifacts if it was built from a file with the given digest
+
+    Parameters
+    ----------
+        key: Any
+            Key which identifies the resource
+        digest: str
+            Hex digest of the current contents of the file
+
+    Returns
+    -------
+        Any | None
+            The prebuilt resource, None if there is none or the file has changed since the build
+    """
+    global _prebuilt
+    if _prebuilt is None:
+        with _prebuilt_lock:
+            if _prebuilt is None:
+                from utils.artifacts import load_artifacts
+                _prebuilt = load_artifacts()
+
+    entry = _prebuilt.get(key)
+    if entry is None or entry[0] != digest:
+        return None
+    return entry[1]
+
+def get_cached_resource(key: Any, path: str, builder: Callable[[], Any]) -> Any:
+    """
+    Function to get a resource built from a file, building it only if it was never built or the file has changed
+
+    The file is considered changed only if its contents differ. A change in the modification time alone
+    (e.g. the file was touched or checked out again) only triggers a hash comparison, not a rebuild.
+
+    Parameters
+    ----------
+        key: Any
+            Hashable key which identifies the resource
+        path: str
+            Path of the file the resource is built from
+        builder: Callable[[], Any]
+            Function which builds the resource from the file
+
+    Returns
+    -------
+        Any
+            The cached or freshly built resource
+    """
+    # The resources pinned by the turn are used as is, so the turn sees a single generation
+    pinned = _pinned.get()
+    if pinned is not None and key in pinned:
+        return pinned[key].value
+
+    cached = _resources.get(key)
+
+    # Fastest path, the reload watcher is in charge of noticing the changes of the file
+    if cached is not None and _watched and not _checking_files.get():
+        return cached.value
+
+    # Fast path, the file has not been modified since the resource was built
+    signature = file_signature(path)
+    if cached is not None and cached.signature == signature:
+        return cached.value
+
+    # Get the lock which guards the build of this resource
+    with _registry_lock:
+        build_lock = _build_locks.setdefault(key, threading.Lock())
+
+    with build_lock:
+        # Another thread might have built the resource while we were waiting for the lock
+        cached = _resources.get(key)
+        if cached is not None and cached.signature == signature:
+            return cached.value
+
+        digest = file_digest(path)
+
+        # Only the modification time has changed, the contents are the same. The entry may be pinned by
+        # running turns, so a copy with the new signature is swapped in instead of modifying it
+        if cached is not None and cached.digest == digest:
+            publish_resource(key, CachedResource(value=cached.value, signature=signature, digest=digest, path=path, builder=cached.builder))
+            return cached.value
+
+        # Use the resource from the build artifacts if it was built from the same contents, else build it
+        prebuilt = get_prebuilt_resource(key, digest) if cached is None else None
+        value = prebuilt if prebuilt is not None else builder()
+        publish_resource(key, CachedResource(value=value, signature=signature, digest=digest, path=path, builder=builder))
+        return value
+
+def publish_resource(key: Any, cached: CachedResource) -> None:
+    """
+    Function to swap in a new generation of the resources having the given resource
+
+    Parameters
+    ----------
+        key: Any
+            Key which identifies the resource
+        cached: CachedResource
+            The built resource
+
+    Returns
+    -------
+        None
+    """
+    global _resources, _generation
+    with _registry_lock:
+        _resources = {**_resources, key: cached}
+        _generation += 1
+
+def current_generation() -> int:
+    """
+    Function to get the number of times the resources were swapped
+
+    Parameters
+    ----------
+        None
+
+    Returns
+    -------
+        int
+            The generation of the resources
+    """
+    return _generation
+
+@contextmanager
+def use_generation() -> Iterator[int]:
+    """
+    Function to pin the current generation of the resources for the duration of a turn
+
+    A resource rebuilt by the reload watcher while the turn is running is used by the next turns only,
+    so a turn never mixes e.g. the intents of the old file with the responses of the new one.
+
+    Parameters
+    ----------
+        None
+
+    Returns
+    -------
+        Iterator[int]
+            Context manager giving the pinned generation
+    """
+    if _pinned.get() is not None:
+        # Already pinned by an outer turn
+        yield _generation
+        return
+
+    with _registry_lock:
+        resources, generation = _resources, _generation
+    token = _pinned.set(resources)
+    try:
+        yield generation
+    finally:
+        _pinned.reset(token)
+
+def set_watched(watched: bool) -> None:
+    """
+    Function to tell the registry if the files are watched by the reload watcher
+
+    Parameters
+    ----------
+        watched: bool
+            True while the reload watcher is running
+
+    Returns
+    -------
+        None
+    """
+    global _watched
+    _watched = watched
+
+def reload_resource(key: Any, cached: CachedResource) -> bool:
+    """
+    Function to rebuild a resource if its file has changed, called by the reload watcher
+
+    Parameters
+    ----------
+        key: Any
+            Key which identifies the resource
+        cached: CachedResource
+            The resource currently in use
+
+    Returns
+    -------
+        bool
+            True if a new version of the resource was swapped in
+    """
+    token = _checking_files.set(True)
+    try:
+        # Goes through the same path as the turns, which rebuilds the resource only if the contents differ
+        return get_cached_resource(key, cached.path, cached.builder) is not cached.value
+    finally:
+        _checking_files.reset(token)
+
+def cached_resources() -> dict[Any, CachedResource]:
+    """
+    Function to get a snapshot of the resources built so far
+
+    Parameters
+    ----------
+        None
+
+    Returns
+    -------
+        dict[Any, CachedResource]
+            Cached resource for every key
+    """
+    with _registry_lock:
+        return dict(_resources)
+
+def clear_cached_resources() -> None:
+    """
+    Function to drop all the cached resources so that they are rebuilt on the next access
+
+    Parameters
+    ----------
+        None
+
+    Returns
+    -------
+        None
+    """
+    global _resources, _generation
+    with _registry_lock:
+        _resources = {}
+        _generation += 1
@@ -0,0 +1,185 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator
+from utils import constants
+from utils.preference import current_session
+
+class Stage:
+    """
+    Class to hold the stages a conversation can be in
+    """
+
+    # Waiting for the user to tell their name
+    AWAITING_USERNAME = "awaiting_username"
+    # Waiting for a new request from the user
+    IDLE = "idle"
+    # Game search is waiting for the genre
+    AWAITING_GENRE = "awaiting_genre"
+    # Game search is waiting for the platform
+    AWAITING_PLATFORM = "awaiting_platform"
+    # Waiting for a yes/no confirmation of the guessed game
+    AWAITING_CONFIRMATION = "awaiting_confirmation"
+    # Waiting for the name of the game after a game fact could not be resolved
+    AWAITING_GAME_NAME = "awaiting_game_name"
+    # Waiting for the name of the game after the user rejected the guessed game
+    AWAITING_GAME_REPROMPT = "awaiting_game_reprompt"
+    # The user has ended the conversation
+    ENDED = "ended"
+
+@dataclass(frozen=True)
+class SessionState:
+    """
+    Class to hold the state of a conversation between two user messages
+
+    The state is immutable, every step of the conversation returns a new state.
+    """
+
+    session_id: str = constants.DEFAULT_SESSION_ID
+    stage: str = Stage.AWAITING_USERNAME
+    # Intent of the request which is being handled
+    intent: str | None = None
+    # Genre and platform captured from the request and from the follow-up answers of a game search
+    genre: str | None = None
+    platform: str | None = None
+    genre_result: str | None = None
+    platform_result: str | None = None
+    platform_result_response: str | None = None
+    # Game which needs to be confirmed by the user
+    candidate_game: str | None = None
+    # Stage to go back to if the user rejects the candidate game
+    rejection_stage: str | None = None
+    # Runner-up games offered one after the other if the user rejects the candidate game
+    alternative_games: tuple[str, ...] = ()
+
+# Signature of a function which handles one user message
+StepFunction = Callable[[SessionState, str], tuple[SessionState, list[str]]]
+
+class ConsoleIO:
+    """
+    Class to read the user messages from the console and print the chatbot messages on it
+    """
+
+    def read(self) -> str:
+        return input(f"{constants.USER}: ")
+
+    def write(self, messages: list[str]) -> None:
+        for message in messages:
+            print(f"{constants.CHATBOT_NAME}: {message}")
+
+class ScriptedIO:
+    """
+    Class to feed the user messages from an iterator and collect the chatbot messages, e.g. to replay a transcript
+
+    Like input(), reading past the last message raises EOFError.
+    """
+
+    def __init__(self, lines: Iterable[str]) -> None:
+        self.lines = iter(lines)
+        self.messages: list[str] = []
+
+    def read(self) -> str:
+        try:
+            return next(self.lines)
+        except StopIteration:
+            raise EOFError("No more scripted user messages")
+
+    def write(self, messages: list[str]) -> None:
+        self.messages.extend(messages)
+
+
+# The I/O of the dialogs which read the user messages themselves
+current_io: ContextVar[ConsoleIO | ScriptedIO] = ContextVar("current_io", default=ConsoleIO())
+
+@contextmanager
+def use_io(io: ConsoleIO | ScriptedIO) -> Iterator[ConsoleIO | ScriptedIO]:
+    """
+    Context manager to read the user messages from and write the chatbot messages to the given I/O within the block
+
+    Parameters
+    ----------
+        io: ConsoleIO | ScriptedIO
+            I/O of the conversation
+
+    Returns
+    -------
+        Iterator[ConsoleIO | ScriptedIO]
+            The given I/O
+    """
+    token = current_io.set(io)
+    try:
+        yield io
+    finally:
+        current_io.reset(token)
+
+def read_input() -> str:
+    """
+    Function to read the next user message from the current I/O
+
+    Parameters
+    ----------
+        None
+
+    Returns
+    -------
+        str
+            The user message
+    """
+    return current_io.get().read()
+
+def print_messages(messages: list[str]) -> None:
+    """
+    Function to print the chatbot messages on the current I/O, the console by default
+
+    Parameters
+    ----------
+        messages: list[str]
+            Messages to print
+
+    Returns
+    -------
+        None
+    """
+    current_io.get().write(messages)
+
+def run_dialog(state: SessionState, messages: list[str], step: StepFunction) -> SessionState:
+    """
+    Function to drive a dialog on the current I/O until the conversation goes back to idle
+
+    Parameters
+    ----------
+        state: SessionState
+            State in which the dialog starts
+        messages: list[str]
+            Messages to print before asking for the first input
+        step: StepFunction
+            Function which handles every user message of the dialog
+
+    Returns
+    -------
+        SessionState
+            State in which the dialog ended
+    """
+    print_messages(messages)
+    while state.stage not in (Stage.IDLE, Stage.ENDED):
+        state, messages = step(state, read_input())
+        print_messages(messages)
+    return state
+
+def new_session_state(stage: str = Stage.AWAITING_USERNAME, **kwargs) -> SessionState:
+    """
+    Function to create the state of a conversation tied to the current session
+
+    Parameters
+    ----------
+        stage: str
+            Stage in which the conversation starts
+        kwargs:
+            Other fields of the state
+
+    Returns
+    -------
+        SessionState
+            The new state
+    """
+    return SessionState(session_id=current_session.get(), stage=stage, **kwargs)
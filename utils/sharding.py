@@ -0,0 +1,214 @@
+from __future__ import annotations
+import heapq
+import math
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from typing import TYPE_CHECKING
+from utils import constants
+
+if TYPE_CHECKING:
+    from scipy.sparse import csr_matrix
+
+# Arrays of a csr matrix which are placed in shared memory
+CSR_ARRAYS = ("data", "indices", "indptr")
+
+# Process pool shared by all the scorers, started the first time it is needed
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+def get_scoring_pool(max_workers: int = constants.SHARDED_SCORING_WORKERS) -> ProcessPoolExecutor:
+    """
+    Function to get the process pool scoring the shards
+
+    The workers are spawned rather than forked so that they don't inherit the threads and locks of the chatbot.
+
+    Parameters
+    ----------
+        max_workers: int
+            Number of worker processes
+
+    Returns
+    -------
+        ProcessPoolExecutor
+            The process pool
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=get_context("spawn"))
+    return _pool
+
+class ShardedScorer:
+    """
+    Class to score a query against the rows of a large L2 normalized csr matrix on several processes
+
+    The arrays of the matrix are copied once into shared memory and the workers map them without
+    copying. The rows are split into contiguous shards, every worker returns the top k rows of its
+    shard and the results are merged with a heap, with the ties broken by row like top_k_similarities.
+    """
+
+    def __init__(self, matrix: csr_matrix, shards: int) -> None:
+        import numpy as np
+        from scipy.sparse import csr_matrix
+
+        self.shape = matrix.shape
+
+        # Copy the arrays of the matrix into shared memory blocks
+        self.blocks: dict[str, tuple[str, str, int]] = {}
+        arrays = {}
+        self._shared_memory = []
+        for name in CSR_ARRAYS:
+            array = getattr(matrix, name)
+            shared_memory = SharedMemory(create=True, size=max(array.nbytes, 1))
+            arrays[name] = np.ndarray(array.shape, dtype=array.dtype, buffer=shared_memory.buf)
+            arrays[name][:] = array
+            self.blocks[name] = (shared_memory.name, array.dtype.str, len(array))
+            self._shared_memory.append(shared_memory)
+
+            # Remove the block once the scorer is gone, the memory is released when the last process unmaps it
+            weakref.finalize(self, shared_memory.unlink)
+
+        # Matrix backed by the shared memory so that the process doesn't keep a second copy of it
+        self.matrix = csr_matrix((arrays["data"], arrays["indices"], arrays["indptr"]), shape=self.shape, copy=False)
+
+        # Contiguous row ranges scored by the workers
+        rows_per_shard = max(1, math.ceil(self.shape[0] / max(1, shards)))
+        self.shards = [(start, min(start + rows_per_shard, self.shape[0])) for start in range(0, self.shape[0], rows_per_shard)]
+
+    def top_k(self, user_input_tfidf: csr_matrix, k: int) -> list[tuple[float, int]]:
+        """
+        Function to get the k rows which are most similar to the vectorized input
+
+        Parameters
+        ----------
+            user_input_tfidf: csr_matrix
+                L2 normalized 1 x n_features vector of the input
+            k: int
+                Number of rows to return
+
+        Returns
+        -------
+            list[tuple[float, int]]
+                similarity score and index of the rows, most similar first
+        """
+        pool = get_scoring_pool()
+        user_input_tfidf = user_input_tfidf.tocsr()
+        futures = [
+            pool.submit(score_shard, self.blocks, self.shape, start, end, user_input_tfidf.indices, user_input_tfidf.data, k)
+            for start, end in self.shards
+        ]
+
+        # Merge the top k of every shard, highest score first and lowest row first among equal scores
+        return heapq.nsmallest(
+            k,
+            (result for future in futures for result in future.result()),
+            key=lambda result: (-result[0], result[1])
+        )
+
+
+# Matrices mapped by a worker process, keyed by the names of their shared memory blocks
+_attached: dict[tuple[str, ...], tuple[list[SharedMemory], dict]] = {}
+
+def open_shared_memory(name: str) -> SharedMemory:
+    """
+    Function to map a shared memory block created by the parent process without taking ownership of it
+
+    Parameters
+    ----------
+        name: str
+            Name of the block
+
+    Returns
+    -------
+        SharedMemory
+            The mapped block
+    """
+    try:
+        # The block is owned by the parent process, it must not be unlinked when the worker exits
+        return SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 there is no track argument, the spawned workers share the resource tracker of the parent
+        return SharedMemory(name=name)
+
+def attach_matrix(blocks: dict[str, tuple[str, str, int]]) -> dict:
+    """
+    Function to map the arrays of a matrix placed in shared memory, called in the worker processes
+
+    Parameters
+    ----------
+        blocks: dict[str, tuple[str, str, int]]
+            Name of the shared memory block, dtype and length of every array of the matrix
+
+    Returns
+    -------
+        dict
+            The arrays of the matrix and the shards built over them so far
+    """
+    import numpy as np
+
+    key = tuple(name for name, _, _ in blocks.values())
+    if key not in _attached:
+        # Only the most recent matrices are kept mapped, older ones belong to indexes which were rebuilt
+        while len(_attached) >= constants.SHARDED_SCORING_MAX_MATRICES:
+            _attached.pop(next(iter(_attached)))
+
+        shared_memory = []
+        arrays = {}
+        for array_name, (block_name, dtype, length) in blocks.items():
+            block = open_shared_memory(block_name)
+            shared_memory.append(block)
+            arrays[array_name] = np.ndarray((length,), dtype=np.dtype(dtype), buffer=block.buf)
+        _attached[key] = (shared_memory, {"arrays": arrays, "shards": {}})
+    return _attached[key][1]
+
+def score_shard(blocks: dict[str, tuple[str, str, int]], shape: tuple[int, int], start: int, end: int, query_indices, query_data, k: int) -> list[tuple[float, int]]:
+    """
+    Function to get the top k rows of a shard of the matrix for the vectorized input, called in the worker processes
+
+    Parameters
+    ----------
+        blocks: dict[str, tuple[str, str, int]]
+            Name of the shared memory block, dtype and length of every array of the matrix
+        shape: tuple[int, int]
+            Shape of the whole matrix
+        start: int
+            First row of the shard
+        end: int
+            Row after the last row of the shard
+        query_indices: numpy.ndarray
+            Columns of the non zero values of the input vector
+        query_data: numpy.ndarray
+            Non zero values of the input vector
+        k: int
+            Number of rows to return
+
+    Returns
+    -------
+        list[tuple[float, int]]
+            similarity score and index of the rows in the whole matrix, most similar first
+    """
+    import numpy as np
+    from scipy.sparse import csr_matrix
+    from utils.matcher import top_k_similarities
+
+    matrix = attach_matrix(blocks)
+
+    # Build the shard once, the values and the columns are views of the shared memory
+    shard = matrix["shards"].get((start, end))
+    if shard is None:
+        arrays = matrix["arrays"]
+        indptr = arrays["indptr"][start:end + 1]
+        shard = csr_matrix(
+            (arrays["data"][indptr[0]:indptr[-1]], arrays["indices"][indptr[0]:indptr[-1]], indptr - indptr[0]),
+            shape=(end - start, shape[1]),
+            copy=False
+        )
+        matrix["shards"][(start, end)] = shard
+
+    user_input_tfidf = csr_matrix((query_data, query_indices, np.array([0, len(query_indices)])), shape=(1, shape[1]))
+    similarities = shard.dot(user_input_tfidf.T).toarray().ravel()
+    return [(score, start + row) for score, row in top_k_similarities(similarities, k)]
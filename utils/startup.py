@@ -0,0 +1,76 @@
+import subprocess
+import sys
+
+def measure_import_times(module_name: str) -> list[tuple[str, int, int]]:
+    """
+    Function to measure the time taken to import every module pulled in by importing the given module
+
+    The module is imported in a fresh interpreter started with -X importtime, so the measurement
+    is not affected by the modules already imported by the current process.
+
+    Parameters
+    ----------
+        module_name: str
+            Name of the module to import, e.g. "main"
+
+    Returns
+    -------
+        list[tuple[str, int, int]]
+            Name, self time and cumulative time in microseconds of every imported module, in import order
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+    # Lines look like "import time:       self [us] |  cumulative | imported package"
+    import_times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_time, cumulative_time, name = line[len("import time:"):].split("|")
+        if not self_time.strip().isdigit():
+            # Header line
+            continue
+        import_times.append((name.rstrip(), int(self_time), int(cumulative_time)))
+    return import_times
+
+def startup_report(module_name: str = "main", top: int = 15) -> int:
+    """
+    Function to print the import time breakdown of the given module
+
+    The self time of every imported module is summed up per top-level package (e.g. all of
+    "nltk.*" is reported as "nltk"), so a heavy dependency being imported eagerly stands out.
+
+    Parameters
+    ----------
+        module_name: str
+            Name of the module to import
+        top: int
+            Number of slowest packages to list
+
+    Returns
+    -------
+        int
+            Total import time in microseconds
+    """
+    import_times = measure_import_times(module_name)
+
+    # Sum up the self time of the modules per top-level package
+    package_times: dict[str, int] = {}
+    package_counts: dict[str, int] = {}
+    for name, self_time, _ in import_times:
+        package = name.strip().split(".")[0]
+        package_times[package] = package_times.get(package, 0) + self_time
+        package_counts[package] = package_counts.get(package, 0) + 1
+    total = sum(package_times.values())
+
+    print(f"Import time breakdown of '{module_name}' ({len(import_times)} modules imported)")
+    print(f"{'package':<30} {'modules':>8} {'self ms':>10} {'share':>7}")
+    for package, package_time in sorted(package_times.items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"{package:<30} {package_counts[package]:>8} {package_time / 1000:>10.1f} {package_time / total:>7.1%}")
+    print(f"{'total':<30} {len(import_times):>8} {total / 1000:>10.1f}")
+
+    return total
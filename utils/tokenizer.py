@@ -0,0 +1,210 @@
+import re
+from typing import Callable
+from utils import constants
+
+# Names of the tokenizers which can be selected with CHATBOT_TOKENIZER or --tokenizer
+NLTK = "nltk"
+REGEX = "regex"
+
+# Characters which are always a token of their own
+_SEPARATE = r"?!;@#$%&*()\[\]{}<>«»“”‘’„‒-―"
+
+# Scanner of the text, the words keep their periods and clitics which are split afterwards
+_TOKEN = re.compile(
+    r"(?P<ellipsis>\.{2,})"
+    r"|(?P<dash>--)"
+    r"|(?P<quote>\"|'')"
+    r"|(?P<backticks>`+)"
+    rf"|(?P<separate>[{_SEPARATE}]|[,:](?!\d))"
+    r"|(?P<word>(?:"
+    rf"[^\s\"`'{_SEPARATE},:.-]"
+    # A quote is split from the word after it unless it starts a clitic, e.g. "'hello" but not "'s"
+    r"|'(?!')(?:(?<=\w')|(?=(?i:re|ve|ll|m|t|s|d|n)\b)|(?!\w))"
+    # Commas and colons are kept before a digit, e.g. "1,000" and "10:30"
+    r"|[,:](?=\d)|\.(?!\.)|-(?!-)"
+    r")+)"
+    r"|(?P<leading_quote>')"
+)
+
+# Characters after which a double quote opens a quotation
+_OPENING_CONTEXT = " ([{<`«“‘„"
+
+# Closing quotes and brackets which may follow the period ending a sentence
+_SENTENCE_END = re.compile(r"[\]\)}>\"'»”’]*(?:\s|$)")
+_TEXT_END = re.compile(r"[\]\)}>\"'»”’\s]*$")
+
+# Tokens ending with a period which do not end the sentence (same as the punkt sentence tokenizer)
+_ABBREVIATIONS = frozenset(["mr", "mrs", "ms", "dr", "st", "jr", "sr", "vs", "e.g", "i.e", "u.s"])
+_NUMBER = re.compile(r"-?[.,]?\d[\d,.-]*")
+_INITIAL = re.compile(r"[^\W\d_]")
+
+# Clitics split from the end of a word after the closing quote, the first ones before the second ones like the Treebank tokenizer
+_CLITIC = re.compile(r"(?<=[^'])'[sSmMdD]$")
+_CLITIC_2 = re.compile(r"(?<=[^'])(?:'ll|'LL|'re|'RE|'ve|'VE|n't|N'T)$")
+_QUOTE_SPLIT_CONTEXT = frozenset(" ?!;@#$%&,:.‒–—―`«“‘„")
+
+# Words split in two, e.g. "cannot" and "gonna"
+_CONTRACTIONS = re.compile(
+    r"(?i)\b(?:(can)(not)|(d)('ye)|(gim)(me)|(gon)(na)|(got)(ta)|(lem)(me)|(more)('n))\b|\b(wan)(na)$"
+)
+_CONTRACTION_HINT = re.compile(r"(?i)cannot|d'ye|gimme|gonna|gotta|lemme|more'n|wanna")
+
+class RegexTokenizer:
+    """
+    Class to tokenize a message like word_tokenize of nltk with a single compiled scanner
+
+    The rules of the Treebank tokenizer used by word_tokenize are applied while scanning the text
+    instead of rewriting it once per rule: punctuation is split, a leading double quote becomes ``
+    and the other ones '', clitics are split, e.g. "What's" into "What" and "'s", and a period is
+    split only where punkt would end a sentence. Parentheses are not converted to -LRB- and -RRB-,
+    and unlike the Treebank tokenizer, every comma of ",," is split from the word after it.
+    """
+
+    def tokenize(self, text: str) -> list[str]:
+        """
+        Function to split the text into tokens
+
+        Parameters
+        ----------
+            text: str
+                Message of the user
+
+        Returns
+        -------
+            list[str]
+                Tokens of the message
+        """
+        contractions = _CONTRACTION_HINT.search(text) is not None
+
+        tokens = []
+        # End of the opening quote starting the text, a quote right after it opens too
+        opening_end = -1
+        for match in _TOKEN.finditer(text):
+            token = match.group()
+            kind = match.lastgroup
+            if kind == "word":
+                self._split_word(text, token, match.end(), contractions, tokens)
+            elif kind == "quote":
+                # Opening quote at the start of the text or after a space, a bracket or another opening quote
+                start = match.start()
+                opening = (start == 0 and token == '"') or (start > 0 and text[start - 1] in _OPENING_CONTEXT) or start == opening_end
+                if opening and start == 0:
+                    opening_end = match.end()
+                tokens.append("``" if opening else "''")
+            elif kind == "backticks":
+                # Pairs of backticks are an opening quote
+                tokens.extend(["``"] * (len(token) // 2) + ["`"] * (len(token) % 2))
+            else:
+                tokens.append(token)
+        return tokens
+
+    def _ends_sentence(self, text: str, word: str, end: int) -> bool:
+        # The last period of the text always ends the sentence
+        if _TEXT_END.match(text, end):
+            return True
+        if not _SENTENCE_END.match(text, end):
+            return False
+        # A period followed by a closing quote or bracket always ends the sentence, e.g. 'B." Then'
+        if not text[end].isspace():
+            return True
+
+        stem = word[:-1]
+        if stem.lower() in _ABBREVIATIONS:
+            return False
+        # An initial or a number followed by a lowercase word, e.g. "version 3. next"
+        following = text[end:].lstrip(" \t\n\"')]}>»”’")[:1]
+        if _INITIAL.fullmatch(stem):
+            return not (following.isalpha() or following in ";:,.!?")
+        if _NUMBER.fullmatch(stem):
+            return not (following.islower() or following in ";:,.!?")
+        return True
+
+    def _split_word(self, text: str, word: str, end: int, contractions: bool, tokens: list[str]) -> None:
+        suffixes = []
+
+        # Period ending a sentence
+        period = len(word) > 1 and word[-1] == "." and self._ends_sentence(text, word, end)
+        if period:
+            word = word[:-1]
+            suffixes.append(".")
+
+        if "'" in word:
+            clitics = (_CLITIC, _CLITIC_2)
+            # Closing quote, e.g. "friends'", and the period before it, e.g. "hi.'"
+            if len(word) > 1 and word[-1] == "'" and word[-2] != "'":
+                word = word[:-1]
+                suffixes.append("'")
+                if not period and len(word) > 1 and word[-1] == "." and self._ends_sentence(text, word, end - 1):
+                    word = word[:-1]
+                    suffixes.append(".")
+                # Like the Treebank tokenizer, a quote which is not followed by a space or punctuation hides "'s", "'m" and "'d"
+                if text[end:end + 1] not in _QUOTE_SPLIT_CONTEXT:
+                    clitics = (_CLITIC_2,)
+
+            # Clitics, e.g. "'s" and "n't"
+            for clitic in clitics:
+                match = clitic.search(word)
+                if match:
+                    suffixes.append(match.group())
+                    word = word[:match.start()]
+
+        if contractions and _CONTRACTIONS.search(word):
+            tokens.extend(_CONTRACTIONS.sub(lambda match: " " + " ".join(filter(None, match.groups())) + " ", word).split())
+        else:
+            tokens.append(word)
+        tokens.extend(reversed(suffixes))
+
+def nltk_word_tokenize(text: str) -> list[str]:
+    from nltk.tokenize import word_tokenize
+
+    # Sentences are split with punkt, then every sentence with the Treebank tokenizer
+    return word_tokenize(text)
+
+# Tokenizers which can be selected, by name
+TOKENIZERS: dict[str, Callable[[str], list[str]]] = {
+    NLTK: nltk_word_tokenize,
+    REGEX: RegexTokenizer().tokenize,
+}
+
+# The tokenizer used by the pre-processing and the game lookups
+_tokenizer_name = NLTK
+
+def set_tokenizer(name: str) -> None:
+    """
+    Function to select the tokenizer, before the indexes are built from the data files
+
+    Parameters
+    ----------
+        name: str
+            Name of the tokenizer, one of TOKENIZERS
+
+    Returns
+    -------
+        None
+    """
+    global _tokenizer_name
+    if name not in TOKENIZERS:
+        raise ValueError(f"Unknown tokenizer {name!r}, expected one of {', '.join(TOKENIZERS)}")
+    _tokenizer_name = name
+
+def tokenizer_name() -> str:
+    return _tokenizer_name
+
+def word_tokenize(text: str) -> list[str]:
+    """
+    Function to split the text into tokens with the selected tokenizer
+
+    Parameters
+    ----------
+        text: str
+            Text to tokenize
+
+    Returns
+    -------
+        list[str]
+            Tokens of the text
+    """
+    return TOKENIZERS[_tokenizer_name](text)
+
+# Use the tokenizer of the deployment, an unknown name fails at startup
+set_tokenizer(constants.TOKENIZER)
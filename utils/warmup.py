@@ -0,0 +1,166 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable
+from utils import constants
+
+# Prefix of the names of the threads loading the resources
+WARMUP_THREAD_PREFIX = "warmup"
+
+def load_punkt() -> None:
+    from utils.tokenizer import word_tokenize
+
+    # The punkt model is loaded and cached by the first tokenization, unless the regex tokenizer is selected
+    word_tokenize("Warming up.")
+
+def load_tagger() -> None:
+    from nltk.tag.mapping import map_tag
+    from preprocessing import pipeline
+
+    # Load the perceptron tagger and the mapping to the universal tagset
+    pipeline.tagger
+    map_tag("en-ptb", "universal", "NN")
+
+def load_ne_chunker() -> None:
+    from preprocessing import pipeline
+
+    # Load the maxent chunker and the words corpus used by its features
+    pipeline.ne_chunker.parse([("Warming", "VBG"), ("up", "RP")])
+
+def load_wordnet() -> None:
+    from preprocessing import pipeline
+
+    # WordNet is read the first time a word is lemmatized
+    pipeline.lemmatizer.lemmatize("warming", "v")
+
+def load_lexicon() -> None:
+    from utils.lexicon import get_entity_lexicon
+
+    # Load the stopwords and compile the genre and platform lexicon
+    get_entity_lexicon()
+
+def load_matchers() -> None:
+    from utils.matcher import get_matcher_index, get_multi_head_matcher
+
+    # Fit the index of the game search keywords and of every head, then the matcher over the heads
+    get_matcher_index(constants.GAME_SEARCH_PATH, "keyword")
+    get_multi_head_matcher()
+
+def load_intent_table() -> None:
+    from intent_matching import get_intent_table
+
+    # Pre-process the training utterances and map them to their intents
+    get_intent_table()
+
+def load_game_catalog() -> None:
+    from utils.fuzzy import get_title_resolver
+
+    # Load the catalog and build the typo tolerant title index over it
+    get_title_resolver()
+
+def load_names() -> None:
+    from utils.names import get_name_extractor
+
+    # Load the gazetteer of the fast name extraction
+    get_name_extractor().gazetteer
+
+# Resources loaded in the background, keyed by the name used to wait for them
+WARMUP_TASKS: dict[str, Callable[[], None]] = {
+    "punkt": load_punkt,
+    "tagger": load_tagger,
+    "ne_chunker": load_ne_chunker,
+    "names": load_names,
+    "wordnet": load_wordnet,
+    "lexicon": load_lexicon,
+    "matchers": load_matchers,
+    "intent_table": load_intent_table,
+    "game_catalog": load_game_catalog,
+}
+
+# Future of every resource which is being loaded, empty until the warm-up is started
+_futures: dict[str, Future] = {}
+_futures_lock = threading.Lock()
+
+# Set once every resource is loaded (or failed to load)
+warmup_done = threading.Event()
+
+def start_warmup(max_workers: int = constants.WARMUP_WORKERS) -> None:
+    """
+    Function to start loading the NLP models and the indexes in the background
+
+    Calling it again after the warm-up has started does nothing.
+
+    Parameters
+    ----------
+        max_workers: int
+            Number of threads loading the resources
+
+    Returns
+    -------
+        None
+    """
+    with _futures_lock:
+        if _futures:
+            return
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=WARMUP_THREAD_PREFIX)
+        for name, loader in WARMUP_TASKS.items():
+            _futures[name] = executor.submit(loader)
+
+    # Set the readiness signal once the last resource is done and let the threads exit
+    remaining = [len(_futures)]
+    remaining_lock = threading.Lock()
+
+    def on_done(_: Future) -> None:
+        with remaining_lock:
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                warmup_done.set()
+
+    for future in list(_futures.values()):
+        future.add_done_callback(on_done)
+    executor.shutdown(wait=False)
+
+def wait_until_ready(*names: str) -> None:
+    """
+    Function to wait until the given resources are loaded by the warm-up
+
+    It returns right away if the warm-up was not started, if the resources are already loaded
+    or if it is called by the warm-up itself. A resource which failed to load is loaded again
+    when it is used, so the error is raised where it is needed.
+
+    Parameters
+    ----------
+        names: str
+            Names of the resources in WARMUP_TASKS
+
+    Returns
+    -------
+        None
+    """
+    if threading.current_thread().name.startswith(WARMUP_THREAD_PREFIX):
+        return
+    futures = [_futures[name] for name in names if name in _futures]
+    if futures:
+        # A failure is not raised here but left to the code using the resource
+        wait(futures)
+
+def warmup_status() -> dict[str, str]:
+    """
+    Function to get the loading status of every resource
+
+    Parameters
+    ----------
+        None
+
+    Returns
+    -------
+        dict[str, str]
+            "pending", "loading", "ready" or "failed" for every resource in WARMUP_TASKS
+    """
+    status = {}
+    for name in WARMUP_TASKS:
+        future = _futures.get(name)
+        if future is None or not future.done():
+            status[name] = "loading" if future is not None and future.running() else "pending"
+        else:
+            status[name] = "failed" if future.exception() is not None else "ready"
+    return status